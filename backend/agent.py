@@ -1,8 +1,11 @@
 import os
 import hashlib
+import threading
+import time
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional
 from phi.agent import Agent
+from phi.document import Document
 from phi.model.ollama import Ollama
 from phi.knowledge.pdf import PDFKnowledgeBase
 from phi.vectordb.pgvector import PgVector
@@ -11,18 +14,30 @@ from phi.vectordb.search import SearchType
 from phi.vectordb.pgvector.index import HNSW
 from phi.embedder.ollama import OllamaEmbedder
 from pdf_reader_custom import FilteredPDFReader
-from dotenv import load_dotenv
 import logging
 from config import DATABASE_URL, OLLAMA_HOST, CHAT_MODEL, EMBEDDING_MODEL
-
-load_dotenv()
+from db_pool import get_connection, get_sqlalchemy_engine
+from db_utils import (
+    invalidate_document_index,
+    backfill_document_uuids,
+    ensure_document_scope_filters,
+    fetch_chunks_by_ids,
+)
+from document_index import get_document_name, document_scope_filters
+from library_manager import get_library_manager
+from retrieval_cache import embedding_cache, retrieval_cache, normalize_text, retrieval_key, bump_retrieval_version
+from metrics import CHAT_STAGE_SECONDS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global knowledge base instance
+# Global knowledge base instance; the lock keeps warm-up and concurrent first chats from building it twice
 knowledge_base = None
+_knowledge_base_lock = threading.Lock()
+
+# Query-embedding time spent by the current thread, so vector search time can exclude it
+_embedding_time = threading.local()
 
 def get_pdf_files() -> List[str]:
     """Get all PDF files from the data directory"""
@@ -37,33 +52,25 @@ def get_pdf_files() -> List[str]:
     logger.info(f"📚 Found {len(pdf_files)} PDF files")
     return [str(pdf) for pdf in pdf_files]
 
-def check_if_documents_exist(db_url: str) -> bool:
+def check_if_documents_exist() -> bool:
     """Check if documents already exist in the database"""
     try:
-        import psycopg2
-        conn = psycopg2.connect(db_url)
-        cur = conn.cursor()
-        
-        # Check if table exists and has documents
-        cur.execute("""
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables 
-                WHERE table_schema = 'ai' 
-                AND table_name = 'pdf_documents'
-            );
-        """)
-        table_exists = cur.fetchone()[0]
-        
-        if table_exists:
-            cur.execute("SELECT COUNT(*) FROM ai.pdf_documents;")
-            doc_count = cur.fetchone()[0]
-            cur.close()
-            conn.close()
-            return doc_count > 0
-        
-        cur.close()
-        conn.close()
-        return False
+        with get_connection() as conn, conn.cursor() as cur:
+            # Check if table exists and has documents
+            cur.execute("""
+                SELECT EXISTS (
+                    SELECT FROM information_schema.tables 
+                    WHERE table_schema = 'ai' 
+                    AND table_name = 'pdf_documents'
+                );
+            """)
+            table_exists = cur.fetchone()[0]
+            
+            if not table_exists:
+                return False
+            
+            cur.execute("SELECT EXISTS (SELECT 1 FROM ai.pdf_documents);")
+            return cur.fetchone()[0]
     except Exception as e:
         logger.warning(f"⚠️ Could not check existing documents: {e}")
         return False
@@ -80,7 +87,8 @@ def create_knowledge_base():
         vector_db = PgVector(
             table_name="pdf_documents",
             db_url=db_url,
-            embedder=OllamaEmbedder(
+            db_engine=get_sqlalchemy_engine(),  # Share the configured, health-checked pool
+            embedder=CachedOllamaEmbedder(
                             model=EMBEDDING_MODEL,
             dimensions=768  # Explicitly set correct dimensions for nomic-embed-text
             ),
@@ -116,7 +124,11 @@ def create_knowledge_base():
         return None
 
 def initialize_knowledge_base():
-    """Initialize the global knowledge base following Phi documentation patterns"""
+    """
+    Initialize the global knowledge base following Phi documentation patterns.
+    It is built and loaded in a local variable and published only once ready, so a thread
+    passing get_knowledge_base()'s unlocked check never sees a half-initialized knowledge base.
+    """
     global knowledge_base
     
     if knowledge_base is not None:
@@ -131,17 +143,15 @@ def initialize_knowledge_base():
         logger.warning("⚠️ No PDF files found. Knowledge base will be empty.")
     
     # Create knowledge base
-    knowledge_base = create_knowledge_base()
+    kb = create_knowledge_base()
     
-    if knowledge_base is None:
+    if kb is None:
         raise Exception("Failed to create knowledge base")
     
     # Check if we should load documents
     if pdf_files:
-        db_url = DATABASE_URL
-        
         # For production efficiency: check if documents already exist
-        documents_exist = check_if_documents_exist(db_url)
+        documents_exist = check_if_documents_exist()
             
         force_reload = os.getenv("FORCE_RELOAD", "false").lower() == "true"
         
@@ -152,52 +162,148 @@ def initialize_knowledge_base():
             try:
                 logger.info("📖 Loading PDF documents (this may take a while for large PDFs)...")
                 # Load with recreate=False to avoid rebuilding existing embeddings
-                knowledge_base.load(recreate=False)
+                kb.load(recreate=False)
+                invalidate_document_index()
+                backfill_document_uuids()
+                ensure_document_scope_filters()
+                bump_retrieval_version()
+                get_library_manager().bump_library_version()
                 logger.info(f"✅ Successfully loaded {len(pdf_files)} PDF documents")
             except Exception as e:
                 logger.warning(f"⚠️ Warning: Error loading documents: {e}")
                 try:
                     logger.info("🔄 Retrying document loading...")
-                    knowledge_base.load(recreate=True)
+                    kb.load(recreate=True)
+                    invalidate_document_index()
+                    backfill_document_uuids()
+                    ensure_document_scope_filters()
+                    bump_retrieval_version()
+                    get_library_manager().bump_library_version()
                     logger.info("✅ Successfully loaded documents on retry")
                 except Exception as retry_error:
                     logger.error(f"❌ Failed to load documents: {retry_error}")
                     logger.info("💡 Try using smaller PDF files or check your database connection")
     
+    knowledge_base = kb
     return knowledge_base
 
 def get_knowledge_base():
     """Get the global knowledge base instance"""
     global knowledge_base
     if knowledge_base is None:
-        knowledge_base = initialize_knowledge_base()
+        with _knowledge_base_lock:
+            if knowledge_base is None:
+                knowledge_base = initialize_knowledge_base()
     return knowledge_base
 
-def create_document_specific_knowledge_base(document_name: str):
-    """Create a knowledge base filtered to a specific document"""
-    try:
-        # For now, we'll use the global knowledge base and handle document filtering 
-        # at the query level rather than trying to create a separate knowledge base
-        # This avoids type compatibility issues with the Agent class
+class CachedOllamaEmbedder(OllamaEmbedder):
+    """
+    Ollama embedder that memoises query embeddings by (model, normalized text).
+    Only get_embedding (used for search queries) is cached; document embeddings
+    go through get_embedding_and_usage and are left alone.
+    """
+
+    def get_embedding(self, text: str) -> List[float]:
+        started = time.perf_counter()
+        key = (self.model, normalize_text(text))
+        embedding = embedding_cache.get(key)
+        if embedding is None:
+            embedding = super().get_embedding(text)
+            if embedding:
+                embedding_cache.put(key, embedding)
         
-        logger.info(f"🔍 Using global knowledge base with document filter for: {document_name}")
-        return get_knowledge_base()
+        elapsed = time.perf_counter() - started
+        CHAT_STAGE_SECONDS.observe(elapsed, stage="query_embedding")
+        _embedding_time.seconds = getattr(_embedding_time, "seconds", 0.0) + elapsed
+        return embedding
+
+class DocumentScopedKnowledgeBase(PDFKnowledgeBase):
+    """
+    Knowledge base whose searches only return chunks of one document.
+    The filter is applied inside the pgvector query (vector and keyword parts alike)
+    against each chunk's `filters` column, so ranking never considers chunks from other books.
+    Library documents are scoped by `document_id`; legacy documents by `document_name` alone.
+    Top-k chunk ids are cached per (document, query, retrieval params) until the
+    document's retrieval version is bumped by an ingest or removal.
+    """
+    document_name: Optional[str] = None
+    document_id: Optional[str] = None
+
+    def _retrieval_params(self) -> Dict[str, Any]:
+        vector_db = self.vector_db
+        return {
+            "search_type": str(getattr(vector_db, "search_type", None)),
+            "vector_score_weight": getattr(vector_db, "vector_score_weight", None),
+            "ef_search": getattr(getattr(vector_db, "vector_index", None), "ef_search", None),
+        }
+
+    def search(
+        self, query: str, num_documents: Optional[int] = None, filters: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        started = time.perf_counter()
+        embedding_before = getattr(_embedding_time, "seconds", 0.0)
+        try:
+            return self._scoped_search(query, num_documents, filters)
+        finally:
+            # Query embedding is reported as its own stage
+            embedding_seconds = getattr(_embedding_time, "seconds", 0.0) - embedding_before
+            CHAT_STAGE_SECONDS.observe(time.perf_counter() - started - embedding_seconds, stage="vector_search")
+
+    def _scoped_search(
+        self, query: str, num_documents: Optional[int], filters: Optional[Dict[str, Any]]
+    ) -> List[Document]:
+        scoped_filters = dict(filters or {})
+        if self.document_name:
+            scoped_filters.update(document_scope_filters(self.document_name, self.document_id))
         
-    except Exception as e:
-        logger.error(f"❌ Error creating document-specific knowledge base: {e}")
-        # Fallback to global knowledge base
-        return get_knowledge_base()
+        key = retrieval_key(self.document_id or self.document_name, query, num_documents or self.num_documents, scoped_filters, self._retrieval_params())
+        chunk_ids = retrieval_cache.get(key)
+        if chunk_ids is not None:
+            try:
+                chunks = fetch_chunks_by_ids(chunk_ids)
+                if len(chunks) == len(chunk_ids):
+                    return [Document(**chunk) for chunk in chunks]
+            except Exception as e:
+                logger.warning(f"⚠️ Could not load cached retrieval results: {e}")
+            retrieval_cache.discard(key)
+        
+        documents = super().search(query=query, num_documents=num_documents, filters=scoped_filters or None)
+        if documents and all(document.id for document in documents):
+            retrieval_cache.put(key, [document.id for document in documents])
+        return documents
+
+def create_document_specific_knowledge_base(document_name: str, document_id: Optional[str] = None):
+    """
+    Create a knowledge base filtered to a specific document.
+    Pass the catalog id of library documents; without it the filename stem scopes the search.
+    """
+    base_knowledge = get_knowledge_base()
+    scoped_name = get_document_name(document_name)
+    
+    logger.info(f"🔍 Using knowledge base scoped to document: {document_id or scoped_name}")
+    # Shares the global vector store; only the search filter differs
+    return DocumentScopedKnowledgeBase(
+        path=base_knowledge.path,
+        vector_db=base_knowledge.vector_db,
+        reader=base_knowledge.reader,
+        num_documents=base_knowledge.num_documents,
+        document_name=scoped_name,
+        document_id=document_id,
+    )
 
 
-def get_rag_agent(document_filter: str = None) -> Agent:
-    """Create a RAG agent either for general knowledge or a specific document."""
+def get_rag_agent(document_filter: str = None, document_id: Optional[str] = None) -> Agent:
+    """
+    Create a RAG agent either for general knowledge or a specific document.
+    document_filter is the document's filename; document_id its catalog id, for library documents.
+    """
     
     knowledge_base = None
     if document_filter:
         logger.info(f"🤖 Creating agent with knowledge filtered for: {document_filter}")
         # When a document_filter is provided, we create a specific knowledge base
         # that is scoped to only that document.
-        knowledge_base = create_document_specific_knowledge_base(document_filter)
+        knowledge_base = create_document_specific_knowledge_base(document_filter, document_id)
     else:
         logger.info("🤖 Creating agent with general knowledge base.")
         # When no filter is provided, we use the global, general-purpose knowledge base.
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AgentCache:
+    """
+    Bounded LRU cache of per-document chat agents with an idle TTL.
+
+    - At most `capacity` agents are kept; the least recently used is evicted first.
+    - Agents idle for longer than `ttl_seconds` are dropped on the next access.
+    - `on_evict` is called with the key of every agent that leaves the cache.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], Any],
+        capacity: int,
+        ttl_seconds: float,
+        on_evict: Optional[Callable[[str], None]] = None,
+    ):
+        self.factory = factory
+        self.capacity = max(1, capacity)
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._building: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, key: str) -> None:
+        self._entries.pop(key, None)
+        self._last_used.pop(key, None)
+        if self.on_evict:
+            self.on_evict(key)
+
+    def _expire(self, now: float) -> None:
+        # Entries are kept in recency order, so expired ones are at the front
+        if self.ttl_seconds <= 0:
+            return
+        while self._entries:
+            key = next(iter(self._entries))
+            if now - self._last_used[key] < self.ttl_seconds:
+                break
+            self._remove(key)
+            self.expirations += 1
+
+    def get(self, key: str) -> Any:
+        """Get the agent for a key, building it with the factory on a miss."""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._last_used[key] = now
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        # Build outside the cache lock; concurrent misses for the same key build once
+        with build_lock:
+            with self._lock:
+                if key in self._entries:
+                    return self._entries[key]
+            try:
+                agent = self.factory(key)
+            except Exception:
+                with self._lock:
+                    self._building.pop(key, None)
+                raise
+            with self._lock:
+                self._entries[key] = agent
+                self._last_used[key] = time.monotonic()
+                self._building.pop(key, None)
+                while len(self._entries) > self.capacity:
+                    self._remove(next(iter(self._entries)))
+                    self.evictions += 1
+            return agent
+
+    def preload(self, keys: Iterable[str]) -> int:
+        """Build agents ahead of time; returns how many were loaded."""
+        loaded = 0
+        for key in keys:
+            try:
+                self.get(key)
+                loaded += 1
+            except Exception as e:
+                logger.warning(f"⚠️ Could not preload agent for {key}: {e}")
+        return loaded
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
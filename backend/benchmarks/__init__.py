@@ -0,0 +1 @@
+# Performance benchmarks: synthetic corpus, local Ollama fake and timing runner
@@ -0,0 +1,70 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare <base> <head> [--threshold 10] [--fail-on-regression]
+
+<base>/<head> are result files or commit prefixes found in benchmarks/results/.
+Every metric is lower-is-better; a regression is a median that grew by more than
+the threshold percentage.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+from benchmarks.run import RESULTS_DIR
+
+def load_results(reference: str, results_dir: Path = RESULTS_DIR) -> Dict[str, Any]:
+    path = Path(reference)
+    if not path.exists():
+        matches = sorted(results_dir.glob(f"{reference}*.json"))
+        if not matches:
+            raise FileNotFoundError(f"No benchmark results for {reference} in {results_dir}")
+        path = matches[-1]
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def compare(base: Dict[str, Any], head: Dict[str, Any], threshold: float) -> int:
+    """Print a comparison table; returns the number of regressions."""
+    regressions = 0
+    names = sorted(set(base["metrics"]) | set(head["metrics"]))
+    print(f"{'metric':<46} {'base':>12} {'head':>12} {'change':>9}")
+    for name in names:
+        before = base["metrics"].get(name)
+        after = head["metrics"].get(name)
+        if before is None or after is None:
+            print(f"{name:<46} {'-' if before is None else before['median']:>12} {'-' if after is None else after['median']:>12} {'new' if before is None else 'gone':>9}")
+            continue
+
+        change = (after["median"] - before["median"]) / before["median"] * 100 if before["median"] else 0.0
+        marker = ""
+        if change > threshold:
+            marker = "  ❌ regression"
+            regressions += 1
+        elif change < -threshold:
+            marker = "  ✅ faster"
+        print(f"{name:<46} {before['median']:>12.3f} {after['median']:>12.3f} {change:>+8.1f}%{marker}")
+
+    if base.get("params") != head.get("params"):
+        print("⚠️ The runs used different parameters; differences may not be comparable.")
+    if base.get("machine") != head.get("machine"):
+        print("⚠️ The runs were made on different machines.")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark runs")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent change in median counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    base = load_results(args.base)
+    head = load_results(args.head)
+    print(f"📊 {base['commit'][:12]}{' (dirty)' if base.get('dirty') else ''} → {head['commit'][:12]}{' (dirty)' if head.get('dirty') else ''}")
+    regressions = compare(base, head, args.threshold)
+    if regressions:
+        print(f"❌ {regressions} regression(s) above {args.threshold:.0f}%")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
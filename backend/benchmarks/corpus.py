@@ -0,0 +1,142 @@
+"""
+Synthetic benchmark corpus: PDFs and EPUBs of configurable size, generated
+deterministically from a seed so every run (and every commit) reads the same books.
+"""
+import argparse
+import io
+import random
+import zipfile
+from pathlib import Path
+from typing import List
+
+# Every generated file name starts with this, so benchmark rows are easy to find and clean up
+CORPUS_PREFIX = "bench"
+
+_SYLLABLES = ["ka", "lo", "ri", "ten", "mar", "vo", "sel", "qui", "dra", "en", "to", "ba", "mi", "sor", "la", "ne"]
+
+def vocabulary(rng: random.Random, size: int = 2000) -> List[str]:
+    """Pseudo-words built from syllables; a few hundred occur often, the rest rarely (roughly Zipfian)."""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(1, 4))))
+    return sorted(words)
+
+def paragraph_text(rng: random.Random, words: List[str], word_count: int) -> str:
+    weights = [1.0 / (rank + 1) for rank in range(len(words))]
+    chosen = rng.choices(words, weights=weights, k=word_count)
+    sentences = []
+    for start in range(0, len(chosen), 12):
+        sentence = " ".join(chosen[start:start + 12])
+        sentences.append(sentence[:1].upper() + sentence[1:] + ".")
+    return " ".join(sentences)
+
+def generate_pdf(path: Path, pages: int, words_per_page: int, seed: int = 0) -> Path:
+    """Write a PDF with `pages` pages of `words_per_page` words each, plus title metadata."""
+    import fitz  # PyMuPDF
+
+    rng = random.Random(seed)
+    words = vocabulary(rng)
+    with fitz.open() as pdf_doc:
+        for page_number in range(pages):
+            page = pdf_doc.new_page(width=595, height=842)
+            page.insert_text((50, 50), f"Chapter {page_number + 1}", fontsize=16)
+            page.insert_textbox(
+                fitz.Rect(50, 70, 545, 800),
+                paragraph_text(rng, words, words_per_page),
+                fontsize=7,
+            )
+        pdf_doc.set_metadata({"title": path.stem.replace("_", " ").title(), "author": "Benchmark Corpus"})
+        pdf_doc.save(str(path))
+    return path
+
+def cover_png(seed: int, size=(600, 900)) -> bytes:
+    """A simple two-tone cover image."""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    img = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([40, 40, size[0] - 40, size[1] // 3], fill=tuple(rng.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+def generate_epub(path: Path, chapters: int, words_per_chapter: int, seed: int = 0) -> Path:
+    """Write an EPUB 3 with a cover image and `chapters` XHTML chapters in the spine."""
+    rng = random.Random(seed)
+    words = vocabulary(rng)
+    title = path.stem.replace("_", " ").title()
+
+    manifest = ['<item id="cover-image" href="images/cover.png" media-type="image/png" properties="cover-image"/>']
+    spine = []
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        archive.writestr("META-INF/container.xml", (
+            '<?xml version="1.0"?>'
+            '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>'
+            '</container>'
+        ), compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr("OEBPS/images/cover.png", cover_png(seed))
+
+        for number in range(1, chapters + 1):
+            paragraphs = "".join(
+                f"<p>{paragraph_text(rng, words, 120)}</p>" for _ in range(max(1, words_per_chapter // 120))
+            )
+            archive.writestr(f"OEBPS/chapter{number}.xhtml", (
+                '<?xml version="1.0" encoding="utf-8"?>'
+                '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Chapter</title></head>'
+                f'<body><h1>Chapter {number}</h1>{paragraphs}</body></html>'
+            ), compress_type=zipfile.ZIP_DEFLATED)
+            manifest.append(f'<item id="chapter{number}" href="chapter{number}.xhtml" media-type="application/xhtml+xml"/>')
+            spine.append(f'<itemref idref="chapter{number}"/>')
+
+        archive.writestr("OEBPS/content.opf", (
+            '<?xml version="1.0" encoding="utf-8"?>'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="uid">'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<dc:identifier id="uid">urn:bench:{seed}</dc:identifier>'
+            f'<dc:title>{title}</dc:title><dc:creator>Benchmark Corpus</dc:creator><dc:language>en</dc:language>'
+            '</metadata>'
+            f'<manifest>{"".join(manifest)}</manifest>'
+            f'<spine>{"".join(spine)}</spine>'
+            '</package>'
+        ), compress_type=zipfile.ZIP_DEFLATED)
+    return path
+
+def generate_corpus(
+    output_dir: Path,
+    pdf_count: int = 3,
+    epub_count: int = 3,
+    pages: int = 50,
+    words_per_page: int = 400,
+    seed: int = 0,
+) -> List[Path]:
+    """Generate a corpus of PDFs and EPUBs; existing files with the same name are reused."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    files = []
+    for index in range(pdf_count):
+        path = output_dir / f"{CORPUS_PREFIX}_pdf_{pages}p_{index:03d}.pdf"
+        if not path.exists():
+            generate_pdf(path, pages, words_per_page, seed=seed + index)
+        files.append(path)
+    for index in range(epub_count):
+        path = output_dir / f"{CORPUS_PREFIX}_epub_{pages}c_{index:03d}.epub"
+        if not path.exists():
+            generate_epub(path, pages, words_per_page, seed=seed + 1000 + index)
+        files.append(path)
+    return files
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic PDF/EPUB benchmark corpus")
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument("--pdfs", type=int, default=3)
+    parser.add_argument("--epubs", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=50, help="Pages per PDF / chapters per EPUB")
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for path in generate_corpus(args.output_dir, args.pdfs, args.epubs, args.pages, args.words_per_page, args.seed):
+        print(f"📄 {path} ({path.stat().st_size // 1024} KiB)")
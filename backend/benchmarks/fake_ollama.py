@@ -0,0 +1,165 @@
+"""
+Minimal stand-in for the Ollama HTTP API, so benchmarks measure this service
+rather than model speed.
+
+- /api/embed and /api/embeddings return deterministic hashed bag-of-words vectors,
+  so texts sharing words get similar embeddings and retrieval stays meaningful.
+- /api/chat answers with a fixed sentence, streamed token by token when asked.
+Latencies are configurable to model a slower or faster machine.
+"""
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+EMBEDDING_DIMENSIONS = 768
+CHAT_REPLY = "According to the document, the answer can be found in the retrieved passages above."
+
+_WORD_RE = re.compile(r"\w+")
+
+def fake_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> List[float]:
+    """Hashed bag-of-words vector, L2-normalized."""
+    vector = [0.0] * dimensions
+    for word in _WORD_RE.findall(text.lower()):
+        digest = hashlib.md5(word.encode()).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    # Set on the server: embed_latency (per request), embed_item_latency (per input), chat_latency, token_latency
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status: int = 200) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path in ("/", "/api/version"):
+            self._send_json({"version": "0.0.0-fake"})
+        elif self.path == "/api/tags":
+            self._send_json({"models": []})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        request = self._read_json()
+        server = self.server
+        self.server.requests[self.path] = self.server.requests.get(self.path, 0) + 1
+
+        if self.path == "/api/embed":
+            texts = request.get("input", [])
+            texts = [texts] if isinstance(texts, str) else texts
+            time.sleep(server.embed_latency + server.embed_item_latency * len(texts))
+            self._send_json({"model": request.get("model"), "embeddings": [fake_embedding(text) for text in texts]})
+
+        elif self.path == "/api/embeddings":
+            time.sleep(server.embed_latency + server.embed_item_latency)
+            self._send_json({"embedding": fake_embedding(request.get("prompt", ""))})
+
+        elif self.path == "/api/chat":
+            self._chat(request)
+
+        elif self.path == "/api/show":
+            self._send_json({"modelfile": "", "parameters": "", "template": "", "details": {}})
+
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def _chat(self, request) -> None:
+        server = self.server
+        model = request.get("model")
+        created_at = datetime.now(timezone.utc).isoformat()
+        time.sleep(server.chat_latency)
+
+        if not request.get("stream", True):
+            time.sleep(server.token_latency * len(CHAT_REPLY.split()))
+            self._send_json({
+                "model": model,
+                "created_at": created_at,
+                "message": {"role": "assistant", "content": CHAT_REPLY},
+                "done": True,
+                "done_reason": "stop",
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for word in CHAT_REPLY.split():
+            time.sleep(server.token_latency)
+            line = {"model": model, "created_at": created_at, "message": {"role": "assistant", "content": word + " "}, "done": False}
+            self.wfile.write((json.dumps(line) + "\n").encode())
+            self.wfile.flush()
+        final = {"model": model, "created_at": created_at, "message": {"role": "assistant", "content": ""}, "done": True, "done_reason": "stop"}
+        self.wfile.write((json.dumps(final) + "\n").encode())
+        self.close_connection = True
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 0,
+        embed_latency: float = 0.0,
+        embed_item_latency: float = 0.0,
+        chat_latency: float = 0.0,
+        token_latency: float = 0.0,
+    ):
+        super().__init__(("127.0.0.1", port), FakeOllamaHandler)
+        self.embed_latency = embed_latency
+        self.embed_item_latency = embed_item_latency
+        self.chat_latency = chat_latency
+        self.token_latency = token_latency
+        self.requests = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "FakeOllamaServer":
+        threading.Thread(target=self.serve_forever, name="fake-ollama", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server for benchmarks")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--embed-item-latency-ms", type=float, default=0.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=0.0)
+    parser.add_argument("--token-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(
+        port=args.port,
+        embed_latency=args.embed_latency_ms / 1000,
+        embed_item_latency=args.embed_item_latency_ms / 1000,
+        chat_latency=args.chat_latency_ms / 1000,
+        token_latency=args.token_latency_ms / 1000,
+    )
+    print(f"🦙 Fake Ollama listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,422 @@
+"""
+Benchmark runner.
+
+Generates (or reuses) a synthetic corpus, starts a fake Ollama server, points the
+backend at a scratch pgvector database and times:
+
+- ingest:      library add + RAG ingest per page (eBook section) and per chunk, first
+               ingest and re-ingest, for PDFs and EPUBs
+- reader:      RAG text extraction + chunking alone, PDF pages vs EPUB sections
+- listing:     keyset /documents pages (first and deep), the full listing and the
+               /documents merge at 10k and 100k entries
+- thumbnails:  single-pass metadata + thumbnail extraction per PDF / EPUB
+- retrieval:   scoped vector search (cold and cached) and chat time-to-first-token
+
+Results are written to benchmarks/results/<commit>.json; compare two runs with
+`python -m benchmarks.compare`.
+
+Run from backend/:
+    python -m benchmarks.run                                   # all suites
+    python -m benchmarks.run --suites reader,listing,thumbnails   # no database needed
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCHMARKS_DIR.parent
+RESULTS_DIR = BENCHMARKS_DIR / "results"
+
+SUITES = ("ingest", "reader", "listing", "thumbnails", "retrieval")
+DATABASE_SUITES = {"ingest", "retrieval"}
+
+def summarize(samples: List[float], unit: str) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    return {
+        "unit": unit,
+        "median": round(statistics.median(ordered), 3),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "mean": round(statistics.fmean(ordered), 3),
+        "min": round(ordered[0], 3),
+        "samples": len(ordered),
+    }
+
+def timed_ms(func: Callable, *args: Any, **kwargs: Any) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+def git_commit() -> Tuple[str, bool]:
+    """Current commit and whether the working tree has uncommitted changes."""
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR, capture_output=True, text=True
+        ).stdout.strip())
+        return sha, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", True
+
+class BenchmarkRun:
+    """Collects metric samples; every metric is lower-is-better."""
+
+    def __init__(self, params: Dict[str, Any]):
+        self.params = params
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, name: str, samples: List[float], unit: str = "ms") -> None:
+        if not samples:
+            return
+        self.metrics[name] = summarize(samples, unit)
+        summary = self.metrics[name]
+        print(f"  {name:<44} median {summary['median']:>10.3f} {unit:<8} p95 {summary['p95']:>10.3f}  (n={summary['samples']})")
+
+    def save(self, output_dir: Path) -> Path:
+        sha, dirty = git_commit()
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / f"{sha[:12]}{'-dirty' if dirty else ''}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": sha,
+                "dirty": dirty,
+                "timestamp": datetime.now().isoformat(),
+                "machine": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cpu_count": os.cpu_count(),
+                },
+                "params": self.params,
+                "metrics": self.metrics,
+            }, f, indent=2, sort_keys=True)
+        return path
+
+def prepare_environment(args: argparse.Namespace, workdir: Path, ollama_url: str) -> None:
+    """
+    Point the backend at the fake Ollama and the scratch database, and run it from
+    a scratch working directory. Must happen before any backend module is imported,
+    since configuration is read at import time.
+    """
+    os.environ["OLLAMA_HOST"] = ollama_url
+    os.environ["POSTGRES_DB"] = args.database
+    os.environ["AGENT_PRELOAD"] = ""
+    workdir.mkdir(parents=True, exist_ok=True)
+    os.chdir(workdir)
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+
+def ensure_database() -> None:
+    """Create the scratch database (with pgvector) if it does not exist yet."""
+    import psycopg2
+    from config import config
+
+    admin = psycopg2.connect(
+        host=config.POSTGRES_HOST, port=config.POSTGRES_PORT, dbname="postgres",
+        user=config.POSTGRES_USER, password=config.POSTGRES_PASSWORD,
+    )
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (config.POSTGRES_DB,))
+        if cur.fetchone() is None:
+            cur.execute(f'CREATE DATABASE "{config.POSTGRES_DB}"')
+    admin.close()
+
+    from db_pool import get_connection
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        cur.execute("CREATE SCHEMA IF NOT EXISTS ai")
+
+def cleanup_database() -> None:
+    """Remove benchmark chunks so repeated runs start from the same state."""
+    from benchmarks.corpus import CORPUS_PREFIX
+    from db_pool import get_connection
+
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('ai.pdf_documents')")
+        if cur.fetchone()[0] is not None:
+            cur.execute("DELETE FROM ai.pdf_documents WHERE name LIKE %s", (f"{CORPUS_PREFIX}\\_%",))
+
+def bench_thumbnails(run: BenchmarkRun, corpus: List[Path], workdir: Path) -> None:
+    from document_extraction import extract_document
+
+    thumbnails_dir = workdir / "bench_thumbnails"
+    thumbnails_dir.mkdir(exist_ok=True)
+    samples: Dict[str, List[float]] = {}
+    for path in corpus:
+        kind = path.suffix.lstrip(".")
+        _, elapsed = timed_ms(extract_document, path, path.suffix, thumbnails_dir, str(uuid.uuid4()))
+        samples.setdefault(kind, []).append(elapsed)
+    for kind, values in samples.items():
+        run.record(f"thumbnails.{kind}.extract_ms", values)
+    shutil.rmtree(thumbnails_dir, ignore_errors=True)
+
+def _synthetic_metadata(index: int, rng: random.Random) -> Dict[str, Any]:
+    doc_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    return {
+        "id": doc_id,
+        "title": f"Synthetic Book {index}",
+        "author": f"Author {index % 977}",
+        "page_count": rng.randint(50, 900),
+        "original_filename": f"synthetic_book_{index:06d}.pdf",
+        "stored_filename": f"synthetic_book_{index:06d}.pdf",
+        "file_extension": ".pdf",
+        "added_at": datetime.fromtimestamp(1_600_000_000 + index * 60).isoformat(),
+        "file_size": rng.randint(100_000, 50_000_000),
+        "sha256": f"{index:064x}",
+        "thumbnail_path": f"thumbnails/{doc_id}.jpg",
+        "thumbnail_variants": {"grid": f"{doc_id}_grid.webp", "retina": f"{doc_id}_retina.webp"},
+        "text_preview": "lorem ipsum " * 20,
+    }
+
+# /documents page size, and the page timed deep in the listing (page 1000 of a 100k catalog)
+LISTING_PAGE_SIZE = 50
+LISTING_DEEP_PAGE = 1000
+
+def bench_listing(run: BenchmarkRun, sizes: List[int], repeats: int, workdir: Path) -> None:
+    from library_catalog import LibraryCatalog
+    from document_index import DocumentIndex, merge_library_and_db_documents
+
+    for size in sizes:
+        rng = random.Random(size)
+        catalog_path = workdir / f"bench_catalog_{size}.db"
+        catalog_path.unlink(missing_ok=True)
+        catalog = LibraryCatalog(catalog_path)
+        library = [_synthetic_metadata(index, rng) for index in range(size)]
+        catalog.put_many(library)
+
+        # Half of the library is also in pgvector, as happens mid-ingest or after failures
+        db_documents = [
+            {
+                "id": str(uuid.uuid5(uuid.NAMESPACE_URL, doc["original_filename"].split(".")[0])),
+                "filename": doc["original_filename"].split(".")[0],
+                "chunk_count": rng.randint(10, 2000),
+                "ingested_at": doc["added_at"],
+            }
+            for doc in library[::2]
+        ]
+
+        # Pages the way /documents serves them: keyset cursors, on the first page and deep in the listing
+        for sort in ("added_at", "title"):
+            descending = sort == "added_at"
+            deep_page = min(LISTING_DEEP_PAGE, size // LISTING_PAGE_SIZE)
+            after, cursors = None, {}
+            for page in range(1, deep_page + 1):
+                cursors[page] = after
+                _, after = catalog.query(sort=sort, descending=descending, limit=LISTING_PAGE_SIZE, after=after)
+            for page in sorted({1, deep_page}):
+                run.record(f"listing.{size}.{sort}.page_{page}_ms", [
+                    timed_ms(catalog.query, sort=sort, descending=descending, limit=LISTING_PAGE_SIZE, after=cursors[page])[1]
+                    for _ in range(repeats * 5)
+                ])
+        run.record(f"listing.{size}.full_ms", [timed_ms(catalog.query)[1] for _ in range(repeats)])
+        documents, _ = catalog.query()
+        run.record(f"listing.{size}.index_build_ms", [timed_ms(DocumentIndex, db_documents)[1] for _ in range(repeats)])
+        index = DocumentIndex(db_documents)
+        run.record(f"listing.{size}.merge_ms", [timed_ms(merge_library_and_db_documents, documents, index)[1] for _ in range(repeats)])
+
+        catalog.close()
+        catalog_path.unlink(missing_ok=True)
+
+def _format(path: Path) -> str:
+    return path.suffix.lstrip(".").lower()
+
+def _section_count(metadata: Dict[str, Any]) -> int:
+    """Pages of a PDF, spine sections of an eBook."""
+    return metadata.get("page_count") or metadata.get("section_count") or 1
+
+def bench_reader(run: BenchmarkRun, corpus: List[Path], repeats: int) -> None:
+    """Text extraction + chunking throughput of the RAG reader per format, without embedding."""
+    from pdf_reader_custom import FilteredPDFReader
+
+    # Same chunking as the knowledge base's reader
+    reader = FilteredPDFReader(chunk=True, chunk_size=800, chunk_overlap=200)
+    samples: Dict[str, Dict[str, List[float]]] = {}
+    for path in corpus:
+        per_format = samples.setdefault(_format(path), {"ms_per_page": [], "ms_per_chunk": []})
+        for _ in range(repeats):
+            started = time.perf_counter()
+            pages = set()
+            chunks = 0
+            for chunk in reader.iter_documents(path):
+                pages.add(chunk.meta_data.get("page"))
+                chunks += 1
+            elapsed = (time.perf_counter() - started) * 1000
+            per_format["ms_per_page"].append(elapsed / max(1, len(pages)))
+            if chunks:
+                per_format["ms_per_chunk"].append(elapsed / chunks)
+
+    for fmt, metrics in samples.items():
+        run.record(f"reader.{fmt}.ms_per_page", metrics["ms_per_page"])
+        run.record(f"reader.{fmt}.ms_per_chunk", metrics["ms_per_chunk"])
+
+def bench_ingest(run: BenchmarkRun, corpus: List[Path]) -> List[Dict[str, Any]]:
+    """
+    Add every corpus book to the library and ingest it for RAG, recording per-format
+    throughput (per PDF page or eBook section, and per chunk). Returns the library metadata.
+    """
+    from library_manager import get_library_manager
+    from ingestion import ingest_document_for_rag
+
+    library_manager = get_library_manager()
+    add_ms = []
+    samples: Dict[str, Dict[str, List[float]]] = {}
+    ingested = []
+    for path in corpus:
+        metadata, elapsed = timed_ms(library_manager.add_document, str(path), path.name)
+        add_ms.append(elapsed)
+
+        per_format = samples.setdefault(_format(path), {"ms_per_page": [], "ms_per_chunk": [], "reingest_ms_per_page": []})
+        pages = _section_count(metadata)
+        stored_path = library_manager.get_document_file_path(metadata["id"])
+        chunks, elapsed = timed_ms(ingest_document_for_rag, stored_path, metadata["id"], path.name, page_count=pages)
+        per_format["ms_per_page"].append(elapsed / pages)
+        if chunks:
+            per_format["ms_per_chunk"].append(elapsed / chunks)
+
+        # Same content again: exercises chunk-level embedding reuse
+        _, elapsed = timed_ms(ingest_document_for_rag, stored_path, metadata["id"], path.name, page_count=pages)
+        per_format["reingest_ms_per_page"].append(elapsed / pages)
+        ingested.append(metadata)
+
+    run.record("ingest.library_add_ms", add_ms)
+    for fmt, metrics in samples.items():
+        for name, values in metrics.items():
+            run.record(f"ingest.{fmt}.{name}", values)
+    return ingested
+
+def bench_retrieval(run: BenchmarkRun, documents: List[Dict[str, Any]], query_count: int) -> None:
+    from agent import create_document_specific_knowledge_base, get_rag_agent
+    from retrieval_cache import embedding_cache, retrieval_cache
+    from benchmarks.corpus import vocabulary
+
+    words = vocabulary(random.Random(0))
+    rng = random.Random(42)
+    queries = [" ".join(rng.sample(words[:300], 3)) for _ in range(query_count)]
+
+    cold, warm, first_token, total = [], [], [], []
+    for metadata in documents:
+        knowledge_base = create_document_specific_knowledge_base(metadata["original_filename"], metadata["id"])
+        embedding_cache.clear()
+        retrieval_cache.clear()
+        for query in queries:
+            chunks, elapsed = timed_ms(knowledge_base.search, query)
+            if not chunks:
+                # An empty scoped search would make both timings (and the cache) meaningless
+                raise RuntimeError(f"Scoped search for {query!r} found no chunks of {metadata['original_filename']}")
+            cold.append(elapsed)
+        hits_before = retrieval_cache.stats()["hits"]
+        warm.extend(timed_ms(knowledge_base.search, query)[1] for query in queries)
+        if retrieval_cache.stats()["hits"] - hits_before < len(queries):
+            raise RuntimeError("Repeated scoped searches were not served from the retrieval cache")
+
+        agent = get_rag_agent(document_filter=metadata["original_filename"], document_id=metadata["id"])
+        for query in queries[: max(1, query_count // 4)]:
+            started = time.perf_counter()
+            first = None
+            for chunk in agent.run(query, stream=True):
+                if first is None and getattr(chunk, "content", chunk):
+                    first = (time.perf_counter() - started) * 1000
+            total.append((time.perf_counter() - started) * 1000)
+            if first is not None:
+                first_token.append(first)
+
+    run.record("retrieval.search_cold_ms", cold)
+    run.record("retrieval.search_cached_ms", warm)
+    run.record("chat.first_token_ms", first_token)
+    run.record("chat.total_ms", total)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the Calibre-AI backend benchmarks")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Comma-separated subset of {', '.join(SUITES)}")
+    parser.add_argument("--corpus-dir", type=Path, default=BENCHMARKS_DIR / "corpus")
+    parser.add_argument("--pdfs", type=int, default=3)
+    parser.add_argument("--epubs", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=50, help="Pages per PDF / chapters per EPUB")
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--listing-sizes", default="10000,100000")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--database", default=os.getenv("BENCH_POSTGRES_DB", "calibre_ai_bench"),
+                        help="Scratch database on the configured Postgres server (never the real one)")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--embed-item-latency-ms", type=float, default=0.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=0.0)
+    parser.add_argument("--token-latency-ms", type=float, default=0.0)
+    parser.add_argument("--workdir", type=Path, default=None, help="Scratch data directory (default: a temp dir)")
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"Unknown suites: {', '.join(sorted(unknown))}")
+
+    from benchmarks.corpus import generate_corpus
+    from benchmarks.fake_ollama import FakeOllamaServer
+
+    corpus_dir = args.corpus_dir.resolve()
+    output_dir = args.output.resolve()
+    workdir = (args.workdir or Path(tempfile.mkdtemp(prefix="calibre-ai-bench-"))).resolve()
+    print(f"📚 Generating corpus in {corpus_dir}")
+    corpus = generate_corpus(corpus_dir, args.pdfs, args.epubs, args.pages, args.words_per_page)
+
+    fake_ollama = FakeOllamaServer(
+        embed_latency=args.embed_latency_ms / 1000,
+        embed_item_latency=args.embed_item_latency_ms / 1000,
+        chat_latency=args.chat_latency_ms / 1000,
+        token_latency=args.token_latency_ms / 1000,
+    ).start()
+    prepare_environment(args, workdir, fake_ollama.url)
+
+    params = {key: (str(value) if isinstance(value, Path) else value) for key, value in vars(args).items()}
+    params.pop("workdir", None)
+    params.pop("output", None)
+    run = BenchmarkRun(params)
+
+    try:
+        if DATABASE_SUITES & set(suites):
+            ensure_database()
+            cleanup_database()
+
+        ingested: List[Dict[str, Any]] = []
+        for suite in suites:
+            print(f"⏱️ {suite}")
+            if suite == "thumbnails":
+                bench_thumbnails(run, corpus, workdir)
+            elif suite == "listing":
+                sizes = [int(size) for size in args.listing_sizes.split(",") if size.strip()]
+                bench_listing(run, sizes, args.repeats, workdir)
+            elif suite == "reader":
+                bench_reader(run, corpus, args.repeats)
+            elif suite == "ingest":
+                ingested = bench_ingest(run, corpus)
+            elif suite == "retrieval":
+                if not ingested:
+                    ingested = bench_ingest(BenchmarkRun(params), [path for path in corpus if path.suffix == ".pdf"][:1])
+                bench_retrieval(run, ingested, args.queries)
+
+        if DATABASE_SUITES & set(suites):
+            cleanup_database()
+    finally:
+        fake_ollama.stop()
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    path = run.save(output_dir)
+    print(f"💾 Results saved to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -24,10 +24,65 @@ class Config:
         """Construct database URL from environment variables."""
         return f"postgresql://{cls.POSTGRES_USER}:{cls.POSTGRES_PASSWORD}@{cls.POSTGRES_HOST}:{cls.POSTGRES_PORT}/{cls.POSTGRES_DB}"
     
+    # Connection Pool Configuration
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+    DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))  # All backend connections, engine included
+    DB_ENGINE_POOL_SIZE: int = int(os.getenv("DB_ENGINE_POOL_SIZE", "3"))  # Share of the above for phi's SQLAlchemy engine (vector search)
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # Seconds to wait for a free connection
+    DB_CONNECT_TIMEOUT: int = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))  # Seconds to establish a connection
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+    DB_POOL_HEALTH_CHECK: bool = os.getenv("DB_POOL_HEALTH_CHECK", "true").lower() == "true"
+    
     # Ollama Configuration
     OLLAMA_HOST: str = os.getenv("OLLAMA_HOST", "http://localhost:11434")
     CHAT_MODEL: str = os.getenv("CHAT_MODEL", "mistral:7b")
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+    OLLAMA_KEEP_ALIVE: str = os.getenv("OLLAMA_KEEP_ALIVE", "")  # How long preloaded models stay loaded, e.g. 30m (empty = Ollama default)
+    
+    # Warm-up
+    WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"  # Build the knowledge base before /ready
+    WARMUP_PRELOAD_MODELS: bool = os.getenv("WARMUP_PRELOAD_MODELS", "true").lower() == "true"  # Load Ollama models during warm-up
+    
+    # PDF Text Extraction
+    PDF_EXTRACT_WORKERS: int = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))  # Extraction processes
+    PDF_PAGES_PER_TASK: int = int(os.getenv("PDF_PAGES_PER_TASK", "32"))  # Pages per extraction task
+    PDF_PARALLEL_MIN_PAGES: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))  # Smaller PDFs stay in-process
+    
+    # Embedding Pipeline
+    EMBED_BATCH_SIZE: int = int(os.getenv("EMBED_BATCH_SIZE", "32"))  # Chunks per embedding request
+    EMBED_MAX_IN_FLIGHT: int = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))  # Concurrent embedding requests
+    EMBED_MAX_RETRIES: int = int(os.getenv("EMBED_MAX_RETRIES", "3"))
+    EMBED_RETRY_BACKOFF: float = float(os.getenv("EMBED_RETRY_BACKOFF", "1.0"))  # Seconds, doubled per retry
+    EMBED_REUSE_EXISTING: bool = os.getenv("EMBED_REUSE_EXISTING", "true").lower() == "true"  # Copy embeddings of identical chunks
+    
+    # Background Ingestion
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", "2"))  # Concurrent ingestion jobs
+    UPLOAD_DUPLICATES: str = os.getenv("UPLOAD_DUPLICATES", "resolve")  # resolve, alias or keep
+    
+    # Stage Concurrency (separate pools, so heavy ingestion can't starve light endpoints)
+    DB_STAGE_WORKERS: int = int(os.getenv("DB_STAGE_WORKERS", "8"))  # Threads for database queries from handlers
+    DISK_STAGE_WORKERS: int = int(os.getenv("DISK_STAGE_WORKERS", "4"))  # Threads for uploads, catalog and file reads
+    CHAT_STAGE_WORKERS: int = int(os.getenv("CHAT_STAGE_WORKERS", "8"))  # Threads for agent setup and generation
+    RENDER_WORKERS: int = int(os.getenv("RENDER_WORKERS", "2"))  # Processes for metadata and thumbnails (0 = in-thread)
+    
+    # Chat Agent Cache
+    AGENT_CACHE_SIZE: int = int(os.getenv("AGENT_CACHE_SIZE", "64"))  # Max agents kept in memory
+    AGENT_CACHE_TTL: float = float(os.getenv("AGENT_CACHE_TTL", "1800"))  # Idle seconds before eviction (0 = never)
+    AGENT_PRELOAD: str = os.getenv("AGENT_PRELOAD", "")  # Comma-separated document ids to build at startup
+    
+    # Document Listing
+    DOCUMENTS_PAGE_SIZE: int = int(os.getenv("DOCUMENTS_PAGE_SIZE", "100"))  # Page size when a cursor is given without a limit
+    DOCUMENTS_MAX_PAGE_SIZE: int = int(os.getenv("DOCUMENTS_MAX_PAGE_SIZE", "500"))
+    
+    # Retrieval Caches
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))  # Cached query embeddings
+    RETRIEVAL_CACHE_SIZE: int = int(os.getenv("RETRIEVAL_CACHE_SIZE", "4096"))  # Cached top-k results
+    
+    # Thumbnails
+    THUMBNAIL_SIZES: str = os.getenv("THUMBNAIL_SIZES", "grid:300x400,retina:600x800,detail:900x1200")  # name:WIDTHxHEIGHT
+    THUMBNAIL_FORMAT: str = os.getenv("THUMBNAIL_FORMAT", "webp").lower()  # jpeg or webp
+    THUMBNAIL_QUALITY: int = int(os.getenv("THUMBNAIL_QUALITY", "85"))
+    THUMBNAIL_MAX_AGE: int = int(os.getenv("THUMBNAIL_MAX_AGE", "31536000"))  # Seconds clients may cache a thumbnail
     
     # Application Settings
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
@@ -46,12 +101,9 @@ class Config:
         if cls.JWT_SECRET == "dev-jwt-secret-change-in-production":
             print("⚠️  WARNING: Using default JWT_SECRET. Set JWT_SECRET environment variable for production!")
 
-# Create global config instance
+# Create global config instance (validated by the server at startup, not on import)
 config = Config()
 
-# Validate config on import
-config.validate_config()
-
 # Convenience exports
 DATABASE_URL = config.get_database_url()
 OLLAMA_HOST = config.OLLAMA_HOST
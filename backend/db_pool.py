@@ -0,0 +1,231 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Optional
+import logging
+
+import psycopg2
+import psycopg2.extensions
+
+from config import config, DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+class ConnectionPool:
+    """
+    Thread-safe PostgreSQL connection pool shared by all backend DB access.
+
+    - At most `max_size` connections are open at once; callers wait up to `timeout`
+      for a free one instead of failing immediately.
+    - Returned connections are kept idle for reuse; `min_size` are opened up front.
+    - A liveness check on checkout replaces dead connections.
+    - Checked-out and idle counts are tracked here, for saturation monitoring.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int,
+        max_size: int,
+        timeout: float,
+        connect_timeout: int,
+        statement_timeout_ms: int,
+        health_check: bool = True,
+    ):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check = health_check
+        self._dsn = dsn
+        self._connect_kwargs = {
+            "connect_timeout": connect_timeout,
+            "options": f"-c statement_timeout={statement_timeout_ms}",
+        }
+
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._stats_lock = threading.Lock()
+        self._idle: Deque[Any] = deque()
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._replaced = 0
+        self._total_wait = 0.0
+
+        for _ in range(min(min_size, max_size)):
+            self._idle.append(self._connect())
+
+    def _connect(self):
+        return psycopg2.connect(self._dsn, **self._connect_kwargs)
+
+    def _is_alive(self, conn) -> bool:
+        if conn.closed:
+            return False
+        if not self.health_check:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        with self._stats_lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            return self._connect()
+        if not self._is_alive(conn):
+            # Drop the dead connection and open a fresh one in its place
+            conn.close()
+            with self._stats_lock:
+                self._replaced += 1
+            return self._connect()
+        return conn
+
+    def _checkin(self, conn) -> None:
+        if conn.closed:
+            return
+        if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                conn.close()
+                return
+        with self._stats_lock:
+            self._idle.append(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of a with-block.
+        Commits on success, rolls back on error, and always returns the connection.
+        """
+        started = time.perf_counter()
+        with self._stats_lock:
+            self._waiting += 1
+        acquired = self._slots.acquire(timeout=self.timeout)
+        waited = time.perf_counter() - started
+        with self._stats_lock:
+            self._waiting -= 1
+            self._total_wait += waited
+            if not acquired:
+                self._timeouts += 1
+
+        if not acquired:
+            raise TimeoutError(f"Timed out after {self.timeout}s waiting for a database connection")
+
+        conn = None
+        try:
+            conn = self._checkout()
+            with self._stats_lock:
+                self._in_use += 1
+                self._checkouts += 1
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+        finally:
+            if conn is not None:
+                with self._stats_lock:
+                    self._in_use -= 1
+                self._checkin(conn)
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool saturation statistics."""
+        with self._stats_lock:
+            return {
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "saturation": self._in_use / self.max_size if self.max_size else 0.0,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "replaced_connections": self._replaced,
+                "avg_wait_ms": (self._total_wait / self._checkouts * 1000) if self._checkouts else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._stats_lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            conn.close()
+
+# Shared pool and SQLAlchemy engine, created on first use
+_pool: Optional[ConnectionPool] = None
+_engine = None
+_init_lock = threading.Lock()
+
+def _engine_pool_size() -> int:
+    """Connections reserved for phi's SQLAlchemy engine, out of DB_POOL_MAX_SIZE."""
+    return max(1, min(config.DB_ENGINE_POOL_SIZE, config.DB_POOL_MAX_SIZE - 1))
+
+def get_pool() -> ConnectionPool:
+    """
+    Get the process-wide connection pool.
+    It gets what is left of DB_POOL_MAX_SIZE after the engine's share, so both
+    together never open more than DB_POOL_MAX_SIZE connections.
+    """
+    global _pool
+    if _pool is None:
+        with _init_lock:
+            if _pool is None:
+                max_size = max(1, config.DB_POOL_MAX_SIZE - _engine_pool_size())
+                _pool = ConnectionPool(
+                    DATABASE_URL,
+                    min_size=config.DB_POOL_MIN_SIZE,
+                    max_size=max_size,
+                    timeout=config.DB_POOL_TIMEOUT,
+                    connect_timeout=config.DB_CONNECT_TIMEOUT,
+                    statement_timeout_ms=config.DB_STATEMENT_TIMEOUT_MS,
+                    health_check=config.DB_POOL_HEALTH_CHECK,
+                )
+                logger.info(f"🔌 Created database connection pool (max {max_size} connections)")
+    return _pool
+
+def get_connection():
+    """Borrow a connection from the shared pool (use as a context manager)."""
+    return get_pool().connection()
+
+def get_sqlalchemy_engine():
+    """
+    Get the shared SQLAlchemy engine used by phi's PgVector.
+    It is limited to DB_ENGINE_POOL_SIZE connections (taken out of DB_POOL_MAX_SIZE)
+    and health-checked with the same settings as the psycopg2 pool.
+    """
+    global _engine
+    if _engine is None:
+        with _init_lock:
+            if _engine is None:
+                from sqlalchemy import create_engine
+                _engine = create_engine(
+                    DATABASE_URL,
+                    pool_size=_engine_pool_size(),
+                    max_overflow=0,
+                    pool_timeout=config.DB_POOL_TIMEOUT,
+                    pool_pre_ping=config.DB_POOL_HEALTH_CHECK,
+                    connect_args={
+                        "connect_timeout": config.DB_CONNECT_TIMEOUT,
+                        "options": f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}",
+                    },
+                )
+    return _engine
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Saturation statistics for the psycopg2 pool and the SQLAlchemy engine pool."""
+    stats: Dict[str, Any] = {"psycopg2": _pool.stats() if _pool else None, "sqlalchemy": None}
+    if _engine is not None:
+        engine_pool = _engine.pool
+        stats["sqlalchemy"] = {
+            "max_size": engine_pool.size(),
+            "in_use": engine_pool.checkedout(),
+            "idle": engine_pool.checkedin(),
+            "saturation": engine_pool.checkedout() / engine_pool.size() if engine_pool.size() else 0.0,
+        }
+    return stats
@@ -1,48 +1,52 @@
-import psycopg2
+import json
 import uuid
-from typing import List, Dict, Any, Optional
+from typing import Iterable, List, Dict, Any, Optional
 import logging
+import threading
+from functools import lru_cache
 from uuid import UUID
-from config import DATABASE_URL
+from psycopg2.errors import UndefinedTable
+from db_pool import get_connection
+from document_index import DocumentIndex
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Cached filename index over the pgvector documents, rebuilt after ingest/remove
+_document_index: Optional[DocumentIndex] = None
+_document_index_lock = threading.Lock()
+
 def get_document_list_from_db() -> List[Dict[str, Any]]:
     """
     Retrieves a list of all documents from the database with their chunk counts.
     Works with the actual pgvector table structure.
     """
-    db_url = DATABASE_URL
-    conn = None
     try:
-        conn = psycopg2.connect(db_url)
-        cur = conn.cursor()
-        
-        # Query that works with the actual table structure
-        # Get unique document names and their creation info
-        query = """
-            SELECT 
-                name,
-                COUNT(*) as chunk_count,
-                MIN(created_at) as first_created,
-                MAX(updated_at) as last_updated
-            FROM 
-                ai.pdf_documents
-            WHERE 
-                name IS NOT NULL
-            GROUP BY 
-                name
-            ORDER BY 
-                MAX(updated_at) DESC;
-        """
-        
-        cur.execute(query)
+        with get_connection() as conn, conn.cursor() as cur:
+            # Query that works with the actual table structure
+            # Get unique document names and their creation info
+            query = """
+                SELECT 
+                    name,
+                    COUNT(*) as chunk_count,
+                    MIN(created_at) as first_created,
+                    MAX(updated_at) as last_updated
+                FROM 
+                    ai.pdf_documents
+                WHERE 
+                    name IS NOT NULL
+                GROUP BY 
+                    name
+                ORDER BY 
+                    MAX(updated_at) DESC;
+            """
+            
+            cur.execute(query)
+            rows = cur.fetchall()
         
         documents = []
-        for row in cur.fetchall():
+        for row in rows:
             # Generate a UUID for the document based on its name
-            import uuid
             doc_id = str(uuid.uuid5(uuid.NAMESPACE_URL, row[0]))
             
             documents.append({
@@ -56,22 +60,211 @@ def get_document_list_from_db() -> List[Dict[str, Any]]:
     except Exception as e:
         logger.error(f"❌ Error fetching document list: {e}")
         raise
-    finally:
-        if conn:
-            conn.close()
+
+def chunk_table_exists() -> bool:
+    """Whether phi has created the chunk table yet (it does on the first load or ingest)."""
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('ai.pdf_documents') IS NOT NULL")
+        return cur.fetchone()[0]
+
+def ensure_document_scope_filters(batch_size: int = 5000) -> int:
+    """
+    Make every chunk filterable by document inside the vector query.
+    phi's PgVector.search applies search filters to the `filters` column (`filters @> ...`),
+    which its own load() leaves empty. Rows missing their scope get it copied in: the chunk
+    name, plus the library document id from meta_data for library chunks (see
+    document_scope_filters). The column is then indexed for containment.
+    Returns the number of rows updated.
+
+    Rows are walked in primary-key batches, each its own short transaction, so a large
+    table never runs into the pool's statement timeout.
+    """
+    if not chunk_table_exists():
+        return 0
+    
+    updated = 0
+    last_id = ""
+    while True:
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT id FROM ai.pdf_documents WHERE id > %s ORDER BY id LIMIT %s",
+                (last_id, batch_size),
+            )
+            ids = [row[0] for row in cur.fetchall()]
+            if not ids:
+                break
+            cur.execute(
+                """
+                WITH scopes AS (
+                    SELECT id, jsonb_build_object('document_name', name)
+                        || CASE WHEN meta_data ? 'document_id'
+                            THEN jsonb_build_object('document_id', meta_data->>'document_id')
+                            ELSE '{}'::jsonb END AS scope
+                    FROM ai.pdf_documents
+                    WHERE id = ANY(%s) AND name IS NOT NULL
+                )
+                UPDATE ai.pdf_documents d
+                SET filters = COALESCE(d.filters, '{}'::jsonb) || scopes.scope
+                FROM scopes
+                WHERE d.id = scopes.id
+                AND NOT COALESCE(d.filters, '{}'::jsonb) @> scopes.scope
+                """,
+                (ids,),
+            )
+            updated += cur.rowcount
+        last_id = ids[-1]
+    
+    with get_connection() as conn, conn.cursor() as cur:
+        # Building the index scans the whole table once; let it take as long as it needs
+        cur.execute("SET LOCAL statement_timeout = 0")
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS pdf_documents_filters_idx
+            ON ai.pdf_documents USING gin (filters jsonb_path_ops)
+        """)
+    
+    if updated:
+        logger.info(f"🏷️ Tagged {updated} chunks with their document scope")
+    return updated
+
+def delete_stale_chunks(document_id: str, keep_ids: Iterable[str]) -> int:
+    """
+    Delete a library document's chunks whose ids are not in keep_ids: leftovers of an earlier
+    ingest that produced more chunks (e.g. before an extractor change). Rows are found through
+    the indexed `filters` column. Returns the number of rows deleted.
+    """
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM ai.pdf_documents WHERE filters @> %s::jsonb AND NOT (id = ANY(%s))",
+            (json.dumps({"document_id": document_id}), list(keep_ids)),
+        )
+        return cur.rowcount
+
+def fetch_chunks_by_ids(chunk_ids: List[str]) -> List[Dict[str, Any]]:
+    """
+    Fetch stored chunks by primary key, in the order of the given ids.
+    Ids that no longer exist are skipped.
+    """
+    if not chunk_ids:
+        return []
+    
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT id, name, meta_data, content FROM ai.pdf_documents WHERE id = ANY(%s)",
+            (list(chunk_ids),),
+        )
+        rows = {row[0]: row for row in cur.fetchall()}
+    
+    return [
+        {"id": rows[chunk_id][0], "name": rows[chunk_id][1], "meta_data": rows[chunk_id][2] or {}, "content": rows[chunk_id][3]}
+        for chunk_id in chunk_ids
+        if chunk_id in rows
+    ]
+
+def get_document_index() -> DocumentIndex:
+    """
+    Get the cached filename index over the documents stored in the database.
+    The index is built once and reused until invalidate_document_index() is called.
+    """
+    global _document_index
+    with _document_index_lock:
+        if _document_index is None:
+            _document_index = DocumentIndex(get_document_list_from_db())
+        return _document_index
+
+def invalidate_document_index() -> None:
+    """Drop the cached document index; call after documents are ingested or removed."""
+    global _document_index
+    with _document_index_lock:
+        _document_index = None
+
+def ensure_document_uuid_table(cur) -> None:
+    """Create the UUID -> document name mapping table if it doesn't exist."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS ai.document_uuids (
+            document_id UUID PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    """)
+
+def register_document_names(names: List[str]) -> None:
+    """Record the generated UUIDs of newly ingested document names."""
+    if not names:
+        return
+    
+    with get_connection() as conn, conn.cursor() as cur:
+        ensure_document_uuid_table(cur)
+        cur.executemany(
+            """
+            INSERT INTO ai.document_uuids (document_id, name)
+            VALUES (%s, %s)
+            ON CONFLICT DO NOTHING
+            """,
+            [(str(uuid.uuid5(uuid.NAMESPACE_URL, name)), name) for name in names],
+        )
+
+def backfill_document_uuids() -> int:
+    """
+    Fill the UUID mapping for document names already stored in pgvector.
+    Only names missing from the mapping are inserted; returns how many were added.
+    """
+    if not chunk_table_exists():
+        return 0
+    
+    with get_connection() as conn, conn.cursor() as cur:
+        ensure_document_uuid_table(cur)
+        # A full scan of the chunk table, run once in the background at startup
+        cur.execute("SET LOCAL statement_timeout = 0")
+        cur.execute("""
+            SELECT DISTINCT d.name
+            FROM ai.pdf_documents d
+            WHERE d.name IS NOT NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM ai.document_uuids u WHERE u.name = d.name
+            )
+        """)
+        names = [row[0] for row in cur.fetchall()]
+    
+    register_document_names(names)
+    if names:
+        logger.info(f"🔑 Backfilled UUID mapping for {len(names)} documents")
+    return len(names)
+
+@lru_cache(maxsize=1024)
+def _legacy_name_from_uuid(document_id: str) -> str:
+    """
+    Look up a legacy generated UUID in the mapping table.
+    The mapping never changes once written, so hits are kept in an in-process LRU;
+    misses raise and are not cached, since the name may be ingested later.
+    """
+    try:
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT name FROM ai.document_uuids WHERE document_id = %s",
+                (document_id,),
+            )
+            row = cur.fetchone()
+    except UndefinedTable:
+        # Nothing has been ingested yet, so no legacy document can match
+        row = None
+    
+    if row:
+        return row[0]
+    
+    raise ValueError(f"No document found for UUID: {document_id}")
 
 def get_filename_from_uuid(document_id: str) -> Optional[str]:
     """
     Get the filename from a document UUID by checking both library system and database.
     Returns the filename that matches the given UUID.
+    Library documents are looked up in the catalog on every call, so removed documents
+    stop resolving at once; only the immutable legacy mapping is cached.
     """
     # First, try to find in the new library system
     try:
-        from library_manager import LibraryManager
-        library_manager = LibraryManager()
+        from library_manager import get_library_manager
         
         # Check if this is a library document
-        metadata = library_manager.get_document_metadata(document_id)
+        metadata = get_library_manager().get_document_metadata(document_id)
         if metadata:
             # For library documents, use the original filename as the agent key
             return metadata['original_filename']
@@ -79,24 +272,10 @@ def get_filename_from_uuid(document_id: str) -> Optional[str]:
     except Exception as e:
         logger.warning(f"⚠️ Could not check library system for UUID {document_id}: {e}")
     
-    # If not found in library, try the old database system with generated UUIDs
-    conn_str = DATABASE_URL
-    conn = psycopg2.connect(conn_str)
-    
+    # If not found in library, look up the legacy generated UUID in the mapping table
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT DISTINCT name 
-                FROM ai.pdf_documents 
-                WHERE name IS NOT NULL
-            """)
-            results = cur.fetchall()
-            
-            for row in results:
-                filename = row[0]
-                if str(uuid.uuid5(uuid.NAMESPACE_URL, filename)) == document_id:
-                    return filename
-            
-            raise ValueError(f"No document found for UUID: {document_id}")
-    finally:
-        conn.close() 
\ No newline at end of file
+        UUID(document_id)
+    except ValueError:
+        raise ValueError(f"No document found for UUID: {document_id}")
+    
+    return _legacy_name_from_uuid(document_id)
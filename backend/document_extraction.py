@@ -0,0 +1,309 @@
+import posixpath
+import re
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from html import unescape
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+import logging
+
+from thumbnails import (
+    THUMBNAIL_SIZES,
+    render_pdf_page_thumbnails,
+    save_image_thumbnails,
+    open_cover_image,
+)
+
+logger = logging.getLogger(__name__)
+
+# Characters of body text kept as a preview
+TEXT_PREVIEW_LENGTH = 1000
+# Pages / spine items scanned for preview text before giving up
+PREVIEW_MAX_SECTIONS = 5
+
+NAMESPACES = {
+    "container": "urn:oasis:names:tc:opendocument:xmlns:container",
+    "opf": "http://www.idpf.org/2007/opf",
+    "dc": "http://purl.org/dc/elements/1.1/",
+}
+
+EBOOK_EXTENSIONS = ('.epub', '.mobi', '.azw', '.azw3')
+
+def empty_metadata() -> Dict[str, Any]:
+    """All metadata fields a library document carries, unset."""
+    return {
+        'title': None,
+        'author': None,
+        'subject': None,
+        'creator': None,
+        'producer': None,
+        'creation_date': None,
+        'modification_date': None,
+        'page_count': None,
+        'language': None,
+        'publisher': None,
+        'isbn': None,
+        'description': None,
+        'text_preview': None,
+    }
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_SKIPPED_BLOCK_RE = re.compile(r"<(script|style|head)\b[^>]*>.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_BREAK_RE = re.compile(r"<(?:br|/p|/div|/h[1-6]|/li|/tr|/blockquote)\b[^>]*>", re.IGNORECASE)
+_SPACES_RE = re.compile(r"[ \t\r\f\v]+")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+
+def html_to_text(markup: str) -> str:
+    """
+    Strip (X)HTML markup down to readable text.
+    Block-level closing tags become line breaks; scripts, styles and the head are dropped.
+    """
+    text = _SKIPPED_BLOCK_RE.sub(" ", markup)
+    text = _BREAK_RE.sub("\n", text)
+    text = _TAG_RE.sub(" ", text)
+    text = unescape(text)
+    text = _SPACES_RE.sub(" ", text)
+    text = _BLANK_LINES_RE.sub("\n\n", text)
+    return text.strip()
+
+def _preview(text: str) -> Optional[str]:
+    text = " ".join(text.split())
+    return text[:TEXT_PREVIEW_LENGTH] if text else None
+
+def extract_document(
+    file_path: Path, file_extension: str, thumbnails_dir: Path, doc_id: str
+) -> Tuple[Dict[str, Any], Dict[str, str], Dict[str, float]]:
+    """
+    Open a document once and produce its metadata (including page count and a
+    text preview) together with its cover thumbnails.
+    Returns (metadata, {thumbnail variant: filename}, {"metadata"/"thumbnail": seconds}).
+    Timings are returned rather than recorded because this usually runs in a worker process.
+    """
+    metadata = empty_metadata()
+    thumbnails: Dict[str, str] = {}
+    timings = {"thumbnail": 0.0}
+    started = time.perf_counter()
+
+    try:
+        if file_extension == '.pdf':
+            metadata_update, thumbnails = _extract_pdf(file_path, thumbnails_dir, doc_id, timings)
+            metadata.update(metadata_update)
+        elif file_extension == '.epub':
+            metadata_update, thumbnails = _extract_epub(file_path, thumbnails_dir, doc_id, timings)
+            metadata.update(metadata_update)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not extract metadata from {file_path}: {e}")
+
+    timings["metadata"] = time.perf_counter() - started - timings["thumbnail"]
+    return metadata, thumbnails, timings
+
+def _extract_pdf(file_path: Path, thumbnails_dir: Path, doc_id: str, timings: Dict[str, float]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Metadata, page count, preview and first-page thumbnails from a single PyMuPDF open."""
+    import fitz  # PyMuPDF
+
+    try:
+        with fitz.open(str(file_path)) as pdf_doc:
+            pdf_metadata = pdf_doc.metadata or {}
+            metadata = {
+                'title': pdf_metadata.get('title'),
+                'author': pdf_metadata.get('author'),
+                'subject': pdf_metadata.get('subject'),
+                'creator': pdf_metadata.get('creator'),
+                'producer': pdf_metadata.get('producer'),
+                'creation_date': pdf_metadata.get('creationDate'),
+                'modification_date': pdf_metadata.get('modDate'),
+                'page_count': pdf_doc.page_count,
+            }
+
+            for page_index in range(min(pdf_doc.page_count, PREVIEW_MAX_SECTIONS)):
+                preview = _preview(pdf_doc[page_index].get_text("text"))
+                if preview:
+                    metadata['text_preview'] = preview
+                    break
+
+            thumbnails = {}
+            if pdf_doc.page_count > 0:
+                started = time.perf_counter()
+                try:
+                    thumbnails = render_pdf_page_thumbnails(pdf_doc[0], thumbnails_dir, doc_id)
+                    logger.info(f"✅ Generated PDF thumbnails: {', '.join(thumbnails)}")
+                except Exception as e:
+                    logger.warning(f"⚠️ PyMuPDF thumbnail failed: {e}")
+                timings["thumbnail"] += time.perf_counter() - started
+            return metadata, thumbnails
+
+    except Exception as e:
+        logger.warning(f"⚠️ PyMuPDF extraction failed, trying PyPDF and pdf2image: {e}")
+        metadata = _extract_pdf_fallback(file_path)
+        started = time.perf_counter()
+        thumbnails = _render_pdf_fallback(file_path, thumbnails_dir, doc_id)
+        timings["thumbnail"] += time.perf_counter() - started
+        return metadata, thumbnails
+
+def _extract_pdf_fallback(file_path: Path) -> Dict[str, Any]:
+    """Metadata via pypdf, for files PyMuPDF cannot open."""
+    from pypdf import PdfReader
+
+    try:
+        with open(file_path, 'rb') as f:
+            pdf_reader = PdfReader(f)
+            pdf_info = pdf_reader.metadata
+            metadata = {'page_count': len(pdf_reader.pages)}
+
+            if pdf_info:
+                metadata.update({
+                    'title': pdf_info.get('/Title'),
+                    'author': pdf_info.get('/Author'),
+                    'subject': pdf_info.get('/Subject'),
+                    'creator': pdf_info.get('/Creator'),
+                    'producer': pdf_info.get('/Producer'),
+                    'creation_date': pdf_info.get('/CreationDate'),
+                    'modification_date': pdf_info.get('/ModDate'),
+                })
+            return metadata
+
+    except Exception as e:
+        logger.warning(f"⚠️ PyPDF metadata extraction also failed: {e}")
+        return {}
+
+def _render_pdf_fallback(file_path: Path, thumbnails_dir: Path, doc_id: str) -> Dict[str, str]:
+    """
+    First-page thumbnails via pdf2image, rasterized once at the tallest variant height.
+    Only the height is fixed, so the page keeps its aspect ratio; each variant is then
+    fitted into its box by save_image_thumbnails.
+    """
+    import pdf2image
+
+    if not THUMBNAIL_SIZES:
+        return {}
+    try:
+        pages = pdf2image.convert_from_path(
+            str(file_path),
+            first_page=1,
+            last_page=1,
+            size=(None, max(height for _, height in THUMBNAIL_SIZES.values())),
+            fmt='RGB'
+        )
+        if pages:
+            thumbnails = save_image_thumbnails(pages[0], thumbnails_dir, doc_id)
+            logger.info(f"✅ Generated PDF thumbnails with pdf2image: {', '.join(thumbnails)}")
+            return thumbnails
+
+    except Exception as e:
+        logger.warning(f"⚠️ pdf2image thumbnail also failed: {e}")
+    return {}
+
+def extract_pdf_page_range(pdf_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """
+    Extract text from pages [start, end) with PyMuPDF.
+    Runs in an extract worker process, so it lives here rather than next to the phi-based reader:
+    workers only import this lightweight module. Empty pages are dropped here so they never
+    cross the process boundary.
+    Returns (1-based page number, text) pairs in page order.
+    """
+    import fitz  # PyMuPDF
+
+    pages = []
+    with fitz.open(pdf_path) as pdf_doc:
+        for page_index in range(start, end):
+            text = pdf_doc[page_index].get_text("text")
+            if text and text.strip():
+                pages.append((page_index + 1, text))
+    return pages
+
+def read_epub_package(archive: zipfile.ZipFile) -> Tuple[str, ET.Element]:
+    """Locate and parse the OPF package document. Returns (OPF path, root element)."""
+    container = ET.fromstring(archive.read("META-INF/container.xml"))
+    rootfile = container.find(".//container:rootfile", NAMESPACES)
+    if rootfile is None:
+        raise ValueError("EPUB container has no rootfile")
+    opf_path = rootfile.get("full-path")
+    return opf_path, ET.fromstring(archive.read(opf_path))
+
+def epub_manifest(package: ET.Element, opf_path: str) -> Dict[str, Dict[str, str]]:
+    """Manifest items by id, with hrefs resolved to archive paths."""
+    base = posixpath.dirname(opf_path)
+    items = {}
+    for item in package.findall("opf:manifest/opf:item", NAMESPACES):
+        href = unquote(item.get("href", ""))
+        items[item.get("id")] = {
+            "path": posixpath.normpath(posixpath.join(base, href)) if base else href,
+            "media_type": item.get("media-type", ""),
+            "properties": item.get("properties", ""),
+        }
+    return items
+
+def _find_epub_cover(package: ET.Element, manifest: Dict[str, Dict[str, str]]) -> Optional[str]:
+    """Archive path of the cover image, as declared by the OPF manifest."""
+    # EPUB 3: manifest item flagged as the cover image
+    for item in manifest.values():
+        if "cover-image" in item["properties"].split():
+            return item["path"]
+
+    # EPUB 2: <meta name="cover" content="manifest-id"/>
+    for meta in package.findall("opf:metadata/opf:meta", NAMESPACES):
+        if meta.get("name") == "cover":
+            item = manifest.get(meta.get("content"))
+            if item and item["media_type"].startswith("image/"):
+                return item["path"]
+
+    # Last resort: an image whose manifest id or file name mentions "cover"
+    for item_id, item in manifest.items():
+        if item["media_type"].startswith("image/") and ("cover" in (item_id or "").lower() or "cover" in item["path"].lower()):
+            return item["path"]
+    return None
+
+def _dc_value(package: ET.Element, name: str) -> Optional[str]:
+    element = package.find(f"opf:metadata/dc:{name}", NAMESPACES)
+    if element is None or element.text is None:
+        return None
+    return element.text.strip() or None
+
+def _extract_epub(file_path: Path, thumbnails_dir: Path, doc_id: str, timings: Dict[str, float]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Metadata, preview and cover thumbnails reading only the OPF, the cover and the first spine items."""
+    with zipfile.ZipFile(file_path) as archive:
+        opf_path, package = read_epub_package(archive)
+        manifest = epub_manifest(package, opf_path)
+
+        metadata = {
+            'title': _dc_value(package, 'title'),
+            'author': _dc_value(package, 'creator'),
+            'publisher': _dc_value(package, 'publisher'),
+            'language': _dc_value(package, 'language'),
+            'description': _dc_value(package, 'description'),
+            'isbn': _dc_value(package, 'identifier'),
+            'subject': _dc_value(package, 'subject'),
+        }
+
+        spine = package.findall("opf:spine/opf:itemref", NAMESPACES)
+        # Spine sections stand in for pages when reporting eBook ingestion progress
+        metadata['section_count'] = len(spine)
+
+        # Preview from the first spine items with text
+        for itemref in spine[:PREVIEW_MAX_SECTIONS]:
+            item = manifest.get(itemref.get("idref"))
+            if not item:
+                continue
+            try:
+                preview = _preview(html_to_text(archive.read(item["path"]).decode("utf-8", errors="ignore")))
+            except KeyError:
+                continue
+            if preview:
+                metadata['text_preview'] = preview
+                break
+
+        thumbnails = {}
+        cover_path = _find_epub_cover(package, manifest)
+        if cover_path:
+            started = time.perf_counter()
+            try:
+                img = open_cover_image(archive.read(cover_path))
+                thumbnails = save_image_thumbnails(img, thumbnails_dir, doc_id)
+                logger.info(f"✅ Generated eBook thumbnails: {', '.join(thumbnails)}")
+            except Exception as e:
+                logger.warning(f"⚠️ eBook thumbnail generation failed: {e}")
+            timings["thumbnail"] += time.perf_counter() - started
+
+    return metadata, thumbnails
@@ -0,0 +1,140 @@
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional
+
+def _strip_extension(filename: str) -> str:
+    """Drop the last extension, the same way the legacy matcher did."""
+    return filename.rsplit('.', 1)[0]
+
+def get_document_name(filename: str) -> str:
+    """
+    Name under which a document's chunks are stored in pgvector.
+    Matches what PDFKnowledgeBase derives from a file path (everything before the first dot),
+    so it maps both library filenames and legacy chunk names to the stored name.
+    """
+    return Path(filename).name.split(".")[0]
+
+def document_scope_filters(document_name: str, document_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Value of a chunk's `filters` column, and the filter that scopes a search to its document.
+    phi's PgVector.search matches `filters @> <search filters>`, so both sides must agree.
+
+    Library chunks also carry their catalog id, which is what scopes a library document:
+    names are filename stems, shared by "Vol. 1.pdf" and "Vol. 2.pdf" or by two uploads
+    of the same file. Legacy data/pdf_files chunks only have the name.
+    """
+    filters = {"document_name": document_name}
+    if document_id:
+        filters["document_id"] = document_id
+    return filters
+
+class DocumentIndex:
+    """
+    Hash index over the documents stored in pgvector, keyed by filename.
+
+    A library file matches a database document when:
+    - the names are equal,
+    - the database name equals the library name without its extension, or
+    - the library name equals the database name without its extension.
+
+    Lookups are O(1) per library document, and the first matching database
+    document (in database order) wins, as with the previous nested loops.
+    """
+
+    def __init__(self, db_documents: List[Dict[str, Any]]):
+        self.documents = db_documents
+        self._by_name: Dict[str, int] = {}
+        self._by_stem: Dict[str, List[int]] = {}
+
+        for position, db_doc in enumerate(db_documents):
+            filename = db_doc["filename"]
+            self._by_name.setdefault(filename, position)
+            self._by_stem.setdefault(_strip_extension(filename), []).append(position)
+
+    def _matching_positions(self, original_filename: str) -> List[int]:
+        positions = []
+        exact = self._by_name.get(original_filename)
+        if exact is not None:
+            positions.append(exact)
+        without_extension = self._by_name.get(_strip_extension(original_filename))
+        if without_extension is not None:
+            positions.append(without_extension)
+        positions.extend(self._by_stem.get(original_filename, ()))
+        return sorted(set(positions))
+
+    def match(self, original_filename: str) -> Optional[Dict[str, Any]]:
+        """Return the first database document matching a library filename."""
+        positions = self._matching_positions(original_filename)
+        if not positions:
+            return None
+        return self.documents[positions[0]]
+
+    def match_all(self, original_filename: str) -> List[Dict[str, Any]]:
+        """Return every database document matching a library filename, in database order."""
+        return [self.documents[p] for p in self._matching_positions(original_filename)]
+
+def _legacy_entry(db_doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": db_doc["id"],
+        "filename": db_doc["filename"],
+        "original_filename": db_doc["filename"],
+        "chunk_count": db_doc.get("chunk_count", 0),
+        "ingested_at": db_doc.get("ingested_at"),
+        "thumbnail_url": None
+    }
+
+def legacy_db_documents(index: DocumentIndex, library_filenames: Iterable[str]) -> List[Dict[str, Any]]:
+    """Entries for database documents that match none of the given library filenames."""
+    matched_db_filenames = set()
+    for original_filename in library_filenames:
+        matched_db_filenames.update(db_doc["filename"] for db_doc in index.match_all(original_filename))
+    return [_legacy_entry(db_doc) for db_doc in index.documents if db_doc["filename"] not in matched_db_filenames]
+
+def merge_library_and_db_documents(
+    library_documents: List[Dict[str, Any]],
+    index: DocumentIndex,
+    include_legacy: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Merge library entries with their pgvector aggregates in linear time.
+    Database documents that match no library entry are appended as legacy entries,
+    unless include_legacy is False (when merging one page of a larger listing).
+    """
+    documents = []
+    matched_db_filenames = set()
+
+    for lib_doc in library_documents:
+        doc_info = {
+            "id": lib_doc["id"],
+            "filename": lib_doc.get("title") or lib_doc["original_filename"],
+            "original_filename": lib_doc["original_filename"],
+            "author": lib_doc.get("author"),
+            "page_count": lib_doc.get("page_count"),
+            "file_size": lib_doc.get("file_size"),
+            "file_extension": lib_doc.get("file_extension"),
+            "added_at": lib_doc["added_at"],
+            "chunk_count": 0,  # Default value
+            "thumbnail_url": None
+        }
+
+        # Add thumbnail URL if available (variant-aware documents accept ?size=)
+        if lib_doc.get("thumbnail_variants"):
+            doc_info["thumbnail_url"] = f"/thumbnails/{lib_doc['id']}"
+        elif lib_doc.get("thumbnail_path"):
+            doc_info["thumbnail_url"] = f"/thumbnails/{lib_doc['id']}.jpg"
+
+        matches = index.match_all(lib_doc["original_filename"])
+        if matches:
+            matched_db_doc = matches[0]
+            doc_info["chunk_count"] = matched_db_doc.get("chunk_count", 0)
+            doc_info["ingested_at"] = matched_db_doc.get("ingested_at")
+            matched_db_filenames.update(db_doc["filename"] for db_doc in matches)
+
+        documents.append(doc_info)
+
+    # Only include database documents that truly don't match any library documents (legacy)
+    if include_legacy:
+        for db_doc in index.documents:
+            if db_doc["filename"] not in matched_db_filenames:
+                documents.append(_legacy_entry(db_doc))
+
+    return documents
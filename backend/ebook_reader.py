@@ -0,0 +1,83 @@
+import re
+import shutil
+import zipfile
+from pathlib import Path
+from typing import Iterator, Tuple
+import logging
+
+from document_extraction import NAMESPACES, epub_manifest, html_to_text, read_epub_package
+
+logger = logging.getLogger(__name__)
+
+MOBI_EXTENSIONS = ('.mobi', '.azw', '.azw3')
+_HTML_MEDIA_TYPES = ("application/xhtml+xml", "text/html")
+
+# Old-style MOBI books are one HTML file with Kindle page breaks between sections
+_MOBI_PAGEBREAK_RE = re.compile(r"<mbp:pagebreak\s*/?>", re.IGNORECASE)
+
+def mobi_supported() -> bool:
+    """MOBI/AZW text needs the optional `mobi` package."""
+    try:
+        import mobi  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def iter_epub_sections(epub_path: Path) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (1-based spine position, text) for every spine item with text, in reading order.
+    Items are read and stripped one at a time, so memory doesn't grow with book length.
+    """
+    with zipfile.ZipFile(epub_path) as archive:
+        opf_path, package = read_epub_package(archive)
+        manifest = epub_manifest(package, opf_path)
+        for position, itemref in enumerate(package.findall("opf:spine/opf:itemref", NAMESPACES), start=1):
+            item = manifest.get(itemref.get("idref"))
+            if not item or item["media_type"] not in _HTML_MEDIA_TYPES:
+                continue
+            try:
+                markup = archive.read(item["path"]).decode("utf-8", errors="ignore")
+            except KeyError:
+                logger.debug(f"Spine item {item['path']} is missing from {epub_path}")
+                continue
+            text = html_to_text(markup)
+            if text:
+                yield position, text
+
+def _iter_html_sections(html_path: Path) -> Iterator[Tuple[int, str]]:
+    markup = html_path.read_text(encoding="utf-8", errors="ignore")
+    for position, section in enumerate(_MOBI_PAGEBREAK_RE.split(markup), start=1):
+        text = html_to_text(section)
+        if text:
+            yield position, text
+
+def iter_mobi_sections(mobi_path: Path) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (section, text) pairs of a MOBI/AZW/AZW3 book.
+    The `mobi` package unpacks KF8 books to an EPUB (read spine by spine) and older
+    books to a single HTML file (split at Kindle page breaks).
+    """
+    try:
+        import mobi
+    except ImportError:
+        raise RuntimeError("Reading MOBI/AZW books needs the optional 'mobi' package (pip install mobi)")
+
+    tempdir, extracted = mobi.extract(str(mobi_path))
+    try:
+        extracted = Path(extracted)
+        if extracted.suffix.lower() == ".epub":
+            yield from iter_epub_sections(extracted)
+        elif extracted.suffix.lower() in (".html", ".htm", ".xhtml"):
+            yield from _iter_html_sections(extracted)
+        else:
+            raise ValueError(f"Unsupported content unpacked from {mobi_path.name}: {extracted.suffix}")
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+def iter_ebook_sections(path: Path) -> Iterator[Tuple[int, str]]:
+    """Text of an EPUB or MOBI/AZW book, section by section in reading order."""
+    if path.suffix.lower() == ".epub":
+        return iter_epub_sections(path)
+    if path.suffix.lower() in MOBI_EXTENSIONS:
+        return iter_mobi_sections(path)
+    raise ValueError(f"Not an eBook: {path.name}")
@@ -0,0 +1,226 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from hashlib import md5
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Dict, Any, Optional, Set, Tuple
+import logging
+
+from phi.document import Document
+from psycopg2.extras import execute_values
+
+from config import config, OLLAMA_HOST, EMBEDDING_MODEL
+from db_pool import get_connection
+from document_index import document_scope_filters
+from metrics import INGEST_STAGE_SECONDS, CHUNKS_EMBEDDED
+
+logger = logging.getLogger(__name__)
+
+def _batched(documents: Iterable[Document], batch_size: int) -> Iterator[List[Document]]:
+    iterator = iter(documents)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def _clean_content(content: str) -> str:
+    # Same NUL replacement phi applies before storing content
+    return content.replace("\x00", "\ufffd")
+
+def _content_hash(content: str) -> str:
+    # Same hash phi stores in content_hash
+    return md5(content.encode()).hexdigest()
+
+class EmbeddingPipeline:
+    """
+    Embeds document chunks in batches and writes them to pgvector in bulk.
+
+    - Chunks are grouped into batches of `batch_size`, one Ollama /api/embed request each.
+    - At most `max_in_flight` requests run at once; the input is consumed lazily,
+      so a generator of chunks is never fully materialized.
+    - Failed batches are retried with exponential backoff.
+    - Chunks whose content hash is already stored reuse that embedding instead of
+      being sent to the embedder again (`reuse_existing`).
+    - Each embedded batch is upserted with a single multi-row INSERT.
+
+    `host` can point at any server speaking the Ollama embed API, such as a local fake.
+    """
+
+    def __init__(
+        self,
+        host: str = OLLAMA_HOST,
+        model: str = EMBEDDING_MODEL,
+        table: str = "ai.pdf_documents",
+        batch_size: int = config.EMBED_BATCH_SIZE,
+        max_in_flight: int = config.EMBED_MAX_IN_FLIGHT,
+        max_retries: int = config.EMBED_MAX_RETRIES,
+        retry_backoff: float = config.EMBED_RETRY_BACKOFF,
+        reuse_existing: bool = config.EMBED_REUSE_EXISTING,
+    ):
+        from ollama import Client
+
+        self.client = Client(host=host)
+        self.model = model
+        self.table = table
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.reuse_existing = reuse_existing
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts in one request, retrying on failure."""
+        attempt = 0
+        while True:
+            try:
+                response = self.client.embed(model=self.model, input=texts)
+                embeddings = response["embeddings"]
+                if len(embeddings) != len(texts):
+                    raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+                return embeddings
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = self.retry_backoff * (2 ** (attempt - 1))
+                logger.warning(f"⚠️ Embedding batch failed ({e}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def existing_embeddings(self, content_hashes: List[str]) -> Dict[str, List[float]]:
+        """Embeddings already stored for chunks with these content hashes."""
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                f"""
+                SELECT DISTINCT ON (content_hash) content_hash, embedding::text
+                FROM {self.table}
+                WHERE content_hash = ANY(%s) AND embedding IS NOT NULL
+                """,
+                (content_hashes,),
+            )
+            return {content_hash: json.loads(embedding) for content_hash, embedding in cur.fetchall()}
+
+    def _embed_batch(self, batch: List[Document]) -> Tuple[List[Document], int]:
+        """Embed a batch, reusing stored embeddings for known chunks. Returns (batch, reused count)."""
+        contents = [_clean_content(document.content) for document in batch]
+        hashes = [_content_hash(content) for content in contents]
+
+        known: Dict[str, List[float]] = {}
+        if self.reuse_existing:
+            try:
+                known = self.existing_embeddings(list(set(hashes)))
+            except Exception as e:
+                logger.warning(f"⚠️ Could not look up existing embeddings, embedding the whole batch: {e}")
+
+        # Identical chunks within the batch are embedded once
+        missing: Dict[str, str] = {}
+        for content_hash, content in zip(hashes, contents):
+            if content_hash not in known:
+                missing.setdefault(content_hash, content)
+
+        if missing:
+            with INGEST_STAGE_SECONDS.time(stage="embed"):
+                known.update(zip(missing.keys(), self.embed_texts(list(missing.values()))))
+
+        for document, content_hash in zip(batch, hashes):
+            document.embedding = known[content_hash]
+        return batch, len(batch) - len(missing)
+
+    def write_batch(self, batch: List[Document]) -> None:
+        """Upsert a batch of embedded documents with a single statement."""
+        rows = []
+        for document in batch:
+            content = _clean_content(document.content)
+            content_hash = _content_hash(content)
+            # Scoped searches filter on this column, not on meta_data
+            document_name = document.meta_data.get("document_name") or document.name
+            scope = document_scope_filters(document_name, document.meta_data.get("document_id")) if document_name else None
+            rows.append((
+                document.id or content_hash,
+                document.name,
+                json.dumps(document.meta_data),
+                json.dumps(scope) if scope else None,
+                content,
+                "[" + ",".join(str(value) for value in document.embedding) + "]",
+                json.dumps(document.usage) if document.usage else None,
+                content_hash,
+            ))
+
+        with get_connection() as conn, conn.cursor() as cur:
+            execute_values(
+                cur,
+                f"""
+                INSERT INTO {self.table}
+                    (id, name, meta_data, filters, content, embedding, usage, content_hash)
+                VALUES %s
+                ON CONFLICT (id) DO UPDATE SET
+                    name = EXCLUDED.name,
+                    meta_data = EXCLUDED.meta_data,
+                    filters = EXCLUDED.filters,
+                    content = EXCLUDED.content,
+                    embedding = EXCLUDED.embedding,
+                    usage = EXCLUDED.usage,
+                    content_hash = EXCLUDED.content_hash,
+                    updated_at = now()
+                """,
+                rows,
+                template="(%s, %s, %s::jsonb, %s::jsonb, %s, %s::vector, %s::jsonb, %s)",
+            )
+
+    def run(
+        self,
+        documents: Iterable[Document],
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Embed and store all documents.
+        `progress` is called with the number of chunks stored so far after each batch.
+        Returns counters including the achieved chunks per second and how many
+        chunks reused an existing embedding.
+        """
+        started = time.perf_counter()
+        chunks = 0
+        batches = 0
+        reused = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="embed") as executor:
+            in_flight: Set[Future] = set()
+            pending = _batched(documents, self.batch_size)
+
+            def drain(return_when) -> None:
+                nonlocal chunks, batches, reused
+                done, _ = wait(in_flight, return_when=return_when)
+                for future in done:
+                    in_flight.discard(future)
+                    batch, batch_reused = future.result()
+                    with INGEST_STAGE_SECONDS.time(stage="upsert"):
+                        self.write_batch(batch)
+                    chunks += len(batch)
+                    reused += batch_reused
+                    CHUNKS_EMBEDDED.inc(len(batch) - batch_reused, source="embedded")
+                    CHUNKS_EMBEDDED.inc(batch_reused, source="reused")
+                    batches += 1
+                    if progress:
+                        progress(chunks)
+
+            for batch in pending:
+                if len(in_flight) >= self.max_in_flight:
+                    drain(FIRST_COMPLETED)
+                in_flight.add(executor.submit(self._embed_batch, batch))
+
+            while in_flight:
+                drain(FIRST_COMPLETED)
+
+        elapsed = time.perf_counter() - started
+        rate = chunks / elapsed if elapsed > 0 else 0.0
+        logger.info(f"🧮 Embedded {chunks} chunks in {batches} batches ({rate:.1f} chunks/s, {reused} reused)")
+        return {"chunks": chunks, "batches": batches, "reused": reused, "seconds": elapsed, "chunks_per_second": rate}
+
+_pipeline: Optional[EmbeddingPipeline] = None
+
+def get_embedding_pipeline() -> EmbeddingPipeline:
+    """Get the shared embedding pipeline configured from the environment."""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = EmbeddingPipeline()
+    return _pipeline
@@ -0,0 +1,248 @@
+import sqlite3
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, BinaryIO
+import logging
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Share of the overall progress covered by each stage, in execution order
+STAGE_WEIGHTS = [
+    ("library", 0.2),   # Store in library, extract metadata, render thumbnail
+    ("extract", 0.0),   # Open the document for text extraction
+    ("chunk", 0.3),     # Extract and chunk pages (streamed)
+    ("embed", 0.5),     # Embed and upsert chunks (overlaps with chunking)
+]
+
+def _overall_percent(stage: str, fraction: float) -> float:
+    done = 0.0
+    for name, weight in STAGE_WEIGHTS:
+        if name == stage:
+            return round((done + weight * min(max(fraction, 0.0), 1.0)) * 100, 1)
+        done += weight
+    return 100.0
+
+class JobStore:
+    """SQLite-backed record of ingestion jobs, so unfinished jobs survive restarts."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    percent REAL NOT NULL DEFAULT 0,
+                    error TEXT,
+                    original_filename TEXT NOT NULL,
+                    upload_path TEXT,
+                    document_id TEXT,
+                    chunk_count INTEGER,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+
+            # Columns added after the first release
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for name, definition in (("sha256", "TEXT"), ("file_size", "INTEGER"), ("duplicate_of", "TEXT")):
+                if name not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+
+    def create(
+        self,
+        original_filename: str,
+        upload_path: str,
+        job_id: str,
+        document_id: Optional[str] = None,
+        sha256: Optional[str] = None,
+        file_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (id, status, stage, original_filename, upload_path, document_id,
+                                  sha256, file_size, created_at, updated_at)
+                VALUES (?, 'queued', NULL, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, original_filename, upload_path, document_id, sha256, file_size, now, now),
+            )
+        return self.get(job_id)
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        fields["updated_at"] = datetime.now().isoformat()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def unfinished(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+class IngestJobQueue:
+    """
+    Runs document ingestion in a bounded pool of background workers.
+
+    /ingest only stores the upload and enqueues a job; the worker then adds the
+    document to the library and runs extraction, chunking and embedding, recording
+    the current stage and percent done in the job store as it goes.
+
+    Uploads are streamed once, straight into the document's library folder, and
+    every later stage reads that file in place.
+    """
+
+    def __init__(self, data_path: str = "data", max_workers: int = config.INGEST_WORKERS):
+        self.store = JobStore(Path(data_path) / "jobs.db")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._progress_lock = threading.Lock()
+        self._last_percent: Dict[str, float] = {}
+
+    def submit_upload(self, fileobj: BinaryIO, original_filename: str) -> Dict[str, Any]:
+        """Stream an uploaded file into the library and enqueue its ingestion. Returns the new job."""
+        from library_manager import get_library_manager
+
+        job_id = str(uuid.uuid4())
+        stored = get_library_manager().store_upload(fileobj, original_filename)
+        job = self.store.create(
+            original_filename,
+            stored["path"],
+            job_id,
+            document_id=stored["id"],
+            sha256=stored["sha256"],
+            file_size=stored["file_size"],
+        )
+        self._executor.submit(self._run, job_id)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def resume_pending(self) -> int:
+        """Re-enqueue jobs left queued or running by a previous process."""
+        jobs = self.store.unfinished()
+        for job in jobs:
+            logger.info(f"🔁 Resuming ingestion job {job['id']} ({job['original_filename']})")
+            self._executor.submit(self._run, job["id"])
+        return len(jobs)
+
+    def _progress(self, job_id: str, stage: str, fraction: float) -> None:
+        # Streamed stages overlap, so only ever move a job's progress forward
+        percent = _overall_percent(stage, fraction)
+        with self._progress_lock:
+            if percent < self._last_percent.get(job_id, -1.0):
+                return
+            self._last_percent[job_id] = percent
+        self.store.update(job_id, stage=stage, percent=percent)
+
+    @staticmethod
+    def _find_duplicate(library_manager, job: Dict[str, Any]) -> Optional[str]:
+        """Id of a library document with the same content as the job's upload, if duplicates are resolved."""
+        if config.UPLOAD_DUPLICATES == "keep" or not job["sha256"] or job["document_id"] is None:
+            return None
+        return library_manager.find_duplicate(job["sha256"], job["document_id"])
+
+    def _run(self, job_id: str) -> None:
+        from library_manager import get_library_manager
+        from ingestion import ingest_document_for_rag
+        from ebook_reader import MOBI_EXTENSIONS, mobi_supported
+
+        job = self.store.get(job_id)
+        if job is None:
+            return
+
+        library_manager = get_library_manager()
+        original_filename = job["original_filename"]
+        self.store.update(job_id, status="running")
+
+        try:
+            # Library stage: skipped when resuming a job that already stored its document
+            document_id = job["document_id"]
+            if document_id is None or library_manager.get_document_metadata(document_id) is None:
+                self._progress(job_id, "library", 0.0)
+                upload_path = Path(job["upload_path"])
+                if not upload_path.exists():
+                    raise FileNotFoundError(f"Uploaded file is no longer available: {upload_path}")
+                duplicate_id = self._find_duplicate(library_manager, job)
+                if duplicate_id is not None:
+                    # Same content is already in the library: point the job at it and drop the upload
+                    if config.UPLOAD_DUPLICATES == "alias":
+                        library_manager.add_alias(duplicate_id, original_filename)
+                    self.store.update(
+                        job_id, document_id=duplicate_id, duplicate_of=duplicate_id,
+                        status="done", stage="done", percent=100.0,
+                    )
+                    library_manager.discard_upload(document_id)
+                    self._last_percent.pop(job_id, None)
+                    logger.info(f"♻️ Ingestion job {job_id}: {original_filename} is already in the library as {duplicate_id}")
+                    return
+                if document_id is not None:
+                    # Streamed straight into the library; catalog the file where it is
+                    metadata = library_manager.add_stored_document(
+                        document_id, original_filename, sha256=job["sha256"], file_size=job["file_size"]
+                    )
+                else:
+                    # Job queued before uploads went straight to the library
+                    metadata = library_manager.add_document(str(upload_path), original_filename)
+                    document_id = metadata["id"]
+                    self.store.update(job_id, document_id=document_id)
+                    shutil.rmtree(upload_path.parent, ignore_errors=True)
+            else:
+                metadata = library_manager.get_document_metadata(document_id)
+            self._progress(job_id, "library", 1.0)
+
+            # RAG stages (a resolved duplicate was already ingested by its original job)
+            chunk_count = 0
+            if job["duplicate_of"] is None and metadata["file_extension"] in MOBI_EXTENSIONS and not mobi_supported():
+                logger.warning(f"⚠️ Ingestion job {job_id}: install the 'mobi' package to chat with {original_filename}")
+            elif job["duplicate_of"] is None:
+                stored_file_path = library_manager.get_document_file_path(document_id)
+                chunk_count = ingest_document_for_rag(
+                    stored_file_path,
+                    document_id,
+                    original_filename,
+                    progress=lambda stage, fraction: self._progress(job_id, stage, fraction),
+                    page_count=metadata.get("page_count") or metadata.get("section_count"),
+                )
+
+            self.store.update(job_id, status="done", stage="done", percent=100.0, chunk_count=chunk_count)
+            self._last_percent.pop(job_id, None)
+            logger.info(f"✅ Ingestion job {job_id} finished: {original_filename}")
+
+        except Exception as e:
+            logger.error(f"❌ Ingestion job {job_id} failed: {e}")
+            self.store.update(job_id, status="failed", error=str(e))
+            self._last_percent.pop(job_id, None)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+_job_queue: Optional[IngestJobQueue] = None
+
+def get_job_queue() -> IngestJobQueue:
+    """Get the process-wide ingestion job queue."""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = IngestJobQueue()
+    return _job_queue
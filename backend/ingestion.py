@@ -0,0 +1,106 @@
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+import logging
+import time
+
+from phi.document import Document
+
+from agent import get_knowledge_base
+from embedding_pipeline import get_embedding_pipeline
+from db_utils import register_document_names, invalidate_document_index, delete_stale_chunks
+from document_index import get_document_name
+from library_manager import get_library_manager
+from retrieval_cache import bump_retrieval_version
+
+logger = logging.getLogger(__name__)
+
+# Called with (stage, fraction of that stage completed)
+ProgressCallback = Callable[[str, float], None]
+
+def _key_documents(documents: Iterable[Document], document_id: str, document_name: str) -> Iterator[Document]:
+    """Tag chunks with their library document and give them ids keyed by it."""
+    for document in documents:
+        page = document.meta_data.get("page")
+        chunk = document.meta_data.get("chunk")
+        document.name = document_name
+        document.id = "_".join(str(part) for part in (document_id, page, chunk) if part is not None)
+        document.meta_data["document_id"] = document_id
+        document.meta_data["document_name"] = document_name
+        yield document
+
+def ingest_document_for_rag(
+    file_path: Path,
+    document_id: str,
+    original_filename: str,
+    progress: Optional[ProgressCallback] = None,
+    page_count: Optional[int] = None,
+) -> int:
+    """
+    Read, chunk, embed and upsert a single library document (PDF, EPUB or MOBI/AZW)
+    into the vector store. Only the given file is processed, so ingest time depends on
+    this book's size alone.
+
+    Chunks are streamed from the reader into the embedding pipeline, so embedding
+    starts on the first pages while later pages are still being extracted and peak
+    memory stays roughly constant regardless of book length. When `page_count` is
+    known (spine sections for eBooks), progress is reported per page for extraction and chunking.
+    Chunks are upserted by id, so a re-ingest then deletes the document's chunks it no longer produced.
+    Returns the number of chunks stored.
+    """
+    def report(stage: str, fraction: float) -> None:
+        if progress:
+            progress(stage, fraction)
+
+    started = time.perf_counter()
+    knowledge_base = get_knowledge_base()
+    vector_db = knowledge_base.vector_db
+    reader = knowledge_base.reader
+    document_name = get_document_name(original_filename)
+
+    produced = 0
+    pages_fraction = 0.0
+    chunk_ids = set()
+
+    def tracked(chunks: Iterable[Document]) -> Iterator[Document]:
+        nonlocal produced, pages_fraction
+        for chunk in chunks:
+            produced += 1
+            chunk_ids.add(chunk.id)
+            page = chunk.meta_data.get("page")
+            if page_count and page:
+                pages_fraction = min(page / page_count, 1.0)
+                report("chunk", pages_fraction)
+            yield chunk
+        pages_fraction = 1.0
+        report("chunk", 1.0)
+
+    def embedded(done: int) -> None:
+        # Embedding trails extraction, so scale by how much of the book has been read
+        report("embed", pages_fraction * done / produced if produced else 0.0)
+
+    logger.info(f"📖 Streaming {original_filename} into the vector store...")
+    report("extract", 0.0)
+
+    # Make sure the table exists, then embed in batches and upsert keyed by the library id
+    vector_db.create()
+    chunks = _key_documents(reader.iter_documents(Path(file_path)), document_id, document_name)
+    stats = get_embedding_pipeline().run(tracked(chunks), progress=embedded)
+
+    if not stats["chunks"]:
+        logger.warning(f"⚠️ No content extracted from {original_filename}")
+        return 0
+
+    stale = delete_stale_chunks(document_id, chunk_ids)
+    if stale:
+        logger.info(f"🧹 Deleted {stale} chunks of {original_filename} left from an earlier ingest")
+
+    register_document_names([document_name])
+    invalidate_document_index()
+    # Chats scoped by this document's id, and legacy ones scoped by its name
+    bump_retrieval_version(document_id)
+    bump_retrieval_version(document_name)
+    get_library_manager().record_ingestion(document_id, stats["chunks"])
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"✅ Ingested {stats['chunks']} chunks ({stats['reused']} reused embeddings) from {original_filename} in {elapsed:.1f}s")
+    return stats["chunks"]
@@ -0,0 +1,348 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Iterable, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Listing sort keys and the indexed column behind each
+SORT_COLUMNS = {
+    "title": "sort_title",
+    "author": "sort_author",
+    "added_at": "added_at",
+    "size": "file_size",
+}
+
+# Denormalized listing columns, derived from the metadata JSON on every write
+# (chunk_count is the exception: it mirrors the vector store, see set_chunk_counts)
+_LISTING_COLUMNS = {
+    "sort_title": "TEXT NOT NULL DEFAULT ''",
+    "sort_author": "TEXT NOT NULL DEFAULT ''",
+    "file_extension": "TEXT NOT NULL DEFAULT ''",
+    "file_size": "INTEGER NOT NULL DEFAULT 0",
+    "chunk_count": "INTEGER NOT NULL DEFAULT 0",
+}
+
+def normalize_extension(extension: str) -> str:
+    extension = extension.strip().lower()
+    return extension if extension.startswith(".") else "." + extension
+
+def _listing_values(metadata: Dict[str, Any]) -> Tuple[str, str, str, int]:
+    """sort_title, sort_author, file_extension and file_size for a document."""
+    return (
+        (metadata.get('title') or metadata.get('original_filename') or '').casefold(),
+        (metadata.get('author') or '').casefold(),
+        (metadata.get('file_extension') or '').lower(),
+        int(metadata.get('file_size') or 0),
+    )
+
+class LibraryCatalog:
+    """
+    Persistent, indexed catalog of library documents backed by SQLite.
+
+    Each document's metadata is stored as a JSON blob next to a few indexed
+    columns, so listing a page of documents only touches that page instead
+    of reading every metadata file in the library.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # A single connection shared by all request threads, guarded by a lock
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        """Create catalog tables and indexes if they don't exist yet."""
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    id TEXT PRIMARY KEY,
+                    added_at TEXT NOT NULL,
+                    original_filename TEXT NOT NULL,
+                    metadata TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_documents_added_at
+                ON documents (added_at DESC, id DESC)
+            """)
+            # Content hash of the stored file, for finding duplicate uploads
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(documents)")}
+            if "sha256" not in columns:
+                self._conn.execute("ALTER TABLE documents ADD COLUMN sha256 TEXT")
+                self._conn.execute("""
+                    UPDATE documents SET sha256 = json_extract(metadata, '$.sha256')
+                    WHERE sha256 IS NULL
+                """)
+            self._conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_documents_sha256
+                ON documents (sha256)
+            """)
+            # Listing columns for filtering and keyset pagination by each sort key
+            added = [name for name in _LISTING_COLUMNS if name not in columns]
+            for name in added:
+                self._conn.execute(f"ALTER TABLE documents ADD COLUMN {name} {_LISTING_COLUMNS[name]}")
+            if added:
+                rows = self._conn.execute("SELECT id, metadata FROM documents").fetchall()
+                self._conn.executemany(
+                    "UPDATE documents SET sort_title = ?, sort_author = ?, file_extension = ?, file_size = ? WHERE id = ?",
+                    [(*_listing_values(json.loads(metadata)), doc_id) for doc_id, metadata in rows],
+                )
+            for column in ("sort_title", "sort_author", "file_size"):
+                self._conn.execute(f"""
+                    CREATE INDEX IF NOT EXISTS idx_documents_{column}
+                    ON documents ({column}, id)
+                """)
+            self._conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_documents_extension
+                ON documents (file_extension, added_at, id)
+            """)
+            self._conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_documents_chunk_count
+                ON documents (chunk_count)
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS catalog_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM catalog_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._conn.execute(
+            "INSERT INTO catalog_meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def _bump_version(self) -> None:
+        # Call inside the write transaction, so the version changes with the data.
+        # Incremented in SQL, so bumps from other processes sharing the catalog are kept.
+        self._conn.execute(
+            "INSERT INTO catalog_meta (key, value) VALUES ('library_version', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    @property
+    def version(self) -> int:
+        """
+        Library version, bumped on every change to the listing (clients use it as an ETag).
+        Read from the catalog on every call, a single primary-key row, so other workers and
+        processes writing the same catalog are seen at once. Persisted, so it never repeats
+        across restarts.
+        """
+        with self._lock:
+            return int(self._get_meta("library_version") or 0)
+
+    def bump_version(self) -> int:
+        """Mark the library as changed without a catalog write (e.g. after RAG ingestion)."""
+        with self._lock, self._conn:
+            self._bump_version()
+            return int(self._get_meta("library_version"))
+
+    def migrate_from_json(self, metadata_path: Path) -> int:
+        """
+        One-shot import of the legacy per-document JSON metadata files.
+        Runs only once per catalog; returns the number of imported documents.
+        """
+        with self._lock:
+            if self._get_meta("json_migrated") == "1":
+                return 0
+
+            imported = 0
+            with self._conn:
+                for metadata_file in Path(metadata_path).glob("*.json"):
+                    try:
+                        with open(metadata_file, 'r', encoding='utf-8') as f:
+                            metadata = json.load(f)
+                        self._upsert(metadata)
+                        imported += 1
+                    except Exception as e:
+                        logger.warning(f"⚠️ Could not migrate metadata file {metadata_file}: {e}")
+
+                self._set_meta("json_migrated", "1")
+                if imported:
+                    self._bump_version()
+
+            if imported:
+                logger.info(f"📦 Migrated {imported} documents from JSON metadata into the catalog")
+            return imported
+
+    def _upsert(self, metadata: Dict[str, Any]) -> None:
+        self._conn.execute(
+            """
+            INSERT INTO documents (
+                id, added_at, original_filename, sha256, metadata,
+                sort_title, sort_author, file_extension, file_size
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                added_at = excluded.added_at,
+                original_filename = excluded.original_filename,
+                sha256 = excluded.sha256,
+                metadata = excluded.metadata,
+                sort_title = excluded.sort_title,
+                sort_author = excluded.sort_author,
+                file_extension = excluded.file_extension,
+                file_size = excluded.file_size
+            """,
+            (
+                metadata['id'],
+                metadata.get('added_at') or '',
+                metadata.get('original_filename') or '',
+                metadata.get('sha256'),
+                json.dumps(metadata, ensure_ascii=False),
+                *_listing_values(metadata),
+            ),
+        )
+
+    def put(self, metadata: Dict[str, Any]) -> None:
+        """Insert or replace a document's metadata."""
+        with self._lock, self._conn:
+            self._upsert(metadata)
+            self._bump_version()
+
+    def put_many(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """Insert or replace many documents in a single transaction. Returns how many were written."""
+        written = 0
+        with self._lock, self._conn:
+            for metadata in documents:
+                self._upsert(metadata)
+                written += 1
+            if written:
+                self._bump_version()
+        return written
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Get metadata for a single document by id."""
+        with self._lock:
+            row = self._conn.execute("SELECT metadata FROM documents WHERE id = ?", (doc_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Metadata for several documents at once, keyed by id; unknown ids are left out."""
+        if not doc_ids:
+            return {}
+        placeholders = ",".join("?" * len(doc_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, metadata FROM documents WHERE id IN ({placeholders})", doc_ids
+            ).fetchall()
+        return {doc_id: json.loads(metadata) for doc_id, metadata in rows}
+
+    def find_by_sha256(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """Get the earliest-added document whose stored file has this content hash."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT metadata FROM documents WHERE sha256 = ? ORDER BY added_at, id LIMIT 1",
+                (sha256,),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def ids_without_sha256(self) -> List[str]:
+        """Ids of documents cataloged before content hashes were recorded."""
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM documents WHERE sha256 IS NULL").fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, doc_id: str) -> bool:
+        """Remove a document from the catalog. Returns True if it existed."""
+        with self._lock, self._conn:
+            cur = self._conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+            if cur.rowcount:
+                self._bump_version()
+        return cur.rowcount > 0
+
+    def count(self) -> int:
+        """Number of documents in the catalog."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def query(
+        self,
+        sort: str = "added_at",
+        descending: bool = True,
+        author: Optional[str] = None,
+        extension: Optional[str] = None,
+        ingested: Optional[bool] = None,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[Any, str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[Any, str]]]:
+        """
+        Filtered, sorted listing with keyset pagination.
+
+        `after` is the (sort value, id) of the last row of the previous page. Each sort key
+        has an (key, id) index, so a page is an index range scan of `limit` rows whatever
+        the library size. Returns the documents and the key to pass as `after` for the next
+        page, or None on the last page. Author and title comparisons are case-insensitive.
+        """
+        column = SORT_COLUMNS[sort]
+        direction = "DESC" if descending else "ASC"
+        conditions, params = [], []
+        if author is not None:
+            conditions.append("sort_author = ?")
+            params.append(author.casefold())
+        if extension is not None:
+            conditions.append("file_extension = ?")
+            params.append(normalize_extension(extension))
+        if ingested is not None:
+            conditions.append("chunk_count > 0" if ingested else "chunk_count = 0")
+        if after is not None:
+            conditions.append(f"({column}, id) {'<' if descending else '>'} (?, ?)")
+            params.extend(after)
+
+        query = f"SELECT metadata, {column}, id FROM documents"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {column} {direction}, id {direction}"
+        if limit is not None:
+            # One extra row tells whether there is a next page
+            query += " LIMIT ?"
+            params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        next_key = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_key = (rows[-1][1], rows[-1][2])
+        return [json.loads(row[0]) for row in rows], next_key
+
+    def original_filenames(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT original_filename FROM documents")]
+
+    def chunk_counts(self) -> List[Tuple[str, str, int]]:
+        """(id, original_filename, chunk_count) of every document."""
+        with self._lock:
+            return self._conn.execute("SELECT id, original_filename, chunk_count FROM documents").fetchall()
+
+    def set_chunk_counts(self, counts: Dict[str, int]) -> int:
+        """Record how many chunks each document has in the vector store. Returns how many changed."""
+        with self._lock, self._conn:
+            changed = 0
+            for doc_id, chunk_count in counts.items():
+                cur = self._conn.execute(
+                    "UPDATE documents SET chunk_count = ? WHERE id = ? AND chunk_count != ?",
+                    (chunk_count, doc_id, chunk_count),
+                )
+                changed += cur.rowcount
+            if changed:
+                self._bump_version()
+        return changed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
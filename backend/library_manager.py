@@ -1,32 +1,55 @@
 import os
 import uuid
 import shutil
-import json
-import io
+import hashlib
+import threading
+import time
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, BinaryIO, Tuple
 import logging
 from datetime import datetime
 
-# PDF and image processing
-import fitz  # PyMuPDF
-from PIL import Image
-import pdf2image
-from pypdf import PdfReader
-
-# eBook processing
-import ebooklib
-from ebooklib import epub
+from document_index import DocumentIndex, get_document_name
+from library_catalog import LibraryCatalog
+from search_index import LibrarySearchIndex
+from retrieval_cache import bump_retrieval_version
+from document_extraction import extract_document
+from stage_pools import run_in_process
+from metrics import INGEST_STAGE_SECONDS
+from thumbnails import legacy_thumbnail_path, choose_variant
 
 logger = logging.getLogger(__name__)
 
+SUPPORTED_EXTENSIONS = {'.pdf', '.epub', '.mobi', '.azw', '.azw3'}
+
+# Read size used when streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# How long an upload waits for a concurrent upload of the same content to be cataloged
+DUPLICATE_WAIT_SECONDS = 600.0
+
+def hash_file(path: Path) -> str:
+    """SHA-256 of a file on disk, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def link_or_copy(source: Path, destination: Path) -> None:
+    """Hard-link a file into place, copying only when linking is not possible (e.g. across filesystems)."""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
 class LibraryManager:
     """
     Manages the document library similar to Calibre:
     - Stores original files in organized folders
     - Extracts metadata (title, author, etc.)
     - Generates thumbnails from first page/cover
-    - Maintains database records
+    - Maintains an indexed catalog of document records
     """
     
     def __init__(self, library_path: str = "data/library"):
@@ -40,58 +63,136 @@ class LibraryManager:
         
         for path in [self.documents_path, self.thumbnails_path, self.metadata_path]:
             path.mkdir(exist_ok=True)
+        
+        # Indexed catalog of document metadata (imports legacy JSON files once)
+        self.catalog = LibraryCatalog(self.library_path / "catalog.db")
+        self.catalog.migrate_from_json(self.metadata_path)
+        
+        # Full-text index over metadata, built from the catalog on first use and kept in step with it
+        self.search_index = LibrarySearchIndex()
+        
+        # Content hashes of uploads still being added, so concurrent duplicates are caught too
+        self._hash_lock = threading.Lock()
+        self._hash_released = threading.Condition(self._hash_lock)
+        self._pending_hashes: Dict[str, str] = {}
+    
+    def store_upload(self, fileobj: BinaryIO, original_filename: str) -> Dict[str, Any]:
+        """
+        Stream an upload straight into its final library location, hashing it on the way.
+        The file is written once under a temporary name and renamed into place when complete;
+        register it afterwards with add_stored_document.
+        
+        Returns:
+            Dictionary with the new document id, stored path, sha256 and file_size
+        """
+        file_extension = Path(original_filename).suffix.lower()
+        if file_extension not in SUPPORTED_EXTENSIONS:
+            raise ValueError(f"Unsupported file type: {file_extension}")
+        
+        doc_id = str(uuid.uuid4())
+        doc_folder = self.documents_path / doc_id
+        doc_folder.mkdir(exist_ok=True)
+        stored_file_path = doc_folder / self._clean_filename(original_filename)
+        partial_path = stored_file_path.with_name(stored_file_path.name + '.part')
+        
+        digest = hashlib.sha256()
+        file_size = 0
+        try:
+            with INGEST_STAGE_SECONDS.time(stage="upload"):
+                with open(partial_path, 'wb') as buffer:
+                    for block in iter(lambda: fileobj.read(UPLOAD_CHUNK_SIZE), b''):
+                        digest.update(block)
+                        buffer.write(block)
+                        file_size += len(block)
+            with INGEST_STAGE_SECONDS.time(stage="library_copy"):
+                os.replace(partial_path, stored_file_path)
+        except Exception:
+            shutil.rmtree(doc_folder, ignore_errors=True)
+            raise
+        
+        return {
+            'id': doc_id,
+            'path': str(stored_file_path),
+            'sha256': digest.hexdigest(),
+            'file_size': file_size,
+        }
     
     def add_document(self, file_path: str, original_filename: str) -> Dict[str, Any]:
         """
         Add a document to the library with proper storage and metadata extraction.
+        The file is hard-linked into the library when possible rather than copied.
         
         Args:
             file_path: Temporary path to the uploaded file
             original_filename: Original filename from upload
             
+        Returns:
+            Dictionary with document metadata and paths
+        """
+        # Determine file type
+        file_extension = Path(original_filename).suffix.lower()
+        if file_extension not in SUPPORTED_EXTENSIONS:
+            raise ValueError(f"Unsupported file type: {file_extension}")
+        
+        # Generate unique document ID and folder
+        doc_id = str(uuid.uuid4())
+        doc_folder = self.documents_path / doc_id
+        doc_folder.mkdir(exist_ok=True)
+        
+        # Link file into the library with clean name
+        stored_file_path = doc_folder / self._clean_filename(original_filename)
+        with INGEST_STAGE_SECONDS.time(stage="library_copy"):
+            link_or_copy(Path(file_path), stored_file_path)
+        
+        return self.add_stored_document(doc_id, original_filename)
+    
+    def add_stored_document(
+        self,
+        doc_id: str,
+        original_filename: str,
+        sha256: Optional[str] = None,
+        file_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Catalog a document whose file is already in place under documents/<doc_id>/.
+        The hash and size are computed here only when the caller did not already have them.
+        
         Returns:
             Dictionary with document metadata and paths
         """
         try:
-            # Generate unique document ID
-            doc_id = str(uuid.uuid4())
-            
-            # Determine file type
             file_extension = Path(original_filename).suffix.lower()
-            supported_types = {'.pdf', '.epub', '.mobi', '.azw', '.azw3'}
-            
-            if file_extension not in supported_types:
-                raise ValueError(f"Unsupported file type: {file_extension}")
-            
-            # Create document folder
-            doc_folder = self.documents_path / doc_id
-            doc_folder.mkdir(exist_ok=True)
-            
-            # Copy file to library with clean name
             clean_filename = self._clean_filename(original_filename)
-            stored_file_path = doc_folder / clean_filename
-            shutil.copy2(file_path, stored_file_path)
+            stored_file_path = self.documents_path / doc_id / clean_filename
+            if not stored_file_path.exists():
+                raise FileNotFoundError(f"Stored file is missing: {stored_file_path}")
             
-            # Extract metadata
-            metadata = self._extract_metadata(stored_file_path, file_extension)
+            # Extract metadata, preview and thumbnails in a single pass over the file,
+            # in the render process pool so parsing and rasterizing don't hold the GIL here
+            metadata, thumbnail_variants, timings = run_in_process(
+                "render", extract_document, stored_file_path, file_extension, self.thumbnails_path, doc_id
+            )
+            for stage, seconds in timings.items():
+                INGEST_STAGE_SECONDS.observe(seconds, stage=stage)
             metadata.update({
                 'id': doc_id,
                 'original_filename': original_filename,
                 'stored_filename': clean_filename,
                 'file_extension': file_extension,
                 'added_at': datetime.now().isoformat(),
-                'file_size': os.path.getsize(stored_file_path)
+                'file_size': file_size if file_size is not None else os.path.getsize(stored_file_path),
+                'sha256': sha256 or hash_file(stored_file_path),
             })
             
-            # Generate thumbnail
-            thumbnail_path = self._generate_thumbnail(stored_file_path, doc_id, file_extension)
-            if thumbnail_path:
-                metadata['thumbnail_path'] = str(thumbnail_path.relative_to(self.library_path))
+            if thumbnail_variants:
+                metadata['thumbnail_variants'] = thumbnail_variants
+                thumbnail_path = legacy_thumbnail_path(self.thumbnails_path, doc_id)
+                if thumbnail_path.exists():
+                    metadata['thumbnail_path'] = str(thumbnail_path.relative_to(self.library_path))
             
             # Save metadata
-            metadata_file = self.metadata_path / f"{doc_id}.json"
-            with open(metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=2, ensure_ascii=False)
+            self.catalog.put(metadata)
+            self.search_index.add(metadata)
             
             logger.info(f"✅ Successfully added document: {metadata.get('title', original_filename)}")
             return metadata
@@ -99,194 +200,69 @@ class LibraryManager:
         except Exception as e:
             logger.error(f"❌ Error adding document {original_filename}: {e}")
             raise
-    
-    def _extract_metadata(self, file_path: Path, file_extension: str) -> Dict[str, Any]:
-        """Extract metadata from PDF or eBook files."""
-        metadata = {
-            'title': None,
-            'author': None,
-            'subject': None,
-            'creator': None,
-            'producer': None,
-            'creation_date': None,
-            'modification_date': None,
-            'page_count': None,
-            'language': None,
-            'publisher': None,
-            'isbn': None,
-            'description': None
-        }
-        
-        try:
-            if file_extension == '.pdf':
-                metadata.update(self._extract_pdf_metadata(file_path))
-            elif file_extension in ['.epub', '.mobi', '.azw', '.azw3']:
-                metadata.update(self._extract_ebook_metadata(file_path, file_extension))
-                
-        except Exception as e:
-            logger.warning(f"⚠️ Could not extract metadata from {file_path}: {e}")
         
-        return metadata
+        finally:
+            if sha256:
+                with self._hash_lock:
+                    if self._pending_hashes.get(sha256) == doc_id:
+                        del self._pending_hashes[sha256]
+                        self._hash_released.notify_all()
     
-    def _extract_pdf_metadata(self, file_path: Path) -> Dict[str, Any]:
-        """Extract metadata from PDF files."""
-        metadata = {}
-        
-        try:
-            # Try PyMuPDF first (more reliable)
-            pdf_doc = fitz.open(str(file_path))
-            pdf_metadata = pdf_doc.metadata
-            
-            metadata.update({
-                'title': pdf_metadata.get('title'),
-                'author': pdf_metadata.get('author'),
-                'subject': pdf_metadata.get('subject'),
-                'creator': pdf_metadata.get('creator'),
-                'producer': pdf_metadata.get('producer'),
-                'creation_date': pdf_metadata.get('creationDate'),
-                'modification_date': pdf_metadata.get('modDate'),
-                'page_count': pdf_doc.page_count
-            })
-            
-            pdf_doc.close()
-            
-        except Exception as e:
-            logger.warning(f"⚠️ PyMuPDF metadata extraction failed, trying PyPDF: {e}")
-            
-            try:
-                # Fallback to PyPDF
-                with open(file_path, 'rb') as f:
-                    pdf_reader = PdfReader(f)
-                    pdf_info = pdf_reader.metadata
-                    
-                    if pdf_info:
-                        metadata.update({
-                            'title': pdf_info.get('/Title'),
-                            'author': pdf_info.get('/Author'),
-                            'subject': pdf_info.get('/Subject'),
-                            'creator': pdf_info.get('/Creator'),
-                            'producer': pdf_info.get('/Producer'),
-                            'creation_date': pdf_info.get('/CreationDate'),
-                            'modification_date': pdf_info.get('/ModDate'),
-                            'page_count': len(pdf_reader.pages)
-                        })
-                        
-            except Exception as e2:
-                logger.warning(f"⚠️ PyPDF metadata extraction also failed: {e2}")
-        
-        return metadata
+    def find_duplicate(self, sha256: str, doc_id: str, timeout: float = DUPLICATE_WAIT_SECONDS) -> Optional[str]:
+        """
+        Look up a document whose file has the same content hash.
+        Returns the existing document id, or None after reserving the hash for doc_id
+        until add_stored_document has cataloged it.
+        When another upload of the same content is still being added, waits for it to finish:
+        if it was cataloged its id is returned, if it failed doc_id takes over the reservation.
+        After `timeout` seconds the upload is treated as new content without a reservation.
+        """
+        deadline = time.monotonic() + timeout
+        with self._hash_lock:
+            while True:
+                existing = self.catalog.find_by_sha256(sha256)
+                if existing and existing['id'] != doc_id:
+                    return existing['id']
+                pending = self._pending_hashes.setdefault(sha256, doc_id)
+                if pending == doc_id:
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"⚠️ Gave up waiting for upload {pending} with the same content as {doc_id}")
+                    return None
+                self._hash_released.wait(remaining)
     
-    def _extract_ebook_metadata(self, file_path: Path, file_extension: str) -> Dict[str, Any]:
-        """Extract metadata from eBook files."""
-        metadata = {}
-        
-        try:
-            if file_extension == '.epub':
-                book = epub.read_epub(str(file_path))
-                
-                metadata.update({
-                    'title': book.get_metadata('DC', 'title')[0][0] if book.get_metadata('DC', 'title') else None,
-                    'author': book.get_metadata('DC', 'creator')[0][0] if book.get_metadata('DC', 'creator') else None,
-                    'publisher': book.get_metadata('DC', 'publisher')[0][0] if book.get_metadata('DC', 'publisher') else None,
-                    'language': book.get_metadata('DC', 'language')[0][0] if book.get_metadata('DC', 'language') else None,
-                    'description': book.get_metadata('DC', 'description')[0][0] if book.get_metadata('DC', 'description') else None,
-                    'isbn': book.get_metadata('DC', 'identifier')[0][0] if book.get_metadata('DC', 'identifier') else None,
-                })
-                
-        except Exception as e:
-            logger.warning(f"⚠️ eBook metadata extraction failed: {e}")
-        
-        return metadata
+    def discard_upload(self, doc_id: str) -> None:
+        """Delete a streamed upload that was never cataloged (e.g. a duplicate)."""
+        if self.catalog.get(doc_id) is None:
+            shutil.rmtree(self.documents_path / doc_id, ignore_errors=True)
     
-    def _generate_thumbnail(self, file_path: Path, doc_id: str, file_extension: str) -> Optional[Path]:
-        """Generate thumbnail from PDF first page or eBook cover."""
-        thumbnail_path = self.thumbnails_path / f"{doc_id}.jpg"
-        
-        try:
-            if file_extension == '.pdf':
-                return self._generate_pdf_thumbnail(file_path, thumbnail_path)
-            elif file_extension in ['.epub', '.mobi', '.azw', '.azw3']:
-                return self._generate_ebook_thumbnail(file_path, thumbnail_path, file_extension)
-                
-        except Exception as e:
-            logger.warning(f"⚠️ Could not generate thumbnail for {file_path}: {e}")
+    def add_alias(self, doc_id: str, filename: str) -> Optional[Dict[str, Any]]:
+        """Record another filename the same content was uploaded under."""
+        metadata = self.get_document_metadata(doc_id)
+        if metadata is None:
             return None
+        aliases = metadata.setdefault('aliases', [])
+        if filename != metadata['original_filename'] and filename not in aliases:
+            aliases.append(filename)
+            self.catalog.put(metadata)
+            self.search_index.add(metadata)
+        return metadata
     
-    def _generate_pdf_thumbnail(self, file_path: Path, thumbnail_path: Path) -> Optional[Path]:
-        """Generate thumbnail from PDF first page."""
-        try:
-            # Try PyMuPDF first (faster)
-            pdf_doc = fitz.open(str(file_path))
-            if pdf_doc.page_count == 0:
-                pdf_doc.close()
-                return None
-                
-            # Get first page
-            page = pdf_doc[0]
-            
-            # Render page to image (200 DPI for good quality)
-            mat = fitz.Matrix(200/72, 200/72)  # 200 DPI scaling
-            pix = page.get_pixmap(matrix=mat)
-            
-            # Convert to PIL Image
-            img_data = pix.tobytes("ppm")
-            img = Image.open(io.BytesIO(img_data))
-            
-            # Resize to standard thumbnail size (300x400, maintaining aspect ratio)
-            img.thumbnail((300, 400), Image.Resampling.LANCZOS)
-            
-            # Save as JPEG
-            img.save(thumbnail_path, "JPEG", quality=85, optimize=True)
-            
-            pdf_doc.close()
-            logger.info(f"✅ Generated PDF thumbnail: {thumbnail_path}")
-            return thumbnail_path
-            
-        except Exception as e:
-            logger.warning(f"⚠️ PyMuPDF thumbnail failed, trying pdf2image: {e}")
-            
-            try:
-                # Fallback to pdf2image
-                pages = pdf2image.convert_from_path(
-                    str(file_path), 
-                    first_page=1, 
-                    last_page=1,
-                    dpi=200,
-                    fmt='RGB'
-                )
-                
-                if pages:
-                    img = pages[0]
-                    img.thumbnail((300, 400), Image.Resampling.LANCZOS)
-                    img.save(thumbnail_path, "JPEG", quality=85, optimize=True)
-                    
-                    logger.info(f"✅ Generated PDF thumbnail with pdf2image: {thumbnail_path}")
-                    return thumbnail_path
-                    
-            except Exception as e2:
-                logger.warning(f"⚠️ pdf2image thumbnail also failed: {e2}")
-                return None
-    
-    def _generate_ebook_thumbnail(self, file_path: Path, thumbnail_path: Path, file_extension: str) -> Optional[Path]:
-        """Generate thumbnail from eBook cover."""
-        try:
-            if file_extension == '.epub':
-                book = epub.read_epub(str(file_path))
-                
-                # Look for cover image
-                for item in book.get_items():
-                    if item.get_type() == ebooklib.ITEM_COVER or 'cover' in item.get_name().lower():
-                        img = Image.open(io.BytesIO(item.get_content()))
-                        img.thumbnail((300, 400), Image.Resampling.LANCZOS)
-                        img.save(thumbnail_path, "JPEG", quality=85, optimize=True)
-                        
-                        logger.info(f"✅ Generated eBook thumbnail: {thumbnail_path}")
-                        return thumbnail_path
-                        
-        except Exception as e:
-            logger.warning(f"⚠️ eBook thumbnail generation failed: {e}")
-            
-        return None
+    def backfill_content_hashes(self) -> int:
+        """Hash stored files of documents added before content hashes were recorded."""
+        hashed = 0
+        for doc_id in self.catalog.ids_without_sha256():
+            metadata = self.get_document_metadata(doc_id)
+            file_path = self.get_document_file_path(doc_id)
+            if metadata is None or file_path is None or not file_path.exists():
+                continue
+            metadata['sha256'] = hash_file(file_path)
+            self.catalog.put(metadata)
+            hashed += 1
+        if hashed:
+            logger.info(f"🔑 Recorded content hashes for {hashed} documents")
+        return hashed
     
     def _clean_filename(self, filename: str) -> str:
         """Clean filename for safe storage."""
@@ -298,33 +274,71 @@ class LibraryManager:
     
     def get_document_metadata(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """Get metadata for a specific document."""
-        metadata_file = self.metadata_path / f"{doc_id}.json"
-        
-        if metadata_file.exists():
-            try:
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.error(f"❌ Error reading metadata for {doc_id}: {e}")
+        try:
+            return self.catalog.get(doc_id)
+        except Exception as e:
+            logger.error(f"❌ Error reading metadata for {doc_id}: {e}")
         
         return None
     
+    def library_version(self) -> int:
+        """Version of the document listing, bumped by every add, removal and RAG ingestion."""
+        return self.catalog.version
+    
+    def bump_library_version(self) -> int:
+        """Record a change that alters the listing without touching the catalog (e.g. new chunks)."""
+        return self.catalog.bump_version()
+    
     def list_documents(self) -> List[Dict[str, Any]]:
-        """List all documents in the library."""
-        documents = []
-        
-        for metadata_file in self.metadata_path.glob("*.json"):
-            try:
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                    documents.append(metadata)
-            except Exception as e:
-                logger.warning(f"⚠️ Could not read metadata file {metadata_file}: {e}")
-        
-        # Sort by added date (newest first)
-        documents.sort(key=lambda x: x.get('added_at', ''), reverse=True)
+        """
+        List every document in the library, newest first (a full scan of the catalog).
+        Pages of the listing come from query_documents, which uses keyset cursors.
+        """
+        documents, _ = self.catalog.query()
         return documents
     
+    def query_documents(self, **filters) -> Tuple[List[Dict[str, Any]], Optional[Tuple[Any, str]]]:
+        """Filtered, sorted page of documents; see LibraryCatalog.query."""
+        return self.catalog.query(**filters)
+    
+    def build_search_index(self) -> None:
+        self.search_index.ensure_built(self.list_documents)
+    
+    def search(self, query: str, limit: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Full-text search over titles, authors, subjects, publishers, descriptions and filenames.
+        Returns the best matching documents' metadata, with a "score", and the number of matches.
+        """
+        self.build_search_index()
+        hits, total = self.search_index.search(query, limit)
+        documents = self.catalog.get_many([doc_id for doc_id, _ in hits])
+        return [
+            {**documents[doc_id], "score": round(score, 4)}
+            for doc_id, score in hits
+            if doc_id in documents
+        ], total
+    
+    def original_filenames(self) -> List[str]:
+        return self.catalog.original_filenames()
+    
+    def record_ingestion(self, doc_id: str, chunk_count: int) -> None:
+        """Note a finished RAG ingestion, for the ingested filter and the listing version."""
+        if not self.catalog.set_chunk_counts({doc_id: chunk_count}):
+            self.catalog.bump_version()
+    
+    def sync_chunk_counts(self, index: DocumentIndex) -> int:
+        """
+        Copy chunk counts from the vector store's document index into the catalog,
+        matching filenames the same way the listing does. Returns how many changed.
+        """
+        counts = {}
+        for doc_id, original_filename, chunk_count in self.catalog.chunk_counts():
+            match = index.match(original_filename)
+            new_count = match.get("chunk_count", 0) if match else 0
+            if new_count != chunk_count:
+                counts[doc_id] = new_count
+        return self.catalog.set_chunk_counts(counts) if counts else 0
+    
     def get_document_file_path(self, doc_id: str) -> Optional[Path]:
         """Get the file path for a document."""
         metadata = self.get_document_metadata(doc_id)
@@ -332,9 +346,21 @@ class LibraryManager:
             return self.documents_path / doc_id / metadata['stored_filename']
         return None
     
-    def get_thumbnail_path(self, doc_id: str) -> Optional[Path]:
-        """Get the thumbnail path for a document."""
-        thumbnail_path = self.thumbnails_path / f"{doc_id}.jpg"
+    def get_thumbnail_path(self, doc_id: str, size: Optional[str] = None) -> Optional[Path]:
+        """
+        Get the thumbnail path for a document.
+        With a size (grid, retina, detail, ...) the matching variant is returned when available,
+        otherwise the legacy grid JPEG.
+        """
+        if size is not None:
+            metadata = self.get_document_metadata(doc_id)
+            filename = choose_variant((metadata or {}).get('thumbnail_variants', {}), size)
+            if filename:
+                variant_file = self.thumbnails_path / filename
+                if variant_file.exists():
+                    return variant_file
+        
+        thumbnail_path = legacy_thumbnail_path(self.thumbnails_path, doc_id)
         return thumbnail_path if thumbnail_path.exists() else None
     
     def remove_document(self, doc_id: str) -> bool:
@@ -345,19 +371,36 @@ class LibraryManager:
             if doc_folder.exists():
                 shutil.rmtree(doc_folder)
             
-            # Remove thumbnail
-            thumbnail_path = self.thumbnails_path / f"{doc_id}.jpg"
-            if thumbnail_path.exists():
+            # Remove thumbnails (legacy JPEG and all variants)
+            for thumbnail_path in self.thumbnails_path.glob(f"{doc_id}*"):
                 thumbnail_path.unlink()
             
-            # Remove metadata
+            # Remove metadata (and any legacy JSON file left from before the catalog)
+            metadata = self.catalog.get(doc_id)
+            self.catalog.delete(doc_id)
+            self.search_index.remove(doc_id)
             metadata_file = self.metadata_path / f"{doc_id}.json"
             if metadata_file.exists():
                 metadata_file.unlink()
             
+            # Cached retrieval results for this document are no longer valid
+            if metadata:
+                bump_retrieval_version(doc_id)
+                bump_retrieval_version(get_document_name(metadata['original_filename']))
+            
             logger.info(f"✅ Removed document {doc_id} from library")
             return True
             
         except Exception as e:
             logger.error(f"❌ Error removing document {doc_id}: {e}")
-            return False 
\ No newline at end of file
+            return False 
+
+# Shared library manager instance
+_library_manager: Optional[LibraryManager] = None
+
+def get_library_manager() -> LibraryManager:
+    """Get the process-wide library manager instance."""
+    global _library_manager
+    if _library_manager is None:
+        _library_manager = LibraryManager()
+    return _library_manager
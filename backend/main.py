@@ -1,20 +1,86 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.staticfiles import StaticFiles
+import startup_profile
+from fastapi import FastAPI, HTTPException, UploadFile, File, Header, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, StreamingResponse, PlainTextResponse, JSONResponse
 from pydantic import BaseModel
 import uvicorn
+import asyncio
+import base64
+import json
 import os
-import shutil
-from agent import get_rag_agent
-from db_utils import get_document_list_from_db, get_filename_from_uuid
-from library_manager import LibraryManager
+import time
+from functools import partial
+from typing import Any, List, Optional, Tuple
+from agent_cache import AgentCache
+from config import config
+from ingest_jobs import get_job_queue
+from db_utils import (
+    get_document_index,
+    get_filename_from_uuid,
+    backfill_document_uuids,
+    ensure_document_scope_filters,
+)
+from db_pool import get_pool_stats
+from document_index import DocumentIndex, legacy_db_documents, merge_library_and_db_documents
+from library_catalog import SORT_COLUMNS
+from library_manager import get_library_manager, SUPPORTED_EXTENSIONS
+from retrieval_cache import get_cache_stats
+from stage_pools import run_in_stage, iterate_in_stage, get_stage_stats, shutdown_pools
+from metrics import CHAT_STAGE_SECONDS, CallbackMetric, register, render_metrics
+from thumbnails import DEFAULT_VARIANT, thumbnail_etag, media_type as thumbnail_media_type
 from psycopg2 import ProgrammingError
+import warmup
+
+startup_profile.mark("imports")
+
+# The server's event loop, which owns conversation_locks; set at startup
+_event_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _discard_idle_conversation_lock(agent_key: str) -> None:
+    # Runs on the event loop, so no request can be between getting and acquiring the lock
+    lock = conversation_locks.get(agent_key)
+    if lock is not None and not lock.locked():
+        del conversation_locks[agent_key]
+
+def _drop_conversation_lock(agent_key: str) -> None:
+    """Agent eviction callback. Evictions happen in worker threads, so the cleanup is handed to the event loop."""
+    loop = _event_loop
+    if loop is not None and not loop.is_closed():
+        loop.call_soon_threadsafe(_discard_idle_conversation_lock, agent_key)
+
+def _build_agent(agent_key: str):
+    # The phi stack is imported on first use (or during warm-up), not with the app
+    from agent import get_rag_agent
+    metadata = library_manager.get_document_metadata(agent_key)
+    if metadata:
+        return get_rag_agent(document_filter=metadata['original_filename'], document_id=agent_key)
+    return get_rag_agent(document_filter=agent_key)
 
-# In-memory storage for agents to maintain conversation history
-# The key is the document_id
-agents = {}
+# Bounded in-memory cache of agents, which hold each conversation's history
+# The key is the library document id, or the filename of a legacy document
+agents = AgentCache(
+    factory=_build_agent,
+    capacity=config.AGENT_CACHE_SIZE,
+    ttl_seconds=config.AGENT_CACHE_TTL,
+    on_evict=_drop_conversation_lock,
+)
+conversation_locks = {}
+
+register(CallbackMetric(
+    "calibre_agent_pool_size", "Chat agents currently cached.", lambda: {(): agents.stats()["size"]},
+))
+register(CallbackMetric(
+    "calibre_agent_cache_hits_total", "Chat agent cache hits.", lambda: {(): agents.stats()["hits"]}, type_name="counter",
+))
+register(CallbackMetric(
+    "calibre_agent_cache_misses_total", "Chat agent cache misses (agents built).", lambda: {(): agents.stats()["misses"]}, type_name="counter",
+))
 
 # Initialize the library manager
-library_manager = LibraryManager()
+library_manager = get_library_manager()
+
+# Background ingestion workers
+job_queue = get_job_queue()
 
 app = FastAPI(
     title="Calibre-AI Worker",
@@ -22,176 +88,322 @@ app = FastAPI(
     version="2.0.0",
 )
 
-# Mount static files for serving thumbnails
-app.mount("/thumbnails", StaticFiles(directory="data/library/thumbnails"), name="thumbnails")
+@app.on_event("startup")
+async def bind_event_loop():
+    """Remember the loop that agent evictions hand conversation-lock cleanup back to."""
+    global _event_loop
+    _event_loop = asyncio.get_running_loop()
+
+@app.on_event("startup")
+def check_config():
+    """Warn about insecure defaults once the server starts (not whenever config is imported)."""
+    with startup_profile.timed("startup.check_config"):
+        config.validate_config()
+
+@app.on_event("startup")
+def resume_ingest_jobs():
+    """Pick up ingestion jobs that were unfinished when the process stopped."""
+    with startup_profile.timed("startup.resume_ingest_jobs"):
+        resumed = job_queue.resume_pending()
+    if resumed:
+        print(f"🔁 Resumed {resumed} unfinished ingestion jobs")
+
+def preload_agents():
+    """Build agents for popular documents (AGENT_PRELOAD) ahead of the first chat."""
+    document_ids = [d.strip() for d in config.AGENT_PRELOAD.split(",") if d.strip()]
+    if not document_ids:
+        return
+
+    agent_keys = []
+    for document_id in document_ids:
+        try:
+            agent_keys.append(_resolve_agent_key(document_id))
+        except Exception as e:
+            print(f"⚠️ Could not resolve {document_id} for preloading: {e}")
+    loaded = agents.preload(agent_keys)
+    print(f"🤖 Preloaded {loaded} chat agents")
+
+@app.on_event("startup")
+async def start_warmup():
+    """
+    In the background: tag chunks for scoped retrieval and backfill the UUID mapping (both
+    required before /ready), build the knowledge base and load the Ollama models, then preload agents.
+    """
+    required_steps = {
+        "document_scopes": ensure_document_scope_filters,
+        "uuid_mapping": backfill_document_uuids,
+    }
+    asyncio.get_running_loop().run_in_executor(
+        None, partial(warmup.warm_up, required_steps, {"agents": preload_agents})
+    )
+
+@app.on_event("startup")
+async def index_content_hashes():
+    """Hash legacy library files, for deduplicating uploads."""
+    def backfill():
+        try:
+            library_manager.backfill_content_hashes()
+        except Exception as e:
+            print(f"⚠️ Could not hash library files: {e}")
+
+    asyncio.get_running_loop().run_in_executor(None, backfill)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check, using the weak comparison that conditional GETs call for."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+@app.on_event("startup")
+async def sync_ingestion_state():
+    """Copy chunk counts from the vector store into the catalog, for the ingested filter."""
+    def sync():
+        try:
+            changed = library_manager.sync_chunk_counts(_load_document_index())
+            if changed:
+                print(f"🔄 Updated the ingestion state of {changed} documents")
+        except Exception as e:
+            print(f"⚠️ Could not sync ingestion state: {e}")
+
+    asyncio.get_running_loop().run_in_executor(None, sync)
+
+@app.on_event("startup")
+async def build_search_index():
+    """Index library metadata for /search in the background."""
+    asyncio.get_running_loop().run_in_executor(None, library_manager.build_search_index)
+
+@app.on_event("startup")
+def record_startup_time():
+    # Registered last, so this covers the blocking startup hooks above
+    startup_profile.mark("startup_hooks")
+
+@app.get("/thumbnails/{thumbnail_name}")
+async def get_thumbnail(thumbnail_name: str, size: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    """
+    Serves document thumbnails.
+    /thumbnails/{id}?size=grid|retina|detail returns the matching variant (WebP or JPEG);
+    /thumbnails/{id}.jpg keeps serving the legacy grid JPEG.
+    Responses carry a content-hash ETag and may be cached for THUMBNAIL_MAX_AGE seconds.
+    """
+    if thumbnail_name.endswith(".jpg"):
+        doc_id, size = thumbnail_name[:-len(".jpg")], None
+    else:
+        doc_id, size = thumbnail_name, size or DEFAULT_VARIANT
+    
+    def locate():
+        path = library_manager.get_thumbnail_path(doc_id, size)
+        return (path, thumbnail_etag(path)) if path is not None else (None, None)
+
+    thumbnail_path, etag = await run_in_stage("disk", locate)
+    if thumbnail_path is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={config.THUMBNAIL_MAX_AGE}"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(thumbnail_path, media_type=thumbnail_media_type(thumbnail_path), headers=headers)
+
+def _load_document_index() -> DocumentIndex:
+    """The cached filename index over database documents, empty before the first ingest."""
+    try:
+        return get_document_index()
+    except ProgrammingError as e:
+        if "does not exist" not in str(e):
+            raise e
+        return DocumentIndex([])
+
+def _encode_cursor(sort: str, descending: bool, key: Tuple[Any, str]) -> str:
+    raw = json.dumps([sort, descending, *key]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str, sort: str, descending: bool) -> Tuple[Any, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, cursor_descending, value, doc_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if (cursor_sort, cursor_descending) != (sort, descending):
+        raise HTTPException(status_code=400, detail="Cursor belongs to a different sort order")
+    return value, doc_id
+
+# Legacy (database-only) entries, recomputed only when the library or the database index changes
+_legacy_cache = {"index": None, "version": None, "documents": []}
+
+def _legacy_documents(db_index: DocumentIndex) -> List[dict]:
+    version = library_manager.library_version()
+    if _legacy_cache["index"] is not db_index or _legacy_cache["version"] != version:
+        documents = legacy_db_documents(db_index, library_manager.original_filenames())
+        _legacy_cache.update(index=db_index, version=version, documents=documents)
+    return _legacy_cache["documents"]
 
 @app.get("/documents")
-async def list_documents():
-    """Lists all ingested documents with metadata and thumbnail information."""
+async def list_documents(
+    limit: Optional[int] = Query(None, ge=1, le=config.DOCUMENTS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "added_at",
+    order: Optional[str] = None,
+    author: Optional[str] = None,
+    extension: Optional[str] = None,
+    ingested: Optional[bool] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Lists all ingested documents with metadata and thumbnail information.
+
+    Without `limit` or `cursor` the whole (filtered, sorted) library is returned as an array.
+    With them, a page is returned as {"documents": [...], "next_cursor": ...}; pass next_cursor
+    back, with the same filters and sort, for the following page. Pages are served from catalog
+    indexes, so their cost doesn't depend on library size.
+    Sort by title, author, added_at or size (order asc or desc; added_at defaults to newest first)
+    and filter by author, extension (e.g. epub) and ingested (true or false).
+    Legacy documents that exist only in the vector store come last and are left out when
+    filtering by author, extension or ingested=false.
+    The ETag is the library version, so an unchanged poll gets a 304 without loading anything.
+    """
+    if sort not in SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort: {sort}. Use one of {', '.join(SORT_COLUMNS)}")
+    if order not in (None, "asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    descending = order == "desc" if order else sort == "added_at"
+    paginated = limit is not None or cursor is not None
+    after = _decode_cursor(cursor, sort, descending) if cursor else None
+    if paginated and limit is None:
+        limit = config.DOCUMENTS_PAGE_SIZE
+
+    # Read before loading, so a change made meanwhile leaves the client with an older tag
+    etag = f'"library-{library_manager.library_version()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
     try:
-        # Get documents from database (for chunk counts and ingestion info)
-        db_documents = []
-        try:
-            db_documents = get_document_list_from_db()
-        except ProgrammingError as e:
-            if "does not exist" not in str(e):
-                raise e
-        
-        # Get documents from library manager (for metadata and thumbnails)
-        library_documents = library_manager.list_documents()
+        # Database index (chunk counts, ingestion info) and library catalog (metadata, thumbnails),
+        # each loaded in its own stage pool
+        db_index, (library_documents, next_key) = await asyncio.gather(
+            run_in_stage("db", _load_document_index),
+            run_in_stage(
+                "disk", library_manager.query_documents,
+                sort=sort, descending=descending, author=author, extension=extension,
+                ingested=ingested, limit=limit, after=after,
+            ),
+        )
         
-        # Merge the information
-        documents = []
+        # Merge the information with hash lookups instead of pairwise comparisons
+        documents = merge_library_and_db_documents(library_documents, db_index, include_legacy=False)
+        if next_key is None and author is None and extension is None and ingested is not False:
+            documents.extend(await run_in_stage("disk", _legacy_documents, db_index))
         
-        for lib_doc in library_documents:
-            doc_info = {
-                "id": lib_doc["id"],
-                "filename": lib_doc.get("title") or lib_doc["original_filename"],
-                "original_filename": lib_doc["original_filename"],
-                "author": lib_doc.get("author"),
-                "page_count": lib_doc.get("page_count"),
-                "file_size": lib_doc.get("file_size"),
-                "file_extension": lib_doc.get("file_extension"),
-                "added_at": lib_doc["added_at"],
-                "chunk_count": 0,  # Default value
-                "thumbnail_url": None
-            }
-            
-            # Add thumbnail URL if available
-            if lib_doc.get("thumbnail_path"):
-                doc_info["thumbnail_url"] = f"/thumbnails/{lib_doc['id']}.jpg"
-            
-            # Try to find matching database document for chunk count using fuzzy matching
-            matched_db_doc = None
-            for db_doc in db_documents:
-                # Try exact match first
-                if db_doc["filename"] == lib_doc["original_filename"]:
-                    matched_db_doc = db_doc
-                    break
-                # Try without extension
-                elif db_doc["filename"] == lib_doc["original_filename"].rsplit('.', 1)[0]:
-                    matched_db_doc = db_doc
-                    break
-                # Try the reverse (db has extension, library doesn't)
-                elif lib_doc["original_filename"] == db_doc["filename"].rsplit('.', 1)[0]:
-                    matched_db_doc = db_doc
-                    break
-            
-            if matched_db_doc:
-                doc_info["chunk_count"] = matched_db_doc.get("chunk_count", 0)
-                doc_info["ingested_at"] = matched_db_doc.get("ingested_at")
-            
-            documents.append(doc_info)
-        
-        # Only include database documents that truly don't match any library documents (legacy)
-        matched_db_filenames = set()
-        for lib_doc in library_documents:
-            for db_doc in db_documents:
-                if (db_doc["filename"] == lib_doc["original_filename"] or 
-                    db_doc["filename"] == lib_doc["original_filename"].rsplit('.', 1)[0] or
-                    lib_doc["original_filename"] == db_doc["filename"].rsplit('.', 1)[0]):
-                    matched_db_filenames.add(db_doc["filename"])
-        
-        for db_doc in db_documents:
-            if db_doc["filename"] not in matched_db_filenames:
-                documents.append({
-                    "id": db_doc["id"],
-                    "filename": db_doc["filename"],
-                    "original_filename": db_doc["filename"],
-                    "chunk_count": db_doc.get("chunk_count", 0),
-                    "ingested_at": db_doc.get("ingested_at"),
-                    "thumbnail_url": None
-                })
-        
-        return documents
+        if not paginated:
+            return JSONResponse(jsonable_encoder(documents), headers=headers)
+        next_cursor = _encode_cursor(sort, descending, next_key) if next_key else None
+        return JSONResponse(jsonable_encoder({"documents": documents, "next_cursor": next_cursor}), headers=headers)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/search")
+async def search_library(q: str, limit: int = Query(20, ge=1, le=100)):
+    """
+    Full-text search over titles, authors, subjects, publishers, descriptions and filenames.
+    The last word matches as a prefix (search as you type) and longer words tolerate a typo.
+    Results are ranked by relevance and shaped like /documents entries, plus a score.
+    """
+    try:
+        (hits, total), db_index = await asyncio.gather(
+            run_in_stage("disk", library_manager.search, q, limit),
+            run_in_stage("db", _load_document_index),
+        )
+        documents = merge_library_and_db_documents(hits, db_index, include_legacy=False)
+        for document, hit in zip(documents, hits):
+            document["score"] = hit["score"]
+        return {"query": q, "total": total, "results": documents}
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 class ChatRequest(BaseModel):
     prompt: str
 
-@app.post("/ingest")
+@app.post("/ingest", status_code=202)
 async def ingest_document(file: UploadFile = File(...)):
     """
-    Ingests a document, stores it permanently in the library, and processes it for RAG.
-    Supports PDFs and eBooks with metadata extraction and thumbnail generation.
+    Stores an uploaded document and queues it for background ingestion.
+    A worker adds it to the library (metadata, thumbnail) and processes it for RAG;
+    poll /jobs/{job_id} for progress.
     """
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file name provided.")
 
-    # Create a temporary file for initial processing
-    temp_dir = "data/temp"
-    os.makedirs(temp_dir, exist_ok=True)
-    temp_file_path = os.path.join(temp_dir, file.filename)
+    file_extension = os.path.splitext(file.filename)[1].lower()
+    if file_extension not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_extension}")
 
     try:
-        # Save the uploaded file temporarily
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # Add document to library (this stores it permanently and extracts metadata)
-        print(f"📚 Adding {file.filename} to library...")
-        try:
-            library_metadata = library_manager.add_document(temp_file_path, file.filename)
-            print(f"✅ Successfully added to library: {library_metadata.get('title', file.filename)}")
-        except Exception as library_error:
-            print(f"❌ Error adding to library: {library_error}")
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Failed to add document to library: {str(library_error)}"
-            )
-
-        # Get the stored file path for knowledge base processing
-        stored_file_path = library_manager.get_document_file_path(library_metadata["id"])
-        
-        if not stored_file_path or not stored_file_path.exists():
-            raise HTTPException(status_code=500, detail="Document was not properly stored in library")
-
-        # Copy the stored file to the knowledge base directory for processing
-        kb_temp_dir = "data/pdf_files"
-        os.makedirs(kb_temp_dir, exist_ok=True)
-        kb_file_path = os.path.join(kb_temp_dir, file.filename)
-        shutil.copy2(stored_file_path, kb_file_path)
-
-        # Process with knowledge base
-        try:
-            print(f"📖 Processing {file.filename} with filtered PDF reader...")
-            ingestion_agent = get_rag_agent()
-            ingestion_agent.knowledge.load(recreate=False)
-            print(f"✅ Successfully processed {file.filename} for RAG")
-        except Exception as load_error:
-            print(f"❌ Error processing for RAG: {load_error}")
-            # Don't delete from library on RAG failure - the file is still stored
-            print("⚠️ Document is stored in library but RAG processing failed")
-            
-        # Clean up knowledge base temp file
-        if os.path.exists(kb_file_path):
-            os.remove(kb_file_path)
-
-        # Return success with library metadata
+        job = await run_in_stage("disk", job_queue.submit_upload, file.file, file.filename)
+        print(f"📥 Queued {file.filename} for ingestion (job {job['id']})")
         return {
-            "status": "success", 
-            "message": f"Successfully ingested {library_metadata.get('title', file.filename)}", 
-            "document_id": library_metadata["id"],
-            "metadata": {
-                "title": library_metadata.get("title"),
-                "author": library_metadata.get("author"),
-                "page_count": library_metadata.get("page_count"),
-                "file_size": library_metadata.get("file_size"),
-                "thumbnail_url": f"/thumbnails/{library_metadata['id']}.jpg" if library_metadata.get("thumbnail_path") else None
-            }
+            "status": "queued",
+            "message": f"Queued {file.filename} for ingestion",
+            "job_id": job["id"],
+            "status_url": f"/jobs/{job['id']}",
         }
-
-    except HTTPException:
-        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error during ingestion: {str(e)}")
-    finally:
-        # Clean up the temporary file
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
 
+@app.get("/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    """Reports the stage, percent done and any error of an ingestion job."""
+    job = await run_in_stage("disk", job_queue.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No ingestion job found: {job_id}")
+    
+    job.pop("upload_path", None)
+    return job
+
+
+def _resolve_agent_key(document_id: str) -> str:
+    """
+    Resolve a document id to its conversation key.
+    Library documents keep their id, so every upload has its own conversation and retrieval
+    scope even when filenames collide. document_id can also be a legacy UUID or a filename
+    for backward compatibility.
+    """
+    if library_manager.get_document_metadata(document_id):
+        return document_id
+    # Try to convert a legacy UUID to its filename if needed
+    if len(document_id) == 36 and '-' in document_id:  # Looks like a UUID
+        # Use filename as the agent key for consistency
+        return get_filename_from_uuid(document_id)
+    # Backward compatibility: document_id is already a filename
+    return document_id
+
+def _resolve_agent(document_id: str):
+    """Resolve a document id to its conversation key and agent, creating the agent on first use."""
+    with CHAT_STAGE_SECONDS.time(stage="uuid_resolution"):
+        agent_key = _resolve_agent_key(document_id)
+    # Reuse or create the agent for this document's conversation with document-specific filtering
+    with CHAT_STAGE_SECONDS.time(stage="agent_lookup"):
+        agent = agents.get(agent_key)
+    return agent_key, agent
+
+def _conversation_lock(agent_key: str) -> asyncio.Lock:
+    """One turn at a time per conversation, so agent history stays consistent."""
+    if agent_key not in conversation_locks:
+        conversation_locks[agent_key] = asyncio.Lock()
+    return conversation_locks[agent_key]
+
+def _response_text(response) -> str:
+    """Extract the actual text content from a phi agent response."""
+    if hasattr(response, 'content'):
+        return response.content or ""
+    elif isinstance(response, dict) and 'content' in response:
+        return response['content'] or ""
+    return str(response)
+
+def _sse_event(data: dict, event: str = None) -> str:
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
 
 @app.post("/chat/{document_id}")
 async def chat_with_document(document_id: str, request: ChatRequest):
@@ -199,45 +411,117 @@ async def chat_with_document(document_id: str, request: ChatRequest):
     Handles chat with a specific document.
     Maintains a separate agent instance for each document_id to keep conversations isolated.
     document_id can be either a UUID or a filename for backward compatibility.
+    Generation runs in the chat stage pool so the event loop stays responsive.
     """
     try:
-        # Try to convert UUID to filename if needed
-        if len(document_id) == 36 and '-' in document_id:  # Looks like a UUID
-            filename = get_filename_from_uuid(document_id)
-            # Use filename as the agent key for consistency
-            agent_key = filename
-        else:
-            # Backward compatibility: document_id is already a filename
-            agent_key = document_id
-            
-        if agent_key not in agents:
-            # Create a new agent for this document's conversation with document-specific filtering
-            agents[agent_key] = get_rag_agent(document_filter=agent_key)
-
-        agent = agents[agent_key]
-        response = agent.run(request.prompt)
-        
-        # Extract the actual text content from the phi agent response
-        if hasattr(response, 'content'):
-            response_text = response.content
-        elif isinstance(response, dict) and 'content' in response:
-            response_text = response['content']
-        else:
-            response_text = str(response)
+        agent_key, agent = await run_in_stage("chat", _resolve_agent, document_id)
+
+        async with _conversation_lock(agent_key):
+            with CHAT_STAGE_SECONDS.time(stage="generation"):
+                response = await run_in_stage("chat", agent.run, request.prompt)
         
         # Return the format expected by Flutter frontend
         return {
-            "response": response_text,
-            "conversation_id": agent_key,  # Use the document name as conversation ID
+            "response": _response_text(response),
+            "conversation_id": agent_key,  # The library document id (or legacy document name)
         }
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/{document_id}/stream")
+async def stream_chat_with_document(document_id: str, request: ChatRequest):
+    """
+    Streams the answer for a document chat as Server-Sent Events.
+    Each `data:` event carries a {"token": ...} chunk as soon as the model produces it;
+    a final `done` event reports the conversation id and time-to-first-token.
+    """
+    started = time.perf_counter()
+    try:
+        agent_key, agent = await run_in_stage("chat", _resolve_agent, document_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def event_stream():
+        first_token_ms = None
+        async with _conversation_lock(agent_key):
+            generation_started = time.perf_counter()
+            try:
+                # agent.run(stream=True) is a blocking generator; pull each chunk in the chat stage pool
+                chunks = await run_in_stage("chat", agent.run, request.prompt, stream=True)
+                async for chunk in iterate_in_stage("chat", chunks):
+                    token = _response_text(chunk)
+                    if not token:
+                        continue
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - started) * 1000
+                        print(f"⏱️ Time to first token for {agent_key}: {first_token_ms:.0f}ms")
+                    yield _sse_event({"token": token})
+            except Exception as e:
+                yield _sse_event({"detail": str(e)}, event="error")
+                return
+            finally:
+                CHAT_STAGE_SECONDS.observe(time.perf_counter() - generation_started, stage="generation")
+
+        yield _sse_event({
+            "conversation_id": agent_key,
+            "time_to_first_token_ms": round(first_token_ms, 1) if first_token_ms is not None else None,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        }, event="done")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
+@app.get("/ready")
+async def readiness_check():
+    """200 once warm-up has built the knowledge base (or warm-up is disabled), 503 until then."""
+    state = warmup.readiness()
+    return JSONResponse(state, status_code=200 if warmup.is_ready() else 503)
+
+@app.get("/health/startup")
+async def startup_health():
+    """Time spent importing, in startup hooks and in each warm-up step."""
+    return {**startup_profile.report(), "warmup": warmup.readiness()}
+
+@app.get("/health/agents")
+async def agent_cache_health():
+    """Chat agent cache size and hit/miss/eviction counters."""
+    return agents.stats()
+
+@app.get("/health/cache")
+async def retrieval_cache_health():
+    """Query-embedding and retrieval cache counters."""
+    return get_cache_stats()
+
+@app.get("/health/db")
+async def db_pool_health():
+    """Connection pool saturation statistics."""
+    return get_pool_stats()
+
+@app.get("/health/stages")
+async def stage_pool_health():
+    """Concurrency limit and in-flight calls of each stage pool."""
+    return get_stage_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage latency histograms and counters in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.on_event("shutdown")
+def stop_stage_pools():
+    job_queue.shutdown()
+    shutdown_pools()
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
@@ -1,34 +1,155 @@
-from typing import List
+import time
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Deque, Iterator, List, Tuple, Union
 from phi.knowledge.pdf import PDFReader
 from phi.document import Document
 import logging
 
+from config import config
+from stage_pools import get_pool
+from document_extraction import EBOOK_EXTENSIONS, extract_pdf_page_range
+from ebook_reader import iter_ebook_sections
+from metrics import INGEST_STAGE_SECONDS
+
 logger = logging.getLogger(__name__)
 
+def _document_name(pdf: Union[str, Path]) -> str:
+    """Derive the document name the same way phi's PDFReader does."""
+    if isinstance(pdf, str):
+        return pdf.split("/")[-1].split(".")[0].replace(" ", "_")
+    return pdf.name.split(".")[0]
+
 class FilteredPDFReader(PDFReader):
     """
     Custom PDF reader that filters out empty content chunks to prevent
     embedding dimension errors when processing PDFs with empty pages.
+
+    Text is extracted with PyMuPDF; large PDFs are split into page ranges
+    that are extracted in parallel worker processes. iter_documents() streams
+    chunks as pages arrive, so callers can start embedding before the whole
+    book has been read. It also reads EPUB and MOBI/AZW books section by
+    section, so every library format gets the same chunks and embedding path.
     """
-    
+
+    def _iter_page_texts(self, pdf_path: str, page_count: int) -> Iterator[Tuple[int, str]]:
+        """
+        Yield non-empty (page number, text) pairs in page order as they are extracted.
+        Large PDFs are extracted in parallel page ranges, with only a bounded number
+        of ranges in flight so memory does not grow with book length.
+        """
+        if page_count < config.PDF_PARALLEL_MIN_PAGES or config.PDF_EXTRACT_WORKERS <= 1:
+            import fitz  # PyMuPDF
+
+            with fitz.open(pdf_path) as pdf_doc:
+                for page_index in range(page_count):
+                    text = pdf_doc[page_index].get_text("text")
+                    if text and text.strip():
+                        yield page_index + 1, text
+            return
+
+        pages_per_task = max(1, config.PDF_PAGES_PER_TASK)
+        max_in_flight = max(1, config.PDF_EXTRACT_WORKERS * 2)
+        pool = get_pool("extract")
+        in_flight: Deque[Future] = deque()
+
+        for start in range(0, page_count, pages_per_task):
+            in_flight.append(pool.submit(extract_pdf_page_range, pdf_path, start, min(start + pages_per_task, page_count)))
+            if len(in_flight) >= max_in_flight:
+                yield from in_flight.popleft().result()
+
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+    def iter_documents(self, pdf) -> Iterator[Document]:
+        """
+        Stream chunks (or pages, when chunking is off) while the PDF is still being read.
+        Chunking follows the same chunk_size/chunk_overlap semantics as read().
+        EPUB and MOBI/AZW books are streamed the same way, one spine section per "page".
+        """
+        if not isinstance(pdf, (str, Path)):
+            # File-like objects can't be shared with worker processes; use the pypdf reader
+            yield from self._read_with_pypdf(pdf)
+            return
+
+        if Path(pdf).suffix.lower() in EBOOK_EXTENSIONS:
+            yield from self._iter_page_documents(pdf, iter_ebook_sections(Path(pdf)), unit="sections")
+            return
+
+        try:
+            import fitz  # PyMuPDF
+
+            with fitz.open(str(pdf)) as pdf_doc:
+                page_count = pdf_doc.page_count
+        except Exception as e:
+            logger.warning(f"PyMuPDF could not open {pdf}, falling back to pypdf: {e}")
+            yield from self._read_with_pypdf(pdf)
+            return
+
+        yield from self._iter_page_documents(pdf, self._iter_page_texts(str(pdf), page_count), unit="pages")
+
+    def _iter_page_documents(self, pdf, pages: Iterator[Tuple[int, str]], unit: str) -> Iterator[Document]:
+        """Turn (page number, text) pairs into page documents, chunked when chunking is on."""
+        doc_name = _document_name(pdf)
+        page_total = 0
+        # Time spent waiting for page text and chunking it, excluding whatever the consumer does in between
+        extract_seconds = chunk_seconds = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                page = next(pages, None)
+                extract_seconds += time.perf_counter() - started
+                if page is None:
+                    break
+
+                page_number, text = page
+                page_total += 1
+                document = Document(
+                    name=doc_name,
+                    id=f"{doc_name}_{page_number}",
+                    meta_data={"page": page_number},
+                    content=text,
+                )
+                if self.chunk:
+                    started = time.perf_counter()
+                    chunks = self.chunk_document(document)
+                    chunk_seconds += time.perf_counter() - started
+                    yield from chunks
+                else:
+                    yield document
+        finally:
+            INGEST_STAGE_SECONDS.observe(extract_seconds, stage="extract")
+            INGEST_STAGE_SECONDS.observe(chunk_seconds, stage="chunk")
+
+        logger.info(f"Processed {pdf}: {page_total} {unit} with text")
+
     def read(self, pdf) -> List[Document]:
         """
         Read a PDF file and return a list of documents, filtering out empty content.
-        
+
         Args:
             pdf: Path to the PDF file (str, Path, or file-like object)
-            
+
         Returns:
             List of Document objects with non-empty content
         """
+        try:
+            return list(self.iter_documents(pdf))
+        except Exception as e:
+            logger.warning(f"PyMuPDF extraction failed for {pdf}, falling back to pypdf: {e}")
+            return self._read_with_pypdf(pdf)
+
+    def _read_with_pypdf(self, pdf) -> List[Document]:
+        """Read with phi's pypdf-based reader, filtering out empty content."""
         try:
             # Get documents from parent class
             documents = super().read(pdf)
-            
+
             # Filter out documents with empty or whitespace-only content
             filtered_documents = []
             empty_count = 0
-            
+
             for doc in documents:
                 if doc.content and doc.content.strip():
                     # Only keep documents with actual content
@@ -36,18 +157,18 @@ class FilteredPDFReader(PDFReader):
                 else:
                     empty_count += 1
                     logger.debug(f"Filtered out empty document from {pdf}")
-            
+
             if empty_count > 0:
                 logger.info(f"Filtered out {empty_count} empty documents from {pdf}")
-            
+
             logger.info(f"Processed {pdf}: {len(filtered_documents)} valid documents (filtered {empty_count} empty)")
-            
+
             return filtered_documents
-            
+
         except Exception as e:
             logger.error(f"Error reading PDF {pdf}: {e}")
             return []
-    
+
     def chunk_document(self, document: Document) -> List[Document]:
         """
         Override chunk_document to ensure chunks are also filtered for empty content.
@@ -55,15 +176,15 @@ class FilteredPDFReader(PDFReader):
         try:
             # Get chunks from parent class
             chunks = super().chunk_document(document)
-            
+
             # Filter out empty chunks
             filtered_chunks = []
             for chunk in chunks:
                 if chunk.content and chunk.content.strip():
                     filtered_chunks.append(chunk)
-            
+
             return filtered_chunks
-            
+
         except Exception as e:
             logger.error(f"Error chunking document: {e}")
-            return [] 
\ No newline at end of file
+            return []
@@ -0,0 +1,119 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+import logging
+
+from config import config
+from metrics import CallbackMetric, register
+
+logger = logging.getLogger(__name__)
+
+class LRUCache:
+    """Small thread-safe LRU mapping with a size limit and hit/miss/eviction counters."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = max(1, maxsize)
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+def normalize_text(text: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used in cache keys."""
+    return " ".join(text.split()).casefold()
+
+# Level 1: (embedding model, normalized text) -> query embedding
+embedding_cache = LRUCache(config.EMBEDDING_CACHE_SIZE)
+
+# Level 2: (document, normalized query, retrieval params, version) -> top-k chunk ids
+retrieval_cache = LRUCache(config.RETRIEVAL_CACHE_SIZE)
+
+# Retrieval results are keyed by these versions; bumping one makes old entries unreachable
+_versions_lock = threading.Lock()
+_global_version = 0
+_document_versions: Dict[str, int] = {}
+
+def get_retrieval_version(document_name: Optional[str]) -> tuple:
+    with _versions_lock:
+        return (_global_version, _document_versions.get(document_name, 0) if document_name else 0)
+
+def bump_retrieval_version(document_name: Optional[str] = None) -> None:
+    """
+    Invalidate cached retrieval results after an ingest or removal.
+    With a document name only that document's results are invalidated, otherwise all of them.
+    """
+    global _global_version
+    with _versions_lock:
+        if document_name:
+            _document_versions[document_name] = _document_versions.get(document_name, 0) + 1
+        else:
+            _global_version += 1
+
+def retrieval_key(
+    document_name: Optional[str],
+    query: str,
+    num_documents: Optional[int],
+    filters: Optional[Dict[str, Any]],
+    params: Dict[str, Any],
+) -> tuple:
+    return (
+        document_name,
+        normalize_text(query),
+        num_documents,
+        json.dumps(filters or {}, sort_keys=True, default=str),
+        json.dumps(params, sort_keys=True, default=str),
+        get_retrieval_version(document_name),
+    )
+
+def get_cache_stats() -> Dict[str, Any]:
+    return {"embeddings": embedding_cache.stats(), "retrieval": retrieval_cache.stats()}
+
+def _cache_counter(field: str):
+    return lambda: {
+        (name,): stats[field]
+        for name, stats in get_cache_stats().items()
+    }
+
+register(CallbackMetric(
+    "calibre_cache_hits_total", "Retrieval cache hits, by cache.", _cache_counter("hits"), ["cache"], type_name="counter",
+))
+register(CallbackMetric(
+    "calibre_cache_misses_total", "Retrieval cache misses, by cache.", _cache_counter("misses"), ["cache"], type_name="counter",
+))
@@ -0,0 +1,293 @@
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Metadata fields searched, with how much a match in each counts
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "author": 2.5,
+    "subject": 1.5,
+    "publisher": 1.0,
+    "original_filename": 1.0,
+    "aliases": 1.0,
+    "description": 0.5,
+}
+
+# BM25 parameters, applied to the field-weighted term frequencies
+K1 = 1.2
+B = 0.75
+
+# Query terms that only match a longer word (prefix) or a misspelling (fuzzy) score less than exact hits
+PREFIX_WEIGHT = 0.7
+FUZZY_WEIGHT = 0.5
+MAX_PREFIX_EXPANSIONS = 64
+FUZZY_MIN_LENGTH = 4  # Shorter words have too many one-edit neighbours to be useful
+
+STOPWORDS = frozenset(
+    "a an and are as at be by de des du for from in into is it la le les of on or the to with".split()
+)
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+def tokenize(text: str) -> List[str]:
+    """Case- and accent-insensitive word tokens, without stopwords."""
+    text = text.casefold()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    return [token for token in _TOKEN_RE.findall(text) if token not in STOPWORDS]
+
+def _deletes(term: str) -> Set[str]:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True if a and b differ by at most one insertion, deletion, substitution or adjacent transposition."""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i + 1:i + 2] == b[i:i + 1] and a[i:i + 1] == b[i + 1:i + 2] and a[i + 2:] == b[i + 2:])
+    return a[i:] == b[i + 1:]
+
+def _top(scores: Dict[str, float], limit: int) -> List[Tuple[str, float]]:
+    """Highest scores first; equal scores in ascending doc id order, so ties rank the same in every process."""
+    return heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+
+def _document_terms(metadata: Dict[str, Any]) -> Dict[str, float]:
+    """Field-weighted term frequencies of a document's metadata."""
+    terms: Dict[str, float] = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        value = metadata.get(field)
+        if not value:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = " ".join(str(item) for item in value)
+        for token in tokenize(str(value)):
+            terms[token] = terms.get(token, 0.0) + weight
+    return terms
+
+class LibrarySearchIndex:
+    """
+    In-memory inverted index over library metadata (title, author, subject, ...).
+
+    - Postings map each term to the documents containing it, with field-weighted
+      term frequencies, ranked with BM25.
+    - A sorted vocabulary answers prefix queries with a bisect (search as you type).
+    - A symmetric-delete map (every term with one character removed) finds terms
+      within one edit of a misspelled query word without scanning the vocabulary.
+
+    Documents are added and removed incrementally; a query only touches the postings
+    of its own terms, so it stays in the milliseconds for libraries of 100k books.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._vocabulary: List[str] = []
+        self._deletes: Dict[str, Set[str]] = {}
+        self._doc_terms: Dict[str, Tuple[str, ...]] = {}
+        self._doc_lengths: Dict[str, float] = {}
+        self._total_length = 0.0
+        # BM25 length normalization per document, for the average length it was computed with
+        self._norms: Dict[str, float] = {}
+        self._norms_average = 0.0
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def ensure_built(self, load_documents: Callable[[], Iterable[Dict[str, Any]]]) -> None:
+        """Index every document from `load_documents` the first time it's called."""
+        with self._lock:
+            if self._built:
+                return
+            for metadata in load_documents():
+                self._add(metadata, keep_sorted=False)
+            # Sorting once beats keeping the vocabulary sorted term by term
+            self._vocabulary = sorted(self._postings)
+            self._built = True
+            logger.info(f"🔎 Indexed {len(self)} documents for search")
+
+    def add(self, metadata: Dict[str, Any]) -> None:
+        """Index (or re-index) a document's metadata."""
+        with self._lock:
+            self._add(metadata, keep_sorted=True)
+
+    def _add(self, metadata: Dict[str, Any], keep_sorted: bool) -> None:
+        doc_id = metadata["id"]
+        terms = _document_terms(metadata)
+        self.remove(doc_id)
+        for term, frequency in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                if keep_sorted:
+                    insort(self._vocabulary, term)
+                if len(term) >= FUZZY_MIN_LENGTH:
+                    for variant in _deletes(term):
+                        self._deletes.setdefault(variant, set()).add(term)
+            postings[doc_id] = frequency
+        self._doc_terms[doc_id] = tuple(terms)
+        length = sum(terms.values())
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+        if self._norms_average:
+            self._norms[doc_id] = self._norm(length, self._norms_average)
+
+    def remove(self, doc_id: str) -> bool:
+        with self._lock:
+            terms = self._doc_terms.pop(doc_id, None)
+            if terms is None:
+                return False
+            self._total_length -= self._doc_lengths.pop(doc_id)
+            self._norms.pop(doc_id, None)
+            for term in terms:
+                postings = self._postings[term]
+                del postings[doc_id]
+                if postings:
+                    continue
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+                if len(term) >= FUZZY_MIN_LENGTH:
+                    for variant in _deletes(term):
+                        neighbours = self._deletes[variant]
+                        neighbours.discard(term)
+                        if not neighbours:
+                            del self._deletes[variant]
+            return True
+
+    @staticmethod
+    def _norm(length: float, average_length: float) -> float:
+        return K1 * (1 - B + B * length / average_length)
+
+    def _current_norms(self) -> Dict[str, float]:
+        """Per-document norms, recomputed only when the average length has drifted by 10%."""
+        average_length = self._total_length / len(self._doc_lengths) or 1.0
+        if abs(average_length - self._norms_average) > 0.1 * self._norms_average or not self._norms_average:
+            self._norms_average = average_length
+            self._norms = {doc_id: self._norm(length, average_length) for doc_id, length in self._doc_lengths.items()}
+        return self._norms
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        start = bisect_left(self._vocabulary, prefix)
+        terms = []
+        for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def _fuzzy_terms(self, token: str) -> Set[str]:
+        candidates = set(self._deletes.get(token, ()))  # Terms with one extra character
+        for variant in _deletes(token):
+            if variant in self._postings:  # Terms with one character fewer
+                candidates.add(variant)
+            candidates.update(self._deletes.get(variant, ()))  # Substitutions and transpositions
+        return {term for term in candidates if _within_one_edit(token, term)}
+
+    def _variants(self, token: str, is_last: bool) -> Dict[str, float]:
+        """Indexed terms a query token matches, with the weight of each kind of match."""
+        variants = {token: 1.0} if token in self._postings else {}
+        if is_last:
+            for term in self._prefix_terms(token):
+                variants.setdefault(term, PREFIX_WEIGHT)
+        if len(token) >= FUZZY_MIN_LENGTH:
+            for term in self._fuzzy_terms(token):
+                variants.setdefault(term, FUZZY_WEIGHT)
+        return variants
+
+    @staticmethod
+    def _best_scores(
+        matches: List[Tuple[Dict[str, float], float]],
+        norms: Dict[str, float],
+        restrict: Optional[Set[str]] = None,
+    ) -> Dict[str, float]:
+        """BM25 score of one query word per document, keeping the best of the terms it matched."""
+        best: Dict[str, float] = {}
+        for postings, factor in matches:
+            if restrict is None:
+                items = postings.items()
+            elif len(postings) <= len(restrict):
+                items = [(doc_id, frequency) for doc_id, frequency in postings.items() if doc_id in restrict]
+            else:
+                items = [(doc_id, postings[doc_id]) for doc_id in restrict if doc_id in postings]
+            if not best:
+                best = {doc_id: factor * frequency / (frequency + norms[doc_id]) for doc_id, frequency in items}
+                continue
+            for doc_id, frequency in items:
+                score = factor * frequency / (frequency + norms[doc_id])
+                # A document matching a word several ways counts its best match once
+                if score > best.get(doc_id, 0.0):
+                    best[doc_id] = score
+        return best
+
+    def search(self, query: str, limit: int = 20) -> Tuple[List[Tuple[str, float]], int]:
+        """
+        Rank documents for a free-text query.
+        The last word also matches as a prefix, and words of FUZZY_MIN_LENGTH or more
+        letters tolerate one typo. Documents matching every (known) word are returned when
+        there are any, otherwise documents matching some of them.
+        Returns the top (doc_id, score) pairs, ties broken by doc id, and the total number of matches.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return [], 0
+
+        with self._lock:
+            document_count = len(self._doc_lengths)
+            if not document_count:
+                return [], 0
+            norms = self._current_norms()
+
+            # Per query word: the postings of every term it matches, with weight * idf
+            token_postings = []
+            for position, token in enumerate(tokens):
+                matches = []
+                for term, weight in self._variants(token, position == len(tokens) - 1).items():
+                    postings = self._postings[term]
+                    idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    matches.append((postings, weight * idf * (K1 + 1)))
+                token_postings.append(matches)
+
+            if len(token_postings) == 1:
+                best = self._best_scores(token_postings[0], norms)
+                return _top(best, limit), len(best)
+
+            # Intersect the candidates first (rarest word first), so only those get scored;
+            # words matching nothing at all are ignored rather than emptying the result
+            candidates = []
+            for matches in token_postings:
+                if len(matches) == 1:
+                    candidates.append(matches[0][0].keys())
+                elif matches:
+                    candidates.append(set().union(*(postings.keys() for postings, _ in matches)))
+            if not candidates:
+                return [], 0
+            candidates.sort(key=len)
+            matched = set(candidates[0]).intersection(*candidates[1:])
+            if not matched:
+                matched = set().union(*candidates)
+
+            totals: Dict[str, float] = dict.fromkeys(matched, 0.0)
+            for matches in token_postings:
+                for doc_id, score in self._best_scores(matches, norms, matched).items():
+                    totals[doc_id] += score
+
+        return _top(totals, limit), len(totals)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"built": self._built, "documents": len(self._doc_lengths), "terms": len(self._postings)}
@@ -0,0 +1,123 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Iterator
+import logging
+
+from config import config
+from metrics import CallbackMetric, register
+
+logger = logging.getLogger(__name__)
+
+# I/O-bound stages run in threads, CPU-bound stages in processes.
+# Each stage gets its own pool, so its size is also its concurrency limit.
+THREAD_STAGES = {
+    "db": config.DB_STAGE_WORKERS,
+    "disk": config.DISK_STAGE_WORKERS,
+    "chat": config.CHAT_STAGE_WORKERS,
+}
+PROCESS_STAGES = {
+    "render": config.RENDER_WORKERS,
+    "extract": config.PDF_EXTRACT_WORKERS,
+}
+
+# Worker processes must not be forked from this multithreaded server: a fork copies its
+# sockets, SQLite handles and any lock another thread happens to hold. Workers are started
+# from a clean fork server instead (spawn where that's unavailable), which preloads the
+# module holding the process-stage functions so each new worker starts quickly.
+_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+_WORKER_MODULES = ["document_extraction"]
+
+_pools: Dict[str, Executor] = {}
+_pools_lock = threading.Lock()
+
+# Calls submitted to / currently running in each stage
+_stats_lock = threading.Lock()
+_submitted: Dict[str, int] = {}
+_running: Dict[str, int] = {}
+
+def get_pool(stage: str) -> Executor:
+    """Get the pool for a stage, created on first use."""
+    with _pools_lock:
+        pool = _pools.get(stage)
+        if pool is None:
+            if stage in THREAD_STAGES:
+                pool = ThreadPoolExecutor(max_workers=max(1, THREAD_STAGES[stage]), thread_name_prefix=stage)
+            elif stage in PROCESS_STAGES:
+                context = multiprocessing.get_context(_START_METHOD)
+                if _START_METHOD == "forkserver":
+                    context.set_forkserver_preload(_WORKER_MODULES)
+                pool = ProcessPoolExecutor(max_workers=max(1, PROCESS_STAGES[stage]), mp_context=context)
+            else:
+                raise ValueError(f"Unknown stage: {stage}")
+            _pools[stage] = pool
+        return pool
+
+def _track(stage: str, delta: int, counter: Dict[str, int]) -> None:
+    with _stats_lock:
+        counter[stage] = counter.get(stage, 0) + delta
+
+def _tracked_call(stage: str, func: Callable, *args: Any, **kwargs: Any) -> Any:
+    _track(stage, 1, _running)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _track(stage, -1, _running)
+
+async def run_in_stage(stage: str, func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Await a blocking call in a thread stage's pool instead of on the event loop."""
+    if stage not in THREAD_STAGES:
+        raise ValueError(f"Not a thread stage: {stage}")
+    _track(stage, 1, _submitted)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_pool(stage), partial(_tracked_call, stage, func, *args, **kwargs))
+    finally:
+        _track(stage, -1, _submitted)
+
+async def iterate_in_stage(stage: str, iterator: Iterator) -> AsyncIterator:
+    """Pull items from a blocking iterator one at a time in a thread stage's pool."""
+    sentinel = object()
+    while True:
+        item = await run_in_stage(stage, next, iterator, sentinel)
+        if item is sentinel:
+            return
+        yield item
+
+def run_in_process(stage: str, func: Callable, *args: Any) -> Any:
+    """
+    Run a CPU-bound call in a process stage's pool and wait for the result.
+    Meant for worker threads; with the stage's limit set to 0 the call runs in the calling thread.
+    """
+    if PROCESS_STAGES.get(stage, 0) <= 0:
+        return func(*args)
+    _track(stage, 1, _submitted)
+    try:
+        return get_pool(stage).submit(func, *args).result()
+    finally:
+        _track(stage, -1, _submitted)
+
+def get_stage_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-stage limit, in-flight calls and (for thread stages) calls currently running."""
+    with _stats_lock:
+        stats = {}
+        for stage, limit in {**THREAD_STAGES, **PROCESS_STAGES}.items():
+            stats[stage] = {"limit": limit, "in_flight": _submitted.get(stage, 0)}
+            if stage in THREAD_STAGES:
+                stats[stage]["running"] = _running.get(stage, 0)
+        return stats
+
+register(CallbackMetric(
+    "calibre_stage_in_flight",
+    "Calls submitted to each stage pool and not yet finished.",
+    lambda: {(stage,): stats["in_flight"] for stage, stats in get_stage_stats().items()},
+    ["stage"],
+))
+
+def shutdown_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
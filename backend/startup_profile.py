@@ -0,0 +1,91 @@
+"""
+Startup profiling.
+
+In the server, startup phases (module imports, startup hooks, warm-up steps) are
+recorded with mark() and timed() and reported at /health/startup.
+
+From the command line, `python -m startup_profile [module]` imports a module in a
+fresh interpreter with `-X importtime` and prints the slowest top-level packages,
+to spot heavy dependencies creeping back into the import path.
+"""
+import argparse
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Import this module first so its load time approximates the start of the process
+_started = time.perf_counter()
+_last_mark = _started
+_phases: Dict[str, float] = {}
+_lock = threading.Lock()
+
+def record(phase: str, seconds: float) -> None:
+    with _lock:
+        _phases[phase] = round(seconds, 4)
+
+def mark(phase: str) -> float:
+    """Record the time since the previous mark (or process start) as `phase`."""
+    global _last_mark
+    now = time.perf_counter()
+    with _lock:
+        elapsed = now - _last_mark
+        _last_mark = now
+    record(phase, elapsed)
+    return elapsed
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - started)
+
+def report() -> Dict[str, Any]:
+    with _lock:
+        phases = dict(_phases)
+    return {
+        "uptime_seconds": round(time.perf_counter() - _started, 3),
+        "phases": phases,
+    }
+
+def import_profile(module: str = "main") -> List[Tuple[str, float]]:
+    """Import time spent in each top-level package when importing `module`, slowest first."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        # The import trace still goes to stderr; keep only the traceback for the message
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"Importing {module} failed:\n" + "\n".join(errors))
+
+    # Lines look like "import time: self [us] | cumulative | <indent>module"; summing the self
+    # time of every submodule charges each package for its own work, not its dependencies'.
+    totals: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        try:
+            self_us, _, name = line[len("import time:"):].split("|")
+            seconds = int(self_us) / 1_000_000
+        except ValueError:
+            continue  # The header line
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0.0) + seconds
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show which packages dominate a module's import time")
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    profile = import_profile(args.module)
+    print(f"⏱️  Importing {args.module}: {sum(seconds for _, seconds in profile) * 1000:.0f} ms")
+    for package, seconds in profile[:args.top]:
+        print(f"  {seconds * 1000:8.1f} ms  {package}")
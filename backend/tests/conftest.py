@@ -0,0 +1,131 @@
+import json
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+class ChunkTable:
+    """
+    In-memory stand-in for ai.pdf_documents.
+    Rows are captured from EmbeddingPipeline.write_batch, and searched with the
+    same filter semantics phi's PgVector.search applies: `filters @> <search filters>`.
+    """
+
+    def __init__(self):
+        self.rows: Dict[str, Dict[str, Any]] = {}
+
+    def upsert(self, rows: List[tuple]) -> None:
+        for id, name, meta_data, filters, content, embedding, usage, content_hash in rows:
+            self.rows[id] = {
+                "id": id,
+                "name": name,
+                "meta_data": json.loads(meta_data) if meta_data else {},
+                "filters": json.loads(filters) if filters else None,
+                "content": content,
+                "content_hash": content_hash,
+            }
+
+    def search(self, query: str, limit: int, filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        words = set(query.casefold().split())
+        matches = [
+            row for row in self.rows.values()
+            if filters is None or (row["filters"] is not None and filters.items() <= row["filters"].items())
+        ]
+        matches.sort(key=lambda row: (-len(words & set(row["content"].casefold().split())), row["id"]))
+        return matches[:limit]
+
+    def delete_stale(self, document_id: str, keep_ids) -> int:
+        """Same rows db_utils.delete_stale_chunks deletes."""
+        stale = [
+            chunk_id for chunk_id, row in self.rows.items()
+            if (row["filters"] or {}).get("document_id") == document_id and chunk_id not in keep_ids
+        ]
+        for chunk_id in stale:
+            del self.rows[chunk_id]
+        return len(stale)
+
+    def fetch(self, chunk_ids: List[str]) -> List[Dict[str, Any]]:
+        return [
+            {key: self.rows[chunk_id][key] for key in ("id", "name", "meta_data", "content")}
+            for chunk_id in chunk_ids
+            if chunk_id in self.rows
+        ]
+
+@pytest.fixture
+def chunk_table(monkeypatch) -> ChunkTable:
+    """Route the embedding pipeline's bulk upserts into an in-memory table."""
+    embedding_pipeline = pytest.importorskip("embedding_pipeline")
+    table = ChunkTable()
+
+    @contextmanager
+    def get_connection():
+        class Connection:
+            def cursor(self):
+                return self
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+        yield Connection()
+
+    monkeypatch.setattr(embedding_pipeline, "get_connection", get_connection)
+    monkeypatch.setattr(embedding_pipeline, "execute_values", lambda cur, sql, rows, template=None: table.upsert(rows))
+    return table
+
+@pytest.fixture
+def embedding_pipeline(chunk_table, monkeypatch):
+    """An EmbeddingPipeline with a deterministic embedder and no database lookups."""
+    from embedding_pipeline import EmbeddingPipeline
+
+    pipeline = EmbeddingPipeline(batch_size=2, max_in_flight=2, reuse_existing=False)
+    monkeypatch.setattr(pipeline, "embed_texts", lambda texts: [[float(len(text)), 1.0] for text in texts])
+    return pipeline
+
+@pytest.fixture
+def ingested(embedding_pipeline, chunk_table):
+    """Both BOOKS ingested through the real chunk keying and embedding pipeline."""
+    pytest.importorskip("phi")
+    from ingestion import _key_documents
+    from retrieval_cache import retrieval_cache
+    from tests.fakes import BOOKS, book_chunks
+
+    for position, document_name in enumerate(BOOKS):
+        embedding_pipeline.run(_key_documents(book_chunks(document_name), f"doc-{position}", document_name))
+    retrieval_cache.clear()
+    yield chunk_table
+    retrieval_cache.clear()
+
+@pytest.fixture(scope="session")
+def main_module(tmp_path_factory):
+    """The app module, imported from a scratch directory so its data/ folders land there."""
+    pytest.importorskip("fastapi")
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    try:
+        import main
+    finally:
+        os.chdir(cwd)
+    return main
+
+@pytest.fixture
+def library(main_module, tmp_path, monkeypatch):
+    """A fresh library behind the app, with no documents in the vector store."""
+    from document_index import DocumentIndex
+    from library_manager import LibraryManager
+
+    library = LibraryManager(str(tmp_path / "library"))
+    monkeypatch.setattr(main_module, "library_manager", library)
+    monkeypatch.setattr(main_module, "_load_document_index", lambda: DocumentIndex([]))
+    yield library
+    library.catalog.close()
+
+@pytest.fixture
+def client(main_module, library):
+    """A test client that doesn't run the startup hooks (no database or Ollama needed)."""
+    from fastapi.testclient import TestClient
+
+    return TestClient(main_module.app)
@@ -0,0 +1,54 @@
+"""Test doubles that need phi; import them after checking phi is installed."""
+from typing import Any, Dict, List, Optional
+
+from phi.document import Document
+from phi.vectordb.base import VectorDb
+
+from agent import DocumentScopedKnowledgeBase
+
+class InMemoryVectorDb(VectorDb):
+    """Searches a ChunkTable the way PgVector does, filtering on the `filters` column."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return [
+            Document(id=row["id"], name=row["name"], meta_data=row["meta_data"], content=row["content"])
+            for row in self.table.search(query, limit, filters)
+        ]
+
+    def create(self) -> None: ...
+    def doc_exists(self, document: Document) -> bool: ...
+    def name_exists(self, name: str) -> bool: ...
+    def id_exists(self, id: str) -> bool: ...
+    def insert(self, documents, filters=None) -> None: ...
+    def upsert(self, documents, filters=None) -> None: ...
+    def vector_search(self, query: str, limit: int = 5) -> List[Document]: ...
+    def keyword_search(self, query: str, limit: int = 5) -> List[Document]: ...
+    def hybrid_search(self, query: str, limit: int = 5) -> List[Document]: ...
+    def drop(self) -> None: ...
+    def exists(self) -> bool: ...
+    def delete(self) -> bool: ...
+
+BOOKS = {
+    "moby-dick": ["Call me Ishmael", "The whale surfaced near the ship", "Ahab hunted the white whale"],
+    "walden": ["I went to the woods", "The pond froze over", "A whale of a winter by the pond"],
+}
+
+def book_chunks(document_name: str) -> List[Document]:
+    return [
+        Document(content=text, meta_data={"page": 1, "chunk": number})
+        for number, text in enumerate(BOOKS[document_name], start=1)
+    ]
+
+def scoped_knowledge_base(
+    table, document_name: Optional[str], document_id: Optional[str] = None
+) -> DocumentScopedKnowledgeBase:
+    return DocumentScopedKnowledgeBase(
+        path="data/pdf_files",
+        vector_db=InMemoryVectorDb(table),
+        num_documents=10,
+        document_name=document_name,
+        document_id=document_id,
+    )
@@ -0,0 +1,133 @@
+import threading
+
+import pytest
+
+import agent_cache
+from agent_cache import AgentCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(agent_cache.time, "monotonic", clock)
+    return clock
+
+def _cache(capacity=2, ttl_seconds=60.0, **kwargs):
+    built, evicted = [], []
+
+    def factory(key):
+        built.append(key)
+        return f"agent:{key}"
+
+    cache = AgentCache(factory, capacity=capacity, ttl_seconds=ttl_seconds, on_evict=evicted.append, **kwargs)
+    return cache, built, evicted
+
+def test_hits_reuse_the_built_agent(clock):
+    cache, built, _ = _cache()
+
+    assert cache.get("walden") == "agent:walden"
+    assert cache.get("walden") == "agent:walden"
+    assert built == ["walden"]
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+def test_least_recently_used_is_evicted(clock):
+    cache, built, evicted = _cache(capacity=2)
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")
+    cache.get("c")
+
+    assert evicted == ["b"]
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+def test_idle_agents_expire(clock):
+    cache, built, evicted = _cache(capacity=5, ttl_seconds=60)
+    cache.get("a")
+    clock.now += 30
+    cache.get("b")
+    clock.now += 40  # a idle for 70s, b for 40s
+
+    cache.get("b")
+    assert evicted == ["a"]
+    assert cache.stats()["expirations"] == 1
+
+    clock.now += 59
+    cache.get("b")
+    assert "b" in cache
+
+def test_zero_ttl_never_expires(clock):
+    cache, _, evicted = _cache(ttl_seconds=0)
+    cache.get("a")
+    clock.now += 10 ** 6
+    cache.get("a")
+
+    assert evicted == []
+
+def test_concurrent_misses_build_once(clock):
+    started, release = threading.Event(), threading.Event()
+    builds = []
+
+    def factory(key):
+        builds.append(key)
+        started.set()
+        release.wait(5)
+        return object()
+
+    cache = AgentCache(factory, capacity=2, ttl_seconds=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("walden"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert builds == ["walden"]
+    assert len(results) == 4 and all(result is results[0] for result in results)
+
+def test_failed_builds_are_not_cached(clock):
+    attempts = []
+
+    def factory(key):
+        attempts.append(key)
+        if len(attempts) == 1:
+            raise RuntimeError("knowledge base unavailable")
+        return "agent"
+
+    cache = AgentCache(factory, capacity=2, ttl_seconds=60)
+    with pytest.raises(RuntimeError):
+        cache.get("walden")
+
+    assert cache.get("walden") == "agent"
+    assert cache.preload(["moby", "walden"]) == 2
+
+def test_evicted_conversation_locks_are_dropped_on_the_loop_when_idle(main_module, monkeypatch):
+    import asyncio
+
+    monkeypatch.setattr(main_module, "conversation_locks", {})
+
+    async def scenario():
+        monkeypatch.setattr(main_module, "_event_loop", asyncio.get_running_loop())
+        held = main_module._conversation_lock("held")
+        main_module._conversation_lock("idle")
+        async with held:
+            # Evictions run in worker threads
+            evict = threading.Thread(target=lambda: [main_module._drop_conversation_lock(key) for key in ("held", "idle")])
+            evict.start()
+            evict.join()
+            assert set(main_module.conversation_locks) == {"held", "idle"}
+
+            await asyncio.sleep(0)
+            assert main_module.conversation_locks == {"held": held}
+            # A second turn of the held conversation waits for the same lock
+            assert main_module._conversation_lock("held") is held
+
+    asyncio.run(scenario())
@@ -0,0 +1,123 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+import psycopg2.extensions
+
+import db_pool
+from config import config
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.alive = True
+        self.info = SimpleNamespace(transaction_status=psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql):
+                if not connection.alive:
+                    raise psycopg2.OperationalError("server closed the connection")
+
+        return Cursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+@pytest.fixture
+def connections(monkeypatch):
+    opened = []
+
+    def connect(dsn, **kwargs):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(db_pool.psycopg2, "connect", connect)
+    return opened
+
+def _pool(min_size=1, max_size=2, timeout=0.05):
+    return db_pool.ConnectionPool(
+        "postgresql://test", min_size=min_size, max_size=max_size, timeout=timeout,
+        connect_timeout=1, statement_timeout_ms=1000,
+    )
+
+def test_tracks_checked_out_and_idle_connections(connections):
+    pool = _pool(min_size=1, max_size=3)
+    assert pool.stats()["idle"] == 1
+
+    with pool.connection() as first, pool.connection() as second:
+        stats = pool.stats()
+        assert (stats["in_use"], stats["idle"]) == (2, 0)
+        assert first is connections[0] and second is connections[1]
+
+    stats = pool.stats()
+    assert (stats["in_use"], stats["idle"], stats["checkouts"]) == (0, 2, 2)
+
+def test_reuses_idle_connections(connections):
+    pool = _pool()
+    for _ in range(5):
+        with pool.connection():
+            pass
+
+    assert len(connections) == 1
+
+def test_replaces_dead_connections(connections):
+    pool = _pool()
+    connections[0].alive = False
+
+    with pool.connection() as conn:
+        assert conn is connections[1]
+    assert connections[0].closed
+    assert pool.stats()["replaced_connections"] == 1
+
+def test_waits_then_times_out_when_exhausted(connections):
+    pool = _pool(max_size=1)
+    with pool.connection():
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+    assert pool.stats()["timeouts"] == 1
+
+def test_never_opens_more_than_max_size(connections):
+    pool = _pool(min_size=0, max_size=2, timeout=5)
+    barrier = threading.Barrier(4, timeout=5)
+    peak = []
+
+    def borrow():
+        barrier.wait()
+        with pool.connection():
+            peak.append(pool.stats()["in_use"])
+
+    threads = [threading.Thread(target=borrow) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) <= 2
+    assert len(connections) <= 2
+
+@pytest.mark.parametrize("total, engine", [(10, 3), (4, 3), (2, 5), (1, 1)])
+def test_engine_and_pool_share_the_connection_budget(monkeypatch, total, engine):
+    monkeypatch.setattr(config, "DB_POOL_MAX_SIZE", total)
+    monkeypatch.setattr(config, "DB_ENGINE_POOL_SIZE", engine)
+    engine_size = db_pool._engine_pool_size()
+
+    assert engine_size >= 1
+    assert engine_size + max(1, total - engine_size) <= max(total, 2)
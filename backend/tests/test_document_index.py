@@ -0,0 +1,66 @@
+import random
+
+from document_index import (
+    DocumentIndex,
+    document_scope_filters,
+    get_document_name,
+    legacy_db_documents,
+    merge_library_and_db_documents,
+)
+
+def _db(*filenames):
+    return [{"id": f"id-{name}", "filename": name, "chunk_count": len(name)} for name in filenames]
+
+def _matches(library_name: str, db_name: str) -> bool:
+    # The pairwise rule the index replaces
+    return (
+        db_name == library_name
+        or db_name == library_name.rsplit(".", 1)[0]
+        or db_name.rsplit(".", 1)[0] == library_name
+    )
+
+def test_match_kinds():
+    index = DocumentIndex(_db("walden", "moby-dick.pdf", "ulysses.epub"))
+
+    assert index.match("walden.pdf")["filename"] == "walden"       # Database name lacks the extension
+    assert index.match("moby-dick.pdf")["filename"] == "moby-dick.pdf"  # Same name
+    assert index.match("ulysses")["filename"] == "ulysses.epub"     # Library name lacks the extension
+    assert index.match("dune.pdf") is None
+
+def test_first_match_in_database_order_wins():
+    index = DocumentIndex(_db("walden.epub", "walden", "walden.pdf"))
+
+    assert index.match("walden.pdf")["filename"] == "walden"
+    assert [doc["filename"] for doc in index.match_all("walden.pdf")] == ["walden", "walden.pdf"]
+    assert [doc["filename"] for doc in index.match_all("walden")] == ["walden.epub", "walden", "walden.pdf"]
+
+def test_agrees_with_pairwise_matching():
+    rng = random.Random(7)
+    stems = ["walden", "moby", "moby.dick", "ulysses", "a.b.c"]
+    # Database names are unique (grouped by name)
+    names = sorted({stem + suffix for stem in stems for suffix in ("", ".pdf", ".epub")})
+    for _ in range(200):
+        db_names = rng.sample(names, 6)
+        index = DocumentIndex(_db(*db_names))
+        library_name = rng.choice(names)
+        expected = [name for name in db_names if _matches(library_name, name)]
+
+        assert [doc["filename"] for doc in index.match_all(library_name)] == expected
+        assert (index.match(library_name) or {}).get("filename") == (expected[0] if expected else None)
+
+def test_merge_attaches_chunk_counts_and_appends_legacy_documents():
+    index = DocumentIndex(_db("walden", "orphan"))
+    library = [{"id": "lib-1", "original_filename": "walden.pdf", "added_at": "2024-01-01", "thumbnail_variants": {"grid": "x"}}]
+
+    merged = merge_library_and_db_documents(library, index)
+
+    assert [doc["id"] for doc in merged] == ["lib-1", "id-orphan"]
+    assert merged[0]["chunk_count"] == len("walden")
+    assert merged[0]["thumbnail_url"] == "/thumbnails/lib-1"
+    assert merge_library_and_db_documents(library, index, include_legacy=False)[-1]["id"] == "lib-1"
+    assert [doc["id"] for doc in legacy_db_documents(index, ["walden.pdf"])] == ["id-orphan"]
+
+def test_document_names_and_scope_filters():
+    assert get_document_name("/library/abc/Moby Dick.v2.pdf") == "Moby Dick"
+    assert document_scope_filters("walden") == {"document_name": "walden"}
+    assert document_scope_filters("walden", "doc-1") == {"document_name": "walden", "document_id": "doc-1"}
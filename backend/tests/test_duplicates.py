@@ -0,0 +1,80 @@
+import threading
+import uuid
+
+import pytest
+
+import library_manager
+from library_manager import LibraryManager
+
+SHA = "a" * 64
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    # Metadata extraction is not under test; skip the render process pool
+    monkeypatch.setattr(
+        library_manager, "run_in_process",
+        lambda stage, func, path, extension, thumbnails, doc_id: ({"title": path.stem}, {}, {}),
+    )
+    return LibraryManager(str(tmp_path / "library"))
+
+def _stored_upload(library: LibraryManager, filename: str = "walden.pdf") -> str:
+    doc_id = str(uuid.uuid4())
+    folder = library.documents_path / doc_id
+    folder.mkdir()
+    (folder / filename).write_bytes(b"%PDF-1.4 walden")
+    return doc_id
+
+def _find_in_thread(library: LibraryManager, doc_id: str, **kwargs):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(id=library.find_duplicate(SHA, doc_id, **kwargs)))
+    thread.start()
+    return thread, result
+
+def _wait_until_blocked(thread: threading.Thread) -> None:
+    thread.join(0.2)
+    assert thread.is_alive(), "find_duplicate should wait for the pending upload"
+
+def test_first_upload_reserves_and_later_uploads_find_it(library):
+    first = _stored_upload(library)
+    assert library.find_duplicate(SHA, first) is None
+    library.add_stored_document(first, "walden.pdf", sha256=SHA)
+
+    assert library.find_duplicate(SHA, _stored_upload(library)) == first
+    assert library._pending_hashes == {}
+
+def test_reserving_upload_finds_no_duplicate_of_itself(library):
+    first = _stored_upload(library)
+    assert library.find_duplicate(SHA, first) is None
+    assert library.find_duplicate(SHA, first) is None
+
+def test_waits_for_pending_upload_that_succeeds(library):
+    first, second = _stored_upload(library), _stored_upload(library)
+    assert library.find_duplicate(SHA, first) is None
+
+    thread, result = _find_in_thread(library, second)
+    _wait_until_blocked(thread)
+    library.add_stored_document(first, "walden.pdf", sha256=SHA)
+    thread.join(5)
+
+    assert result["id"] == first
+
+def test_takes_over_reservation_when_pending_upload_fails(library):
+    first, second = _stored_upload(library), _stored_upload(library)
+    assert library.find_duplicate(SHA, first) is None
+
+    thread, result = _find_in_thread(library, second)
+    _wait_until_blocked(thread)
+    with pytest.raises(FileNotFoundError):
+        library.add_stored_document(first, "missing.pdf", sha256=SHA)
+    thread.join(5)
+
+    assert result["id"] is None
+    assert library._pending_hashes == {SHA: second}
+    assert library.catalog.get(first) is None
+
+def test_gives_up_waiting_after_timeout(library):
+    first, second = _stored_upload(library), _stored_upload(library)
+    assert library.find_duplicate(SHA, first) is None
+
+    assert library.find_duplicate(SHA, second, timeout=0.05) is None
+    assert library._pending_hashes == {SHA: first}
@@ -0,0 +1,136 @@
+import pytest
+
+pytest.importorskip("phi")
+pytest.importorskip("ollama")
+
+from phi.document import Document
+
+import embedding_pipeline as pipeline_module
+from embedding_pipeline import EmbeddingPipeline
+
+def _documents(*contents, name="walden"):
+    return [
+        Document(id=f"{name}-{position}", name=name, content=content, meta_data={"document_name": name})
+        for position, content in enumerate(contents)
+    ]
+
+def _recording_embedder(pipeline, monkeypatch):
+    requests = []
+
+    def embed_texts(texts):
+        requests.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    monkeypatch.setattr(pipeline, "embed_texts", embed_texts)
+    return requests
+
+def test_chunks_are_embedded_in_batches(embedding_pipeline, chunk_table, monkeypatch):
+    requests = _recording_embedder(embedding_pipeline, monkeypatch)
+    progress = []
+
+    result = embedding_pipeline.run(_documents("one", "two", "three", "four", "five"), progress=progress.append)
+
+    assert sorted(len(batch) for batch in requests) == [1, 2, 2]
+    assert (result["chunks"], result["batches"], result["reused"]) == (5, 3, 0)
+    assert progress[-1] == 5 and progress == sorted(progress)
+    assert sorted(chunk_table.rows) == [f"walden-{position}" for position in range(5)]
+
+def test_input_is_consumed_lazily(embedding_pipeline, monkeypatch):
+    _recording_embedder(embedding_pipeline, monkeypatch)
+    consumed = []
+
+    def documents():
+        for document in _documents(*(f"chunk {position}" for position in range(20))):
+            consumed.append(document.id)
+            yield document
+
+    progress = []
+    embedding_pipeline.run(documents(), progress=lambda chunks: progress.append((chunks, len(consumed))))
+
+    # batch_size=2 and max_in_flight=2: at most three batches are read ahead of the first write
+    assert progress[0][1] <= 6
+
+def test_identical_chunks_in_a_batch_are_embedded_once(chunk_table, monkeypatch):
+    pipeline = EmbeddingPipeline(batch_size=4, max_in_flight=1, reuse_existing=False)
+    requests = _recording_embedder(pipeline, monkeypatch)
+
+    result = pipeline.run(_documents("same", "same", "other", "same"))
+
+    assert requests == [["same", "other"]]
+    assert result["reused"] == 2
+    assert len(chunk_table.rows) == 4
+
+def test_stored_embeddings_are_reused(chunk_table, monkeypatch):
+    pipeline = EmbeddingPipeline(batch_size=3, max_in_flight=1, reuse_existing=True)
+    requests = _recording_embedder(pipeline, monkeypatch)
+    known_hash = pipeline_module._content_hash("known")
+    monkeypatch.setattr(pipeline, "existing_embeddings", lambda hashes: {known_hash: [9.0, 9.0]} if known_hash in hashes else {})
+
+    documents = _documents("known", "new")
+    result = pipeline.run(documents)
+
+    assert requests == [["new"]]
+    assert result["reused"] == 1
+    assert documents[0].embedding == [9.0, 9.0]
+
+def test_failed_lookup_embeds_the_whole_batch(chunk_table, monkeypatch):
+    pipeline = EmbeddingPipeline(batch_size=2, max_in_flight=1, reuse_existing=True)
+    requests = _recording_embedder(pipeline, monkeypatch)
+
+    def existing_embeddings(hashes):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(pipeline, "existing_embeddings", existing_embeddings)
+
+    assert pipeline.run(_documents("a", "b"))["chunks"] == 2
+    assert requests == [["a", "b"]]
+
+class FlakyClient:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def embed(self, model, input):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("embedder unavailable")
+        return {"embeddings": [[1.0, 2.0] for _ in input]}
+
+def test_failed_requests_are_retried_with_backoff(monkeypatch):
+    delays = []
+    monkeypatch.setattr(pipeline_module.time, "sleep", delays.append)
+    pipeline = EmbeddingPipeline(max_retries=3, retry_backoff=0.5)
+    pipeline.client = FlakyClient(failures=2)
+
+    assert pipeline.embed_texts(["a", "b"]) == [[1.0, 2.0], [1.0, 2.0]]
+    assert delays == [0.5, 1.0]
+
+def test_retries_give_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(pipeline_module.time, "sleep", lambda delay: None)
+    pipeline = EmbeddingPipeline(max_retries=2, retry_backoff=0.1)
+    pipeline.client = FlakyClient(failures=5)
+
+    with pytest.raises(ConnectionError):
+        pipeline.embed_texts(["a"])
+    assert pipeline.client.calls == 3
+
+def test_short_responses_are_retried(monkeypatch):
+    monkeypatch.setattr(pipeline_module.time, "sleep", lambda delay: None)
+
+    class ShortClient:
+        def embed(self, model, input):
+            return {"embeddings": []}
+
+    pipeline = EmbeddingPipeline(max_retries=0)
+    pipeline.client = ShortClient()
+
+    with pytest.raises(ValueError):
+        pipeline.embed_texts(["a"])
+
+def test_rows_carry_scope_filters_and_clean_content(embedding_pipeline, chunk_table):
+    embedding_pipeline.run([Document(id="w-0", name="walden", content="nul\x00byte", meta_data={})])
+
+    row = chunk_table.rows["w-0"]
+    assert row["filters"] == {"document_name": "walden"}
+    assert row["content"] == "nul\ufffdbyte"
+    assert row["content_hash"] == pipeline_module._content_hash("nul\ufffdbyte")
@@ -0,0 +1,110 @@
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+def _document(doc_id, added_at="2024-01-01T00:00:00", **fields):
+    return {"id": doc_id, "added_at": added_at, "original_filename": f"{doc_id}.pdf", **fields}
+
+@pytest.mark.parametrize("header, etag, expected", [
+    (None, '"library-1"', False),
+    ("", '"library-1"', False),
+    ('"library-1"', '"library-1"', True),
+    ('"library-2"', '"library-1"', False),
+    ('W/"library-1"', '"library-1"', True),
+    ('"library-1"', 'W/"library-1"', True),
+    ('"other", W/"library-1"', '"library-1"', True),
+    ('"other" , "library-3"', '"library-1"', False),
+    ("*", '"library-1"', True),
+    ("library-1", '"library-1"', False),
+])
+def test_etag_matching(main_module, header, etag, expected):
+    assert main_module._etag_matches(header, etag) is expected
+
+def test_documents_etag_is_the_library_version(client, library):
+    library.catalog.put(_document("a"))
+
+    response = client.get("/documents")
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"library-{library.library_version()}"'
+    assert response.headers["cache-control"] == "no-cache"
+    assert [document["id"] for document in response.json()] == ["a"]
+
+def test_unchanged_documents_get_a_304(client, library):
+    library.catalog.put(_document("a"))
+    etag = client.get("/documents").headers["etag"]
+
+    response = client.get("/documents", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+def test_catalog_changes_invalidate_the_etag(client, library):
+    library.catalog.put(_document("a"))
+    etag = client.get("/documents").headers["etag"]
+
+    library.catalog.put(_document("b", "2024-02-01T00:00:00"))
+    response = client.get("/documents", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [document["id"] for document in response.json()] == ["b", "a"]
+
+    library.bump_library_version()
+    assert client.get("/documents", headers={"If-None-Match": response.headers["etag"]}).status_code == 200
+
+def test_pages_carry_the_etag_too(client, library):
+    library.catalog.put(_document("a"))
+    etag = client.get("/documents").headers["etag"]
+
+    assert client.get("/documents?limit=1", headers={"If-None-Match": etag}).status_code == 304
+
+def test_thumbnail_etag_and_304(client, library):
+    (library.thumbnails_path / "a.jpg").write_bytes(b"legacy jpeg")
+
+    response = client.get("/thumbnails/a.jpg")
+    assert response.status_code == 200
+    assert response.content == b"legacy jpeg"
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"].startswith("public, max-age=")
+
+    cached = client.get("/thumbnails/a.jpg", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+
+def test_rerendered_thumbnail_gets_a_new_etag(client, library):
+    thumbnail = library.thumbnails_path / "a.jpg"
+    thumbnail.write_bytes(b"first render")
+    etag = client.get("/thumbnails/a.jpg").headers["etag"]
+
+    thumbnail.write_bytes(b"second, larger render")
+    response = client.get("/thumbnails/a.jpg", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+def test_variant_thumbnails_fall_back_to_the_legacy_jpeg(client, library):
+    library.catalog.put(_document("a", thumbnail_variants={"grid": "a_grid.webp"}))
+    (library.thumbnails_path / "a_grid.webp").write_bytes(b"webp")
+    (library.thumbnails_path / "a.jpg").write_bytes(b"jpeg")
+
+    assert client.get("/thumbnails/a?size=grid").content == b"webp"
+    assert client.get("/thumbnails/a?size=detail").content == b"webp"
+    assert client.get("/thumbnails/missing").status_code == 404
+
+def test_changes_by_another_process_invalidate_the_etag(client, library):
+    from library_catalog import LibraryCatalog
+
+    library.catalog.put(_document("a"))
+    etag = client.get("/documents").headers["etag"]
+
+    # e.g. another uvicorn worker, or a backfill, writing the same catalog
+    other = LibraryCatalog(library.catalog.db_path)
+    try:
+        other.put(_document("b", "2024-02-01T00:00:00"))
+        other.bump_version()
+    finally:
+        other.close()
+
+    response = client.get("/documents", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [document["id"] for document in response.json()] == ["b", "a"]
+    assert client.get("/documents", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
@@ -0,0 +1,96 @@
+import pytest
+
+pytest.importorskip("phi")
+pytest.importorskip("psycopg2")
+
+from phi.document import Document
+
+import db_utils
+import ingestion
+
+class Reader:
+    def __init__(self):
+        self.pages = []
+
+    def iter_documents(self, path):
+        for page, chunks in enumerate(self.pages, start=1):
+            for number, text in enumerate(chunks, start=1):
+                yield Document(content=text, meta_data={"page": page, "chunk": number})
+
+class KnowledgeBase:
+    def __init__(self):
+        self.reader = Reader()
+        self.vector_db = type("VectorDb", (), {"create": lambda self: None})()
+
+class Library:
+    def __init__(self):
+        self.ingestions = []
+
+    def record_ingestion(self, doc_id, chunk_count):
+        self.ingestions.append((doc_id, chunk_count))
+
+@pytest.fixture
+def ingest(embedding_pipeline, chunk_table, monkeypatch):
+    knowledge_base, library = KnowledgeBase(), Library()
+    monkeypatch.setattr(ingestion, "get_knowledge_base", lambda: knowledge_base)
+    monkeypatch.setattr(ingestion, "get_embedding_pipeline", lambda: embedding_pipeline)
+    monkeypatch.setattr(ingestion, "get_library_manager", lambda: library)
+    monkeypatch.setattr(ingestion, "register_document_names", lambda names: None)
+    monkeypatch.setattr(ingestion, "invalidate_document_index", lambda: None)
+    monkeypatch.setattr(ingestion, "delete_stale_chunks", chunk_table.delete_stale)
+
+    def ingest(doc_id, pages, filename="walden.pdf"):
+        knowledge_base.reader.pages = pages
+        return ingestion.ingest_document_for_rag("unused.pdf", doc_id, filename)
+
+    ingest.library = library
+    return ingest
+
+def test_reingest_deletes_chunks_no_longer_produced(ingest, chunk_table):
+    assert ingest("doc-a", [["one", "two", "three"], ["four"]]) == 4
+    assert ingest("doc-b", [["other book"]], filename="moby.pdf") == 1
+
+    assert ingest("doc-a", [["one", "two"]]) == 2
+
+    assert sorted(chunk_table.rows) == ["doc-a_1_1", "doc-a_1_2", "doc-b_1_1"]
+    assert ingest.library.ingestions[-1] == ("doc-a", 2)
+
+def test_empty_reingest_keeps_the_stored_chunks(ingest, chunk_table):
+    ingest("doc-a", [["one", "two"]])
+
+    assert ingest("doc-a", []) == 0
+    assert sorted(chunk_table.rows) == ["doc-a_1_1", "doc-a_1_2"]
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+        self.rowcount = 3
+
+    def execute(self, sql, params):
+        self.statements.append((" ".join(sql.split()), params))
+
+def test_delete_stale_chunks_scopes_by_document_id(monkeypatch):
+    from contextlib import contextmanager
+
+    cursor = RecordingCursor()
+
+    @contextmanager
+    def get_connection():
+        class Connection:
+            def cursor(self):
+                return self
+
+            def __enter__(self):
+                return cursor
+
+            def __exit__(self, *exc):
+                return False
+
+        yield Connection()
+
+    monkeypatch.setattr(db_utils, "get_connection", get_connection)
+
+    assert db_utils.delete_stale_chunks("doc-a", {"doc-a_1_1"}) == 3
+    (sql, params), = cursor.statements
+    assert sql == "DELETE FROM ai.pdf_documents WHERE filters @> %s::jsonb AND NOT (id = ANY(%s))"
+    assert params == ('{"document_id": "doc-a"}', ["doc-a_1_1"])
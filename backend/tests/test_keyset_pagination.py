@@ -0,0 +1,157 @@
+import random
+import sqlite3
+
+import pytest
+
+from library_catalog import SORT_COLUMNS, LibraryCatalog
+
+TITLES = ["Walden", "walden", "Moby-Dick", "Emma", "Persuasion", None]
+AUTHORS = ["Thoreau", "Melville", "Austen", "austen", None]
+EXTENSIONS = [".pdf", ".epub", ".mobi"]
+
+def _library(count=40, seed=7):
+    rng = random.Random(seed)
+    documents = []
+    for position in range(count):
+        document = {
+            "id": f"doc-{position:03d}",
+            # Few distinct values, so pages split runs of equal sort keys
+            "added_at": f"2024-01-{rng.randint(1, 5):02d}T00:00:00",
+            "original_filename": f"book-{position}{rng.choice(EXTENSIONS)}",
+            "file_size": rng.choice([100, 200, 300]),
+            "author": rng.choice(AUTHORS),
+            "title": rng.choice(TITLES),
+        }
+        document["file_extension"] = "." + document["original_filename"].rsplit(".", 1)[1]
+        documents.append(document)
+    return documents
+
+def _sort_value(document, sort):
+    if sort == "title":
+        return (document.get("title") or document["original_filename"]).casefold()
+    if sort == "author":
+        return (document.get("author") or "").casefold()
+    if sort == "size":
+        return document["file_size"]
+    return document["added_at"]
+
+def _pages(catalog, limit, **filters):
+    ids, after = [], None
+    while True:
+        page, after = catalog.query(limit=limit, after=after, **filters)
+        assert len(page) <= limit
+        ids.extend(document["id"] for document in page)
+        if after is None:
+            return ids
+
+@pytest.fixture
+def documents():
+    return _library()
+
+@pytest.fixture
+def catalog(tmp_path, documents):
+    catalog = LibraryCatalog(tmp_path / "catalog.db")
+    catalog.put_many(documents)
+    yield catalog
+    catalog.close()
+
+@pytest.mark.parametrize("sort", sorted(SORT_COLUMNS))
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("limit", [1, 3, 7, 40, 100])
+def test_pages_concatenate_to_the_full_ordering(catalog, documents, sort, descending, limit):
+    expected = [
+        document["id"]
+        for document in sorted(documents, key=lambda d: (_sort_value(d, sort), d["id"]), reverse=descending)
+    ]
+    full, next_key = catalog.query(sort=sort, descending=descending)
+
+    assert next_key is None
+    assert [document["id"] for document in full] == expected
+    assert _pages(catalog, limit, sort=sort, descending=descending) == expected
+
+def test_last_page_has_no_next_key(catalog, documents):
+    page, next_key = catalog.query(limit=len(documents))
+    assert len(page) == len(documents) and next_key is None
+
+    page, next_key = catalog.query(limit=len(documents) - 1)
+    assert next_key == (page[-1]["added_at"], page[-1]["id"])
+
+@pytest.mark.parametrize("filters, matches", [
+    ({"author": "AUSTEN"}, lambda d: (d["author"] or "").casefold() == "austen"),
+    ({"extension": "EPUB"}, lambda d: d["file_extension"] == ".epub"),
+    ({"extension": ".pdf"}, lambda d: d["file_extension"] == ".pdf"),
+    ({"ingested": True}, lambda d: int(d["id"][-3:]) % 3 == 0),
+    ({"ingested": False}, lambda d: int(d["id"][-3:]) % 3 != 0),
+    ({"author": "melville", "extension": "mobi"}, lambda d: d["author"] == "Melville" and d["file_extension"] == ".mobi"),
+])
+def test_filters_apply_to_every_page(catalog, documents, filters, matches):
+    catalog.set_chunk_counts({d["id"]: 5 for d in documents if int(d["id"][-3:]) % 3 == 0})
+    expected = [
+        document["id"]
+        for document in sorted(documents, key=lambda d: (d["added_at"], d["id"]), reverse=True)
+        if matches(document)
+    ]
+
+    assert expected
+    assert _pages(catalog, 4, **filters) == expected
+
+def test_chunk_counts_bump_the_version_only_when_changed(catalog):
+    version = catalog.version
+
+    assert catalog.set_chunk_counts({"doc-000": 3, "doc-001": 0}) == 1
+    assert catalog.version == version + 1
+    assert catalog.set_chunk_counts({"doc-000": 3}) == 0
+    assert catalog.version == version + 1
+
+def test_listing_columns_are_added_to_an_old_catalog(tmp_path):
+    path = tmp_path / "catalog.db"
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE documents (id TEXT PRIMARY KEY, added_at TEXT NOT NULL, original_filename TEXT NOT NULL, metadata TEXT NOT NULL)")
+    conn.execute(
+        "INSERT INTO documents VALUES (?, ?, ?, ?)",
+        ("a", "2024-01-01", "walden.epub", '{"id": "a", "added_at": "2024-01-01", "original_filename": "walden.epub", '
+                                           '"title": "Walden", "author": "Thoreau", "file_extension": ".epub", "file_size": 42}'),
+    )
+    conn.commit()
+    conn.close()
+
+    catalog = LibraryCatalog(path)
+    try:
+        assert [d["id"] for d in catalog.query(sort="title", author="thoreau", extension="epub")[0]] == ["a"]
+        assert catalog.query(sort="size", after=(42, "a"))[0] == []
+    finally:
+        catalog.close()
+
+def _follow(client, **params):
+    ids, cursor = [], None
+    while True:
+        response = client.get("/documents", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        ids.extend(document["id"] for document in body["documents"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+
+def test_endpoint_cursors_walk_the_whole_listing(client, library, documents):
+    library.catalog.put_many(documents)
+    everything = [document["id"] for document in client.get("/documents", params={"sort": "title"}).json()]
+
+    assert len(everything) == len(documents)
+    assert _follow(client, sort="title", limit=6) == everything
+    assert _follow(client, sort="size", order="desc", limit=5, extension="pdf") == [
+        document["id"] for document in client.get("/documents", params={"sort": "size", "order": "desc", "extension": "pdf"}).json()
+    ]
+
+def test_invalid_cursors_are_rejected(client, library, documents):
+    library.catalog.put_many(documents)
+    cursor = client.get("/documents", params={"sort": "title", "limit": 2}).json()["next_cursor"]
+
+    assert client.get("/documents", params={"cursor": "not a cursor!"}).status_code == 400
+    assert client.get("/documents", params={"cursor": cursor, "sort": "author"}).status_code == 400
+    assert client.get("/documents", params={"cursor": cursor, "sort": "title", "order": "desc"}).status_code == 400
+    assert client.get("/documents", params={"cursor": cursor, "sort": "title"}).status_code == 200
+
+def test_unknown_sort_and_order_are_rejected(client, library):
+    assert client.get("/documents", params={"sort": "colour"}).status_code == 400
+    assert client.get("/documents", params={"order": "sideways"}).status_code == 400
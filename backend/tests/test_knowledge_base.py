@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+pytest.importorskip("phi")
+pytest.importorskip("psycopg2")
+
+import agent
+
+class LoadingKnowledgeBase:
+    """Records whether the global knowledge base was visible while it was still loading."""
+
+    def __init__(self):
+        self.published_during_load = []
+
+    def load(self, recreate=False):
+        self.published_during_load.append(agent.knowledge_base is not None)
+
+@pytest.fixture
+def loading(monkeypatch):
+    kb = LoadingKnowledgeBase()
+    steps = []
+    monkeypatch.setattr(agent, "knowledge_base", None)
+    monkeypatch.setattr(agent, "get_pdf_files", lambda: ["data/pdf_files/walden.pdf"])
+    monkeypatch.setattr(agent, "check_if_documents_exist", lambda: False)
+    monkeypatch.setattr(agent, "create_knowledge_base", lambda: kb)
+    monkeypatch.setattr(agent, "invalidate_document_index", lambda: None)
+    monkeypatch.setattr(agent, "backfill_document_uuids", lambda: None)
+    monkeypatch.setattr(
+        agent, "ensure_document_scope_filters",
+        lambda: steps.append(("scopes", agent.knowledge_base is not None)),
+    )
+    monkeypatch.setattr(agent, "bump_retrieval_version", lambda *args: None)
+    monkeypatch.setattr(agent, "get_library_manager", lambda: type("Library", (), {"bump_library_version": lambda self: 0})())
+    return kb, steps
+
+def test_knowledge_base_is_published_after_loading(loading):
+    kb, steps = loading
+
+    assert agent.get_knowledge_base() is kb
+    assert kb.published_during_load == [False]
+    assert steps == [("scopes", False)]
+    assert agent.knowledge_base is kb
+
+def test_concurrent_callers_wait_for_the_loaded_knowledge_base(loading, monkeypatch):
+    kb, _ = loading
+    loading_started, finish = threading.Event(), threading.Event()
+    load = kb.load
+
+    def slow_load(recreate=False):
+        loading_started.set()
+        finish.wait(5)
+        load(recreate)
+
+    monkeypatch.setattr(kb, "load", slow_load)
+    results = []
+    first = threading.Thread(target=lambda: results.append(agent.get_knowledge_base()))
+    first.start()
+    loading_started.wait(5)
+
+    assert agent.knowledge_base is None
+    second = threading.Thread(target=lambda: results.append(agent.get_knowledge_base()))
+    second.start()
+    finish.set()
+    first.join(5)
+    second.join(5)
+
+    assert results == [kb, kb]
+    assert kb.published_during_load == [False]
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from library_catalog import LibraryCatalog
+
+def _doc(doc_id: str, added_at: str, **fields) -> dict:
+    return {"id": doc_id, "added_at": added_at, "original_filename": f"{doc_id}.pdf", **fields}
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = LibraryCatalog(tmp_path / "catalog.db")
+    yield catalog
+    catalog.close()
+
+def test_put_get_and_delete(catalog):
+    catalog.put(_doc("a", "2024-01-01", title="Walden"))
+
+    assert catalog.get("a")["title"] == "Walden"
+    assert catalog.count() == 1
+    assert catalog.delete("a")
+    assert not catalog.delete("a")
+    assert catalog.get("a") is None
+
+def test_put_replaces_existing_metadata(catalog):
+    catalog.put(_doc("a", "2024-01-01", title="Draft"))
+    catalog.put(_doc("a", "2024-01-01", title="Walden"))
+
+    assert catalog.count() == 1
+    assert catalog.get("a")["title"] == "Walden"
+
+def test_query_is_newest_first_and_paged_by_key(catalog):
+    catalog.put_many(_doc(doc_id, f"2024-01-0{day}") for day, doc_id in enumerate("abcde", start=1))
+
+    assert [doc["id"] for doc in catalog.query()[0]] == list("edcba")
+    page, next_key = catalog.query(limit=2, after=("2024-01-05", "e"))
+    assert [doc["id"] for doc in page] == ["d", "c"]
+    assert next_key == ("2024-01-03", "c")
+
+def test_get_many_skips_unknown_ids(catalog):
+    catalog.put_many([_doc("a", "2024-01-01"), _doc("b", "2024-01-02")])
+
+    assert set(catalog.get_many(["a", "b", "missing"])) == {"a", "b"}
+    assert catalog.get_many([]) == {}
+
+def test_find_by_sha256_returns_the_earliest_document(catalog):
+    catalog.put_many([_doc("late", "2024-02-01", sha256="x"), _doc("early", "2024-01-01", sha256="x")])
+
+    assert catalog.find_by_sha256("x")["id"] == "early"
+    assert catalog.find_by_sha256("y") is None
+
+def test_json_metadata_is_migrated_once(tmp_path):
+    metadata_dir = tmp_path / "metadata"
+    metadata_dir.mkdir()
+    for doc_id in ("a", "b"):
+        (metadata_dir / f"{doc_id}.json").write_text(json.dumps(_doc(doc_id, "2024-01-01")))
+    (metadata_dir / "broken.json").write_text("{")
+
+    catalog = LibraryCatalog(tmp_path / "catalog.db")
+    assert catalog.migrate_from_json(metadata_dir) == 2
+    (metadata_dir / "c.json").write_text(json.dumps(_doc("c", "2024-01-01")))
+    assert catalog.migrate_from_json(metadata_dir) == 0
+    assert catalog.count() == 2
+    catalog.close()
+
+def test_catalog_persists_across_reopen(tmp_path):
+    catalog = LibraryCatalog(tmp_path / "catalog.db")
+    catalog.put(_doc("a", "2024-01-01", title="Walden"))
+    catalog.close()
+
+    reopened = LibraryCatalog(tmp_path / "catalog.db")
+    assert reopened.get("a")["title"] == "Walden"
+    reopened.close()
+
+def test_version_is_shared_by_every_connection(tmp_path):
+    first = LibraryCatalog(tmp_path / "catalog.db")
+    second = LibraryCatalog(tmp_path / "catalog.db")
+    try:
+        first.put(_doc("a", "2024-01-01"))
+        assert second.version == first.version == 1
+        assert second.bump_version() == 2
+        first.put(_doc("b", "2024-01-02"))
+        assert first.version == second.version == 3
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,85 @@
+import pytest
+
+import retrieval_cache
+from retrieval_cache import LRUCache, bump_retrieval_version, retrieval_key
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 3, "misses": 1, "evictions": 1}
+
+def test_retrieval_key_normalizes_the_query():
+    params = {"search_type": "hybrid"}
+    assert retrieval_key("walden", "  The Pond ", 5, {}, params) == retrieval_key("walden", "the pond", 5, None, params)
+    assert retrieval_key("walden", "the pond", 5, {}, params) != retrieval_key("walden", "the pond", 10, {}, params)
+
+def test_document_bump_only_invalidates_that_document():
+    params = {}
+    walden, moby = retrieval_key("walden", "q", 5, {}, params), retrieval_key("moby-dick", "q", 5, {}, params)
+    bump_retrieval_version("walden")
+
+    assert retrieval_key("walden", "q", 5, {}, params) != walden
+    assert retrieval_key("moby-dick", "q", 5, {}, params) == moby
+
+def test_global_bump_invalidates_every_document():
+    keys = [retrieval_key(name, "q", 5, {}, {}) for name in ("walden", "moby-dick", None)]
+    bump_retrieval_version()
+
+    assert all(retrieval_key(name, "q", 5, {}, {}) != key for name, key in zip(("walden", "moby-dick", None), keys))
+
+class TestScopedSearchCache:
+    @pytest.fixture(autouse=True)
+    def _setup(self, ingested, monkeypatch):
+        pytest.importorskip("phi")
+        import agent
+        from tests.fakes import scoped_knowledge_base
+
+        self.table = ingested
+        self.fetched = []
+        self.searches = 0
+
+        def fetch_chunks_by_ids(chunk_ids):
+            self.fetched.append(list(chunk_ids))
+            return ingested.fetch(chunk_ids)
+
+        original_search = ingested.search
+
+        def counting_search(*args, **kwargs):
+            self.searches += 1
+            return original_search(*args, **kwargs)
+
+        monkeypatch.setattr(agent, "fetch_chunks_by_ids", fetch_chunks_by_ids)
+        monkeypatch.setattr(ingested, "search", counting_search)
+        self.knowledge_base = scoped_knowledge_base(ingested, "moby-dick")
+
+    def test_repeated_query_resolves_cached_ids(self):
+        cold = self.knowledge_base.search("whale")
+        hits = retrieval_cache.retrieval_cache.stats()["hits"]
+        warm = self.knowledge_base.search("  WHALE ")
+
+        assert cold and self.searches == 1
+        assert retrieval_cache.retrieval_cache.stats()["hits"] == hits + 1
+        assert self.fetched == [[document.id for document in cold]]
+        assert [(d.id, d.name, d.content) for d in warm] == [(d.id, d.name, d.content) for d in cold]
+
+    def test_bumped_document_is_searched_again(self):
+        self.knowledge_base.search("whale")
+        bump_retrieval_version("moby-dick")
+        self.knowledge_base.search("whale")
+
+        assert self.searches == 2
+        assert self.fetched == []
+
+    def test_missing_cached_chunks_fall_back_to_search(self):
+        cold = self.knowledge_base.search("whale")
+        del self.table.rows[cold[0].id]
+        warm = self.knowledge_base.search("whale")
+
+        assert self.searches == 2
+        assert cold[0].id not in {document.id for document in warm}
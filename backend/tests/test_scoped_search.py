@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("phi")
+pytest.importorskip("psycopg2")
+
+from tests.fakes import BOOKS, book_chunks, scoped_knowledge_base
+
+def test_ingested_chunks_carry_their_document_in_filters(ingested):
+    assert len(ingested.rows) == 6
+    for row in ingested.rows.values():
+        assert row["filters"] == {"document_name": row["name"], "document_id": row["meta_data"]["document_id"]}
+
+@pytest.mark.parametrize("position, document_name", list(enumerate(BOOKS)))
+def test_scoped_search_only_returns_the_requested_document(ingested, position, document_name):
+    documents = scoped_knowledge_base(ingested, document_name, f"doc-{position}").search("whale")
+
+    assert documents
+    assert {document.name for document in documents} == {document_name}
+    assert len(documents) == len(BOOKS[document_name])
+
+def test_legacy_name_scope_still_matches(ingested):
+    documents = scoped_knowledge_base(ingested, "walden").search("whale")
+
+    assert {document.name for document in documents} == {"walden"}
+
+def test_documents_sharing_a_name_are_scoped_apart(embedding_pipeline, chunk_table):
+    from document_index import get_document_name
+    from ingestion import _key_documents
+
+    # "Vol. 1.pdf" and "Vol. 2.pdf" (or two uploads of one file) share the stored name "Vol"
+    for doc_id, book, filename in (("doc-a", "moby-dick", "Vol. 1.pdf"), ("doc-b", "walden", "Vol. 2.pdf")):
+        embedding_pipeline.run(_key_documents(book_chunks(book), doc_id, get_document_name(filename)))
+
+    documents = scoped_knowledge_base(chunk_table, "Vol", "doc-b").search("whale")
+
+    assert documents
+    assert {document.meta_data["document_id"] for document in documents} == {"doc-b"}
+
+def test_unscoped_search_returns_every_document(ingested):
+    documents = scoped_knowledge_base(ingested, None).search("whale")
+
+    assert {document.name for document in documents} == set(BOOKS)
+
+def test_library_chats_are_keyed_by_document_id(main_module, library):
+    for doc_id in ("doc-a", "doc-b"):
+        library.catalog.put({"id": doc_id, "original_filename": "Dune.pdf", "added_at": "2024-01-01T00:00:00"})
+
+    assert main_module._resolve_agent_key("doc-a") == "doc-a"
+    assert main_module._resolve_agent_key("doc-b") == "doc-b"
+    # Filenames are still accepted as legacy conversation keys
+    assert main_module._resolve_agent_key("Dune.pdf") == "Dune.pdf"
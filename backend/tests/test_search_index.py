@@ -0,0 +1,194 @@
+import random
+import string
+
+import pytest
+
+from search_index import LibrarySearchIndex, _within_one_edit, tokenize
+
+BOOKS = [
+    {"id": "walden", "title": "Walden", "author": "Henry David Thoreau", "subject": ["Nature", "Solitude"]},
+    {"id": "disobedience", "title": "Civil Disobedience", "author": "Henry David Thoreau"},
+    {"id": "moby", "title": "Moby-Dick", "author": "Herman Melville", "description": "A whale of a tale about Walden Pond's opposite."},
+    {"id": "emma", "title": "Emma", "author": "Jane Austen", "original_filename": "emma.epub"},
+    {"id": "miserables", "title": "Les Misérables", "author": "Victor Hugo", "publisher": "Éditions Lacroix"},
+]
+
+@pytest.fixture
+def index():
+    index = LibrarySearchIndex()
+    index.ensure_built(lambda: [dict(book) for book in BOOKS])
+    return index
+
+def _ids(index, query, limit=20):
+    return [doc_id for doc_id, _ in index.search(query, limit)[0]]
+
+def test_tokenize_folds_case_and_accents_and_drops_stopwords():
+    assert tokenize("Les Misérables of the ÉCOLE") == ["miserables", "ecole"]
+    assert tokenize("moby_dick 2nd-edition") == ["moby", "dick", "2nd", "edition"]
+    assert tokenize("the and of") == []
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("walden", "walden", True),
+    ("walden", "waldan", True),   # substitution
+    ("walden", "walen", True),    # deletion
+    ("walden", "waldenn", True),  # insertion
+    ("walden", "wladen", True),   # adjacent transposition
+    ("walden", "wlaedn", False),
+    ("walden", "wal", False),
+    ("walden", "waldens2", False),
+    ("ab", "ba", True),
+    ("", "a", True),
+])
+def test_within_one_edit(a, b, expected):
+    assert _within_one_edit(a, b) is expected
+    assert _within_one_edit(b, a) is expected
+
+def _edit_distance(a, b):
+    # Optimal string alignment distance, the reference for _within_one_edit
+    d = [[max(i, j) if not i * j else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[-1][-1]
+
+def test_within_one_edit_matches_the_edit_distance():
+    rng = random.Random(3)
+    for _ in range(2000):
+        a = "".join(rng.choice("abc") for _ in range(rng.randint(0, 5)))
+        b = "".join(rng.choice("abc") for _ in range(rng.randint(0, 5)))
+        assert _within_one_edit(a, b) is (_edit_distance(a, b) <= 1), (a, b)
+
+def test_title_matches_outrank_description_matches(index):
+    hits, total = index.search("walden")
+
+    assert [doc_id for doc_id, _ in hits] == ["walden", "moby"]
+    assert total == 2
+    assert hits[0][1] > hits[1][1] > 0
+
+def test_rarer_words_score_higher(index):
+    # "henry" is in two documents, "melville" in one; both are author matches
+    henry = dict(index.search("henry")[0])
+    melville = dict(index.search("melville")[0])
+
+    assert melville["moby"] > henry["walden"]
+
+def test_last_word_matches_as_a_prefix(index):
+    assert _ids(index, "wal") == ["walden", "moby"]
+    assert _ids(index, "thoreau wal") == ["walden"]
+    # Only the last word is a prefix: "wal" alone matches nothing and is ignored
+    assert set(_ids(index, "wal thoreau")) == {"walden", "disobedience"}
+
+def test_equal_scores_are_ordered_by_doc_id():
+    index = LibrarySearchIndex()
+    for doc_id in ("c", "a", "d", "b"):
+        index.add({"id": doc_id, "title": "Walden"})
+
+    hits, total = index.search("walden", limit=3)
+    assert [doc_id for doc_id, _ in hits] == ["a", "b", "c"]
+    assert len({score for _, score in hits}) == 1
+    assert total == 4
+
+def test_exact_matches_outrank_prefix_matches():
+    index = LibrarySearchIndex()
+    index.add({"id": "short", "title": "Emma"})
+    index.add({"id": "long", "title": "Emmanuel"})
+
+    assert _ids(index, "emma") == ["short", "long"]
+
+def test_longer_words_tolerate_one_typo(index):
+    assert set(_ids(index, "thoraeu")) == {"walden", "disobedience"}
+    assert _ids(index, "melvile") == ["moby"]
+    assert _ids(index, "misreables") == ["miserables"]
+    assert _ids(index, "xmelvillex") == []
+
+def test_short_words_need_an_exact_or_prefix_match(index):
+    # "emmx" is four letters and one edit from "emma"; "emx" is too short to be fuzzy
+    assert _ids(index, "emmx") == ["emma"]
+    assert set(_ids(index, "emx thoreau")) == {"walden", "disobedience"}
+    assert _ids(index, "emx") == []
+
+def test_every_word_must_match_when_some_document_matches_all(index):
+    assert _ids(index, "henry civil") == ["disobedience"]
+
+def test_falls_back_to_documents_matching_some_words(index):
+    assert set(_ids(index, "austen melville")) == {"emma", "moby"}
+    # Words matching nothing are ignored
+    assert _ids(index, "melville zzzzzz") == ["moby"]
+
+def test_accents_are_ignored_in_queries_and_documents(index):
+    assert _ids(index, "MISÉRABLES") == ["miserables"]
+    assert _ids(index, "editions") == ["miserables"]
+
+def test_list_fields_are_indexed(index):
+    assert _ids(index, "solitude") == ["walden"]
+
+def test_limit_and_total(index):
+    hits, total = index.search("henry", limit=1)
+
+    assert len(hits) == 1 and total == 2
+
+def test_empty_queries_and_indexes():
+    assert LibrarySearchIndex().search("walden") == ([], 0)
+    index = LibrarySearchIndex()
+    index.add(dict(BOOKS[0]))
+    assert index.search("the of") == ([], 0)
+
+def test_remove_and_readd(index):
+    assert index.remove("moby")
+    assert not index.remove("moby")
+    assert _ids(index, "melville") == []
+    assert _ids(index, "walden") == ["walden"]
+    assert index.stats()["documents"] == len(BOOKS) - 1
+
+    index.add({"id": "moby", "title": "Moby-Dick; or, The Whale", "author": "Herman Melville"})
+    assert _ids(index, "whale") == ["moby"]
+    assert _ids(index, "walden") == ["walden"]
+
+def test_reindexing_replaces_old_terms(index):
+    index.add({"id": "emma", "title": "Pride and Prejudice", "author": "Jane Austen"})
+
+    assert _ids(index, "emma") == []
+    assert _ids(index, "prejudice") == ["emma"]
+    assert len(index) == len(BOOKS)
+
+def test_removing_the_last_posting_drops_the_term(index):
+    terms = index.stats()["terms"]
+    index.remove("emma")
+
+    assert _ids(index, "austen") == []
+    assert _ids(index, "austin") == []
+    assert index.stats()["terms"] < terms
+
+def test_ensure_built_loads_once():
+    loads = []
+    index = LibrarySearchIndex()
+
+    def load():
+        loads.append(1)
+        return [dict(book) for book in BOOKS]
+
+    index.ensure_built(load)
+    index.ensure_built(load)
+    assert loads == [1]
+    assert index.stats()["built"] and index.stats()["documents"] == len(BOOKS)
+
+def test_random_vocabularies_stay_consistent():
+    rng = random.Random(11)
+    index = LibrarySearchIndex()
+    titles = {}
+    for step in range(300):
+        doc_id = f"doc-{rng.randint(0, 30)}"
+        if rng.random() < 0.3:
+            index.remove(doc_id)
+            titles.pop(doc_id, None)
+        else:
+            title = " ".join("".join(rng.choice(string.ascii_lowercase[:6]) for _ in range(rng.randint(2, 6))) for _ in range(3))
+            index.add({"id": doc_id, "title": title})
+            titles[doc_id] = title
+
+    assert index._vocabulary == sorted(index._postings)
+    for doc_id, title in titles.items():
+        for word in tokenize(title):
+            assert doc_id in dict(index.search(word, limit=100)[0])
@@ -0,0 +1,31 @@
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+import stage_pools
+from document_extraction import extract_pdf_page_range
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "book.pdf"
+    with fitz.open() as pdf:
+        for number in range(1, 4):
+            page = pdf.new_page()
+            if number != 2:
+                page.insert_text((72, 72), f"Page {number} text")
+        pdf.save(path)
+    return str(path)
+
+@pytest.fixture
+def extract_pool():
+    yield stage_pools.get_pool("extract")
+    stage_pools.shutdown_pools()
+
+def test_process_stages_do_not_fork_the_server(extract_pool):
+    assert extract_pool._mp_context.get_start_method() in ("forkserver", "spawn")
+
+def test_page_ranges_extract_in_worker_processes(extract_pool, pdf_path):
+    pages = extract_pool.submit(extract_pdf_page_range, pdf_path, 0, 3).result(timeout=60)
+
+    assert [number for number, _ in pages] == [1, 3]
+    assert pages[0][1].strip() == "Page 1 text"
@@ -0,0 +1,60 @@
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+import document_extraction
+import thumbnails
+
+SIZES = {"grid": (300, 400), "retina": (600, 800)}
+
+@pytest.fixture(autouse=True)
+def _sizes(monkeypatch):
+    monkeypatch.setattr(thumbnails, "THUMBNAIL_SIZES", dict(SIZES))
+    monkeypatch.setattr(document_extraction, "THUMBNAIL_SIZES", dict(SIZES))
+    monkeypatch.setattr(thumbnails, "LEGACY_VARIANT", "grid")
+
+def _aspect(path) -> float:
+    with Image.open(path) as img:
+        return img.width / img.height
+
+def test_legacy_variant_falls_back_to_the_largest():
+    assert thumbnails.legacy_variant(SIZES) == "grid"
+    assert thumbnails.legacy_variant({"small": (100, 100), "large": (400, 600)}) == "large"
+    assert thumbnails.legacy_variant({}) is None
+
+def test_cover_variants_keep_the_aspect_ratio(tmp_path):
+    saved = thumbnails.save_image_thumbnails(Image.new("RGB", (1000, 500), "white"), tmp_path, "doc")
+
+    assert set(saved) == set(SIZES)
+    for filename in saved.values():
+        assert _aspect(tmp_path / filename) == pytest.approx(2.0, rel=0.02)
+    assert thumbnails.legacy_thumbnail_path(tmp_path, "doc").exists()
+
+def test_legacy_jpeg_is_written_without_a_grid_variant(tmp_path, monkeypatch):
+    sizes = {"small": (100, 150), "large": (400, 600)}
+    monkeypatch.setattr(thumbnails, "THUMBNAIL_SIZES", sizes)
+    monkeypatch.setattr(thumbnails, "LEGACY_VARIANT", thumbnails.legacy_variant(sizes))
+
+    thumbnails.save_image_thumbnails(Image.new("RGB", (800, 1200), "white"), tmp_path, "doc")
+
+    with Image.open(thumbnails.legacy_thumbnail_path(tmp_path, "doc")) as img:
+        assert img.size == (400, 600)
+
+def test_pdf2image_fallback_only_fixes_the_height(tmp_path, monkeypatch):
+    pdf2image = pytest.importorskip("pdf2image")
+    requested = {}
+
+    def convert_from_path(path, first_page, last_page, size, fmt):
+        requested["size"] = size
+        width, height = 1200, 600  # A landscape page, scaled the way pdftoppm scales it
+        if size[0] is None:
+            width = round(width * size[1] / height)
+            height = size[1]
+        return [Image.new("RGB", (width, height), "white")]
+
+    monkeypatch.setattr(pdf2image, "convert_from_path", convert_from_path)
+    saved = document_extraction._render_pdf_fallback(tmp_path / "book.pdf", tmp_path, "doc")
+
+    assert requested["size"] == (None, 800)
+    for filename in saved.values():
+        assert _aspect(tmp_path / filename) == pytest.approx(2.0, rel=0.02)
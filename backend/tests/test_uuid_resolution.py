@@ -0,0 +1,95 @@
+import uuid
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip("psycopg2")
+from psycopg2.errors import UndefinedTable
+
+import db_utils
+import library_manager
+from library_manager import LibraryManager
+
+class MappingTable:
+    """Answers ai.document_uuids lookups, counting queries."""
+
+    def __init__(self, names=(), missing=False):
+        self.names = {str(uuid.uuid5(uuid.NAMESPACE_URL, name)): name for name in names}
+        self.missing = missing
+        self.queries = 0
+        self._row = None
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.queries += 1
+        if self.missing:
+            raise UndefinedTable('relation "ai.document_uuids" does not exist')
+        name = self.names.get(params[0])
+        self._row = (name,) if name else None
+
+    def fetchone(self):
+        return self._row
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    manager = LibraryManager(str(tmp_path / "library"))
+    monkeypatch.setattr(library_manager, "_library_manager", manager)
+    db_utils._legacy_name_from_uuid.cache_clear()
+    yield manager
+    db_utils._legacy_name_from_uuid.cache_clear()
+
+def _use_mapping(monkeypatch, table: MappingTable) -> MappingTable:
+    monkeypatch.setattr(db_utils, "get_connection", table.connection)
+    return table
+
+def test_removed_library_document_stops_resolving(library, monkeypatch):
+    _use_mapping(monkeypatch, MappingTable())
+    doc_id = str(uuid.uuid4())
+    library.catalog.put({"id": doc_id, "original_filename": "walden.pdf", "added_at": "2024-01-01T00:00:00"})
+
+    assert db_utils.get_filename_from_uuid(doc_id) == "walden.pdf"
+    assert library.remove_document(doc_id)
+    with pytest.raises(ValueError):
+        db_utils.get_filename_from_uuid(doc_id)
+
+def test_legacy_mapping_hits_are_cached(library, monkeypatch):
+    table = _use_mapping(monkeypatch, MappingTable(names=["moby-dick"]))
+    legacy_id = str(uuid.uuid5(uuid.NAMESPACE_URL, "moby-dick"))
+
+    assert db_utils.get_filename_from_uuid(legacy_id) == "moby-dick"
+    assert db_utils.get_filename_from_uuid(legacy_id) == "moby-dick"
+    assert table.queries == 1
+
+def test_legacy_mapping_misses_are_not_cached(library, monkeypatch):
+    table = _use_mapping(monkeypatch, MappingTable())
+    legacy_id = str(uuid.uuid5(uuid.NAMESPACE_URL, "walden"))
+    with pytest.raises(ValueError):
+        db_utils.get_filename_from_uuid(legacy_id)
+
+    table.names[legacy_id] = "walden"
+    assert db_utils.get_filename_from_uuid(legacy_id) == "walden"
+
+def test_missing_mapping_table_is_not_found(library, monkeypatch):
+    _use_mapping(monkeypatch, MappingTable(missing=True))
+
+    with pytest.raises(ValueError):
+        db_utils.get_filename_from_uuid(str(uuid.uuid4()))
+
+def test_malformed_id_is_not_found(library, monkeypatch):
+    table = _use_mapping(monkeypatch, MappingTable())
+
+    with pytest.raises(ValueError):
+        db_utils.get_filename_from_uuid("not-a-uuid-but-36-characters-long!!")
+    assert table.queries == 0
@@ -0,0 +1,38 @@
+import pytest
+
+import warmup
+from config import config
+
+@pytest.fixture(autouse=True)
+def _fresh_state(monkeypatch):
+    monkeypatch.setattr(config, "WARMUP_ON_STARTUP", False)
+    monkeypatch.setattr(warmup, "_state", {"status": "pending", "steps": {}})
+
+def _fail():
+    raise RuntimeError("database unavailable")
+
+def test_not_ready_before_warm_up():
+    assert not warmup.is_ready()
+
+def test_ready_once_required_steps_succeed():
+    calls = []
+    state = warmup.warm_up({"document_scopes": lambda: calls.append("scopes")}, {"agents": lambda: calls.append("agents")})
+
+    assert warmup.is_ready()
+    assert calls == ["scopes", "agents"]
+    assert state["steps"]["document_scopes"]["ok"]
+
+def test_failed_required_step_keeps_worker_unready_but_runs_the_rest():
+    calls = []
+    state = warmup.warm_up({"document_scopes": _fail, "uuid_mapping": lambda: calls.append("uuids")})
+
+    assert not warmup.is_ready()
+    assert state["status"] == "failed"
+    assert calls == ["uuids"]
+    assert state["steps"]["document_scopes"] == {"ok": False, "seconds": state["steps"]["document_scopes"]["seconds"], "error": "database unavailable"}
+
+def test_failed_extra_step_does_not_block_readiness():
+    state = warmup.warm_up({}, {"agents": _fail})
+
+    assert warmup.is_ready()
+    assert not state["steps"]["agents"]["ok"]
@@ -0,0 +1,140 @@
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import logging
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Output formats: PIL format name, file extension, media type
+FORMATS = {
+    "jpeg": ("JPEG", ".jpg", "image/jpeg"),
+    "webp": ("WEBP", ".webp", "image/webp"),
+}
+
+DEFAULT_VARIANT = "grid"
+
+def parse_sizes(spec: str) -> Dict[str, Tuple[int, int]]:
+    """Parse "name:WIDTHxHEIGHT,..." into an ordered mapping of variant sizes."""
+    sizes = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        name, dimensions = entry.strip().split(":")
+        width, height = dimensions.lower().split("x")
+        sizes[name.strip()] = (int(width), int(height))
+    return sizes
+
+THUMBNAIL_SIZES = parse_sizes(config.THUMBNAIL_SIZES)
+THUMBNAIL_FORMAT = config.THUMBNAIL_FORMAT if config.THUMBNAIL_FORMAT in FORMATS else "jpeg"
+
+def legacy_variant(sizes: Dict[str, Tuple[int, int]]) -> Optional[str]:
+    """The variant also saved as the legacy JPEG: grid, or the largest one when grid isn't configured."""
+    if not sizes:
+        return None
+    if DEFAULT_VARIANT in sizes:
+        return DEFAULT_VARIANT
+    return max(sizes, key=lambda variant: sizes[variant][0] * sizes[variant][1])
+
+LEGACY_VARIANT = legacy_variant(THUMBNAIL_SIZES)
+
+def legacy_thumbnail_path(output_dir: Path, doc_id: str) -> Path:
+    """The grid-size (LEGACY_VARIANT) JPEG every document gets, served at /thumbnails/{id}.jpg."""
+    return output_dir / f"{doc_id}.jpg"
+
+def variant_path(output_dir: Path, doc_id: str, variant: str, fmt: str = THUMBNAIL_FORMAT) -> Path:
+    return output_dir / f"{doc_id}_{variant}{FORMATS[fmt][1]}"
+
+def media_type(path: Path) -> str:
+    for _, extension, mime in FORMATS.values():
+        if path.suffix == extension:
+            return mime
+    return "application/octet-stream"
+
+@lru_cache(maxsize=4096)
+def _content_etag(path: str, mtime_ns: int, size: int) -> str:
+    # Keyed by mtime and size too, so a re-rendered thumbnail is hashed again
+    with open(path, "rb") as f:
+        return '"' + hashlib.sha256(f.read()).hexdigest()[:32] + '"'
+
+def thumbnail_etag(path: Path) -> str:
+    """Strong ETag from the thumbnail's content, hashed once per file version."""
+    stat = path.stat()
+    return _content_etag(str(path), stat.st_mtime_ns, stat.st_size)
+
+def _save(img, path: Path, fmt: str) -> None:
+    pil_format = FORMATS[fmt][0]
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    if pil_format == "WEBP":
+        img.save(path, pil_format, quality=config.THUMBNAIL_QUALITY, method=4)
+    else:
+        img.save(path, pil_format, quality=config.THUMBNAIL_QUALITY)
+
+def _save_variant(img, output_dir: Path, doc_id: str, variant: str) -> Dict[str, str]:
+    """Save one rendered variant; LEGACY_VARIANT also becomes the legacy JPEG."""
+    saved = {}
+    path = variant_path(output_dir, doc_id, variant)
+    _save(img, path, THUMBNAIL_FORMAT)
+    saved[variant] = path.name
+    if variant == LEGACY_VARIANT:
+        _save(img, legacy_thumbnail_path(output_dir, doc_id), "jpeg")
+    return saved
+
+def render_pdf_page_thumbnails(page, output_dir: Path, doc_id: str) -> Dict[str, str]:
+    """
+    Render a PDF page straight to each configured variant size.
+    The zoom is computed from the page box so each variant is rasterized at its
+    target size, instead of rendering at high DPI and downscaling.
+    Returns {variant: filename}.
+    """
+    import fitz  # PyMuPDF
+    from PIL import Image
+
+    rect = page.rect
+    if rect.width <= 0 or rect.height <= 0:
+        return {}
+
+    saved = {}
+    for variant, (width, height) in THUMBNAIL_SIZES.items():
+        scale = min(width / rect.width, height / rect.height)
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False, colorspace=fitz.csRGB)
+        img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        saved.update(_save_variant(img, output_dir, doc_id, variant))
+    return saved
+
+def save_image_thumbnails(img, output_dir: Path, doc_id: str) -> Dict[str, str]:
+    """
+    Downscale a decoded cover image to each configured variant size.
+    Returns {variant: filename}.
+    """
+    from PIL import Image
+
+    saved = {}
+    for variant, size in THUMBNAIL_SIZES.items():
+        variant_img = img.copy()
+        variant_img.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        saved.update(_save_variant(variant_img, output_dir, doc_id, variant))
+    return saved
+
+def open_cover_image(data: bytes):
+    """
+    Decode cover image bytes, letting JPEG decoding downscale on the fly
+    to no more than the largest variant.
+    """
+    import io
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data))
+    if THUMBNAIL_SIZES:
+        largest = max(THUMBNAIL_SIZES.values())
+        img.draft("RGB", largest)
+    return img
+
+def choose_variant(variants: Dict[str, str], size: Optional[str]) -> Optional[str]:
+    """Pick the stored variant filename for a requested size, falling back to grid."""
+    if not variants:
+        return None
+    return variants.get(size or DEFAULT_VARIANT) or variants.get(DEFAULT_VARIANT) or next(iter(variants.values()))
@@ -0,0 +1,92 @@
+"""
+Warm-up and readiness.
+
+The heavy parts of a first chat — importing the phi stack, building the knowledge
+base (including its existing-documents check) and loading the Ollama models into
+memory — are done here, ahead of traffic, together with the database backfills that
+scoped chats depend on, so /ready can tell a load balancer or the desktop app when
+the worker will answer correctly and at full speed.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+import logging
+
+from config import config
+import startup_profile
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_state: Dict[str, Any] = {"status": "pending", "steps": {}}
+
+def _run_step(name: str, func: Callable[[], Any]) -> bool:
+    started = time.perf_counter()
+    try:
+        func()
+        ok, error = True, None
+    except Exception as e:
+        ok, error = False, str(e)
+        logger.warning(f"⚠️ Warm-up step {name} failed: {e}")
+    seconds = time.perf_counter() - started
+    startup_profile.record(f"warmup.{name}", seconds)
+    with _lock:
+        _state["steps"][name] = {"ok": ok, "seconds": round(seconds, 3), **({"error": error} if error else {})}
+    return ok
+
+def _build_knowledge_base() -> None:
+    from agent import get_knowledge_base
+
+    if get_knowledge_base() is None:
+        raise RuntimeError("Knowledge base could not be created")
+
+def _preload_models() -> None:
+    """Load the embedding and chat models into Ollama's memory."""
+    from ollama import Client
+
+    client = Client(host=config.OLLAMA_HOST)
+    keep_alive = config.OLLAMA_KEEP_ALIVE or None
+    client.embed(model=config.EMBEDDING_MODEL, input="warm-up", keep_alive=keep_alive)
+    # An empty prompt loads the model without generating anything
+    client.generate(model=config.CHAT_MODEL, prompt="", keep_alive=keep_alive)
+
+def warm_up(
+    required_steps: Optional[Dict[str, Callable[[], Any]]] = None,
+    extra_steps: Optional[Dict[str, Callable[[], Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    Run the required steps (building the knowledge base first, when WARMUP_ON_STARTUP is set),
+    preload the Ollama models, then run any extra steps.
+    The worker is ready once every required step has succeeded; model or extra-step
+    failures are reported but only make the first chat slower.
+    """
+    with _lock:
+        if _state["status"] == "warming":
+            return readiness()
+        _state.update(status="warming", steps={})
+    started = time.perf_counter()
+    logger.info("🔥 Warming up...")
+
+    required = dict(required_steps or {})
+    if config.WARMUP_ON_STARTUP:
+        required = {"knowledge_base": _build_knowledge_base, **required}
+    # Every required step runs, even after a failure, so /ready reports all of them
+    results = [_run_step(name, func) for name, func in required.items()]
+    ready = all(results)
+    if config.WARMUP_ON_STARTUP and config.WARMUP_PRELOAD_MODELS:
+        _run_step("models", _preload_models)
+    for name, func in (extra_steps or {}).items():
+        _run_step(name, func)
+
+    with _lock:
+        _state["status"] = "ready" if ready else "failed"
+        _state["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"{'✅' if ready else '❌'} Warm-up {_state['status']} in {_state['seconds']}s")
+    return readiness()
+
+def is_ready() -> bool:
+    return _state["status"] == "ready"
+
+def readiness() -> Dict[str, Any]:
+    with _lock:
+        return {**_state, "steps": dict(_state["steps"])}